@@ -1,18 +1,109 @@
-"""AgilePoint API Lib"""
-from hammock import Hammock
-from .admin import Admin
-from .workflow import Workflow
-# pylint: disable=too-few-public-methods
+"""AgilePoint API Lib
+
+Importing the package is cheap: hammock/requests and the generated Workflow
+and Admin modules are only loaded when a client first needs them."""
+import sys
+import threading
+# pylint: disable=too-few-public-methods,import-outside-toplevel
+
+if sys.version_info < (3, 7):
+    from .admin import Admin
+    from .workflow import Workflow
+else:
+    def __getattr__(name):
+        """Load Admin/Workflow on first access of agilepoint.Admin etc."""
+        if name == 'Admin':
+            from .admin import Admin
+            return Admin
+        if name == 'Workflow':
+            from .workflow import Workflow
+            return Workflow
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
 
 class AgilePoint(object):
     """AgilePoint API
 
-    Host: https://fqdn-of-agilepoint-server:14490
+    Host: https://fqdn-of-agilepoint-server:14490, or a list of such URLs
+          to balance requests over several server nodes
     Path: AgilePointServer
-    These are pretty self explanatory: username, password"""
-    def __init__(self, host, path, username, password):
-        url = '{}/{}'.format(host, path)
-        self.agilepoint = Hammock(url, auth=(username, password),
-                                  headers={'Content-Type': 'application/json'})
-        self.workflow = Workflow(self)
-        self.admin = Admin(self)
+    These are pretty self explanatory: username, password
+    Auth: optional requests auth object (see agilepoint.auth) used instead
+    of Basic auth with username/password.
+    Adapter: optional requests transport adapter (see agilepoint.transport)
+    mounted for every request to the server.
+    HTTP2: multiplex requests over HTTP/2 (needs the http2 extra); True,
+    or a dict of agilepoint.transport.HTTP2Adapter options. Not combined
+    with Adapter.
+    Compression: count compression per endpoint and optionally compress
+    large request bodies; True, or a dict of
+    agilepoint.transport.CompressionAdapter options. The adapter is kept
+    as the compression attribute. Compressed responses are always accepted.
+    Cache: agilepoint.cache.SQLiteCache (or a path to one) serving process
+    definitions, roles and registered users to every client on the host.
+    Validate: set False to skip request body validation in trusted code.
+
+    The transport and the workflow/admin sections are built on first use."""
+    def __init__(self, host, path, username, password, adapter=None,
+                 validate=True, auth=None, http2=False, compression=None, cache=None):
+        if http2:
+            if adapter is not None:
+                raise ValueError('http2 replaces the transport adapter; '
+                                 'pass an HTTP2Adapter as adapter instead')
+            from .transport import HTTP2Adapter
+            adapter = HTTP2Adapter(**(http2 if isinstance(http2, dict) else {}))
+        self.compression = None
+        if compression:
+            from .transport import CompressionAdapter
+            options = dict(compression) if isinstance(compression, dict) else {}
+            options.setdefault('path', path)
+            adapter = self.compression = CompressionAdapter(inner=adapter, **options)
+        if isinstance(host, (list, tuple)):
+            from .transport import BalancingAdapter
+            adapter = BalancingAdapter(host, path, inner=adapter)
+            host = host[0]
+        if cache is not None:
+            from .cache import CachingAdapter
+            adapter = CachingAdapter(cache, inner=adapter, path=path)
+        self.host = host
+        self.path = path
+        self._auth = auth if auth is not None else (username, password)
+        self._adapter = adapter
+        self.validate = validate
+        self._lock = threading.Lock()
+        self._transport = None
+        self._workflow = None
+        self._admin = None
+
+    @property
+    def agilepoint(self):
+        """Hammock root for the server"""
+        if self._transport is None:
+            with self._lock:
+                if self._transport is None:
+                    from hammock import Hammock
+                    from ._utils import accept_encoding
+                    url = '{}/{}'.format(self.host, self.path)
+                    transport = Hammock(url, auth=self._auth,
+                                        headers={'Content-Type': 'application/json',
+                                                 'Accept-Encoding': accept_encoding()})
+                    if self._adapter is not None:
+                        transport._session.mount(self.host, self._adapter)  # pylint: disable=protected-access
+                    self._transport = transport
+        return self._transport
+
+    @property
+    def workflow(self):
+        """Workflow methods"""
+        if self._workflow is None:
+            from .workflow import Workflow
+            self._workflow = Workflow(self)
+        return self._workflow
+
+    @property
+    def admin(self):
+        """Admin methods"""
+        if self._admin is None:
+            from .admin import Admin
+            self._admin = Admin(self)
+        return self._admin
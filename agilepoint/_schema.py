@@ -0,0 +1,136 @@
+"""Request validators compiled from api_spec.json
+
+Each generated method validates its body through a Validator built from the
+spec entry for that method the first time its section is used: required/
+allowed keys are checked with frozenset operations and the body fields listed
+below get type checks.
+Clients created with validate=False get NO_VALIDATION instead, which skips
+all of it for trusted hot paths."""
+import json
+import os
+from .exceptions import MissingRequiredArg, InvalidArg
+from ._utils import parse_date, STRING_TYPES
+
+SPEC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_spec.json')
+
+BOOL_FIELDS = frozenset(['bDependent', 'bReserved', 'blnStartImmediately',
+                         'BusinessTime', 'Disabled', 'Enabled', 'IncludeXmlData',
+                         'UALNeverExpires'])
+LIST_FIELDS = frozenset(['Attachments', 'AttrNames', 'CustomIDs',
+                         'MergingProcessInstanceIDs', 'namesArray',
+                         'PartialRollbackUnits', 'SplitProcessInstances'])
+DATE_FIELDS = frozenset(['EndDate', 'RegisteredDate', 'StartDate', 'UALExpirationDate'])
+
+
+def field_type(name):
+    """'bool', 'list', 'date' or None for a body field name"""
+    if name in BOOL_FIELDS:
+        return 'bool'
+    if name in LIST_FIELDS:
+        return 'list'
+    if name in DATE_FIELDS:
+        return 'date'
+    return None
+
+
+def _check_bool(value):
+    return isinstance(value, bool)
+
+
+def _check_list(value):
+    return isinstance(value, (list, tuple))
+
+
+def _check_date(value):
+    if not isinstance(value, STRING_TYPES):
+        return False
+    try:
+        parse_date(value)
+    except ValueError:
+        return False
+    return True
+
+CHECKS = {'bool': _check_bool, 'list': _check_list, 'date': _check_date}
+
+
+class Validator(object):
+    """Compiled body validator for one endpoint.
+
+    required: body args that must be present
+    optional: body args that may be present; None leaves extra keys unchecked
+    """
+    __slots__ = ('required', 'order', 'allowed', 'checks')
+
+    def __init__(self, required=(), optional=None):
+        self.order = tuple(required)
+        self.required = frozenset(required)
+        if optional is None:
+            self.allowed = None
+        else:
+            self.allowed = self.required.union(optional)
+        fields = self.required if optional is None else self.allowed
+        self.checks = tuple((name, field_type(name), CHECKS[field_type(name)])
+                            for name in sorted(fields) if field_type(name))
+
+    def __call__(self, kwargs):
+        if not self.required.issubset(kwargs):
+            for arg in self.order:
+                if arg not in kwargs:
+                    raise MissingRequiredArg(arg)
+        if self.allowed is not None:
+            for arg in kwargs:
+                if arg not in self.allowed:
+                    raise InvalidArg(arg)
+        for name, kind, check in self.checks:
+            value = kwargs.get(name)
+            if value is not None and not check(value):
+                raise InvalidArg('{}: expected {}, got {!r}'.format(name, kind, value))
+        return True
+
+
+def _skip(kwargs):  # pylint: disable=unused-argument
+    return True
+
+
+class _NoValidation(object):
+    """Stands in for a section's validators when validation is disabled"""
+    def __getitem__(self, name):
+        return _skip
+
+NO_VALIDATION = _NoValidation()
+
+
+def load_spec(file_name=SPEC_FILE):
+    """The parsed api spec shipped with the package"""
+    with open(file_name) as f_handle:
+        return json.load(f_handle)
+
+
+_SPEC = []
+
+
+def compile_section(section, spec=None):
+    """{method name: Validator} for every method of a section that
+    validates its body
+
+    spec: parsed api spec; the shipped one is read once per process"""
+    if spec is None:
+        if not _SPEC:
+            _SPEC.append(load_spec())
+        spec = _SPEC[0]
+    return dict((method['method'], Validator(method['required'], method['optional']))
+                for method in spec['methods']
+                if method['section'] == section and
+                (method['required'] or method['optional'] is not None))
+
+
+class LazySection(object):
+    """A section's validators, compiled on first lookup"""
+    def __init__(self, section):
+        self.section = section
+        self.validators = None
+
+    def __getitem__(self, name):
+        if self.validators is None:
+            self.validators = compile_section(self.section)
+        return self.validators[name]
@@ -1,15 +1,73 @@
 """General utilities that don't fit into any other module"""
-# import datetime
-import requests
+import codecs
+import contextlib
+import datetime
+import json
+import re
+import threading
+import time
+from concurrent import futures
 from .exceptions import MissingRequiredArg, InvalidArg, AgilePointBadResponse
 # pylint: disable=no-member
 
+HTTP_OK = 200
+
+# AgilePoint serialises dates the WCF way: /Date(1500000000000-0500)/
+WCF_DATE = re.compile(r'/Date\((-?\d+)([+-]\d{4})?\)/')
+STRING_TYPES = (type(u''), str)
+_DECODING = threading.local()
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+@contextlib.contextmanager
+def decoding(fields=None, intern=False):
+    """Decode json responses received in this thread more compactly.
+
+    fields: keep only these keys in every decoded object (the *Result
+        wrapper of the response is always kept)
+    intern: share equal string values within a response, so repeated
+        statuses, user and activity names are stored once; True for every
+        value, or a collection of the keys whose values to share
+
+    Example::
+
+        with decoding(fields=('WorkItemID', 'Status', 'UserID'), intern=True):
+            items = ap.workflow.query_work_list(**query)"""
+    previous = getattr(_DECODING, 'options', None)
+    _DECODING.options = (frozenset(fields) if fields else None,
+                         intern if intern is True else frozenset(intern or ()))
+    try:
+        yield
+    finally:
+        _DECODING.options = previous
+
+
+def _pairs_hook(fields, intern):
+    """json object_pairs_hook projecting fields and sharing strings"""
+    share = {}.setdefault
+    strings = STRING_TYPES
+
+    def hook(pairs):
+        result = {}
+        for key, value in pairs:
+            if fields is not None and key not in fields and not key.endswith('Result'):
+                continue
+            if value.__class__ in strings and (intern is True or key in intern):
+                value = share(value, value)
+            result[key] = value
+        return result
+    return hook
+
+
 def handle_response(resp_type, resp):
     """Correctly handle api response and return correct response"""
-    if resp.status_code == requests.codes.ok:
+    if resp.status_code == HTTP_OK:
         if resp_type == 'bool':
             return True
         elif resp_type == 'json':
+            options = getattr(_DECODING, 'options', None)
+            if options is not None:
+                return resp.json(object_pairs_hook=_pairs_hook(*options))
             return resp.json()
         elif resp_type == 'text':
             return resp.text
@@ -19,6 +77,15 @@ def handle_response(resp_type, resp):
         raise AgilePointBadResponse(resp.url, resp.status_code, resp.text)
 
 
+def accept_encoding():
+    """Accept-Encoding value naming every content coding urllib3 can decode"""
+    try:
+        from urllib3.util.request import ACCEPT_ENCODING
+    except ImportError:
+        return 'gzip,deflate'
+    return ACCEPT_ENCODING
+
+
 def validate_args(kwargs, req_args=None, opt_args=None):
     """Validate kwargs against provided req_args and opt_args"""
     present_args = kwargs.keys()
@@ -31,3 +98,167 @@ def validate_args(kwargs, req_args=None, opt_args=None):
             if arg not in opt_args:
                 raise InvalidArg(arg)
     return True
+
+
+def iter_result(resp, chunk_size=65536):
+    """Elements of the *Result array of a json response requested with
+    stream=True, decoded as the body arrives (as set by decoding()) so the
+    whole list is never held. A result that is not an array is yielded as
+    one element, and a null one yields nothing. The response is closed
+    once the generator finishes or is closed."""
+    if resp.status_code != HTTP_OK:
+        raise AgilePointBadResponse(resp.url, resp.status_code, resp.text)
+    options = getattr(_DECODING, 'options', None)
+    decoder = json.JSONDecoder(
+        object_pairs_hook=_pairs_hook(*options) if options is not None else None)
+    text = codecs.getincrementaldecoder('utf-8')()
+    chunks = resp.iter_content(chunk_size)
+    state = {'buffer': u'', 'eof': False}
+
+    def more():
+        """Read the next chunk into the buffer; False at the end of the body"""
+        for chunk in chunks:
+            state['buffer'] += text.decode(chunk)
+            return True
+        state['eof'] = True
+        return False
+
+    def find(pattern, pos):
+        """Position of the first pattern character from pos, reading on"""
+        while True:
+            found = [state['buffer'].find(c, pos) for c in pattern]
+            found = [index for index in found if index >= 0]
+            if found:
+                return min(found)
+            if not more():
+                raise ValueError('Invalid or truncated json response from {}'.format(resp.url))
+
+    try:
+        pos = find('{[', 0)
+        if state['buffer'][pos] == '{':
+            # The {"<Method>Result": ...} envelope
+            pos = find(':', pos) + 1
+            pos = _SEPARATORS.match(state['buffer'], pos).end()
+            while pos >= len(state['buffer']) and more():
+                pos = _SEPARATORS.match(state['buffer'], pos).end()
+        if state['buffer'][pos:pos + 1] != '[':
+            while more():
+                pass
+            value, _ = decoder.raw_decode(state['buffer'], pos)
+            if value is not None:
+                yield value
+            return
+        pos += 1
+        while True:
+            buffer = state['buffer']
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A number at the end of the buffer may go on in the next chunk
+                complete = end < len(buffer) or state['eof']
+            except ValueError:
+                complete = False
+            if not complete:
+                if not more():
+                    raise ValueError('Invalid or truncated json response from {}'.format(resp.url))
+                continue
+            yield value
+            pos = end
+            if pos > chunk_size:
+                state['buffer'] = buffer[pos:]
+                pos = 0
+    finally:
+        resp.close()
+
+
+def unwrap_result(data):
+    """Strip the {'<Method>Result': value} envelope AgilePoint puts around
+    json responses. Anything else is returned untouched."""
+    if isinstance(data, dict) and len(data) == 1:
+        key = next(iter(data))
+        if key.endswith('Result'):
+            return data[key]
+    return data
+
+
+def parse_date(value):
+    """Parse an AgilePoint date into a naive UTC datetime.
+
+    Accepts the WCF /Date(ms)/ form, ISO 8601 strings and datetimes.
+    Returns None for empty values."""
+    if not value:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    match = WCF_DATE.search(value)
+    if match:
+        return (datetime.datetime(1970, 1, 1) +
+                datetime.timedelta(milliseconds=int(match.group(1))))
+    value = value.rstrip('Z')
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S',
+                '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError('Unrecognised AgilePoint date: {}'.format(value))
+
+
+def wcf_date(value):
+    """Format a naive UTC datetime the way AgilePoint expects: /Date(ms)/"""
+    delta = value - datetime.datetime(1970, 1, 1)
+    return '/Date({})/'.format(int(delta.total_seconds() * 1000))
+
+
+class RateLimiter(object):
+    """Thread safe limiter allowing at most `rate` calls per second.
+
+    A rate of None or 0 disables limiting."""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the caller is allowed to make its next call"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def parallel_map(func, items, workers=8, limiter=None):
+    """Apply func to every item on a thread pool.
+
+    Items are consumed lazily and at most 2 * workers calls are in flight,
+    so arbitrarily long iterators can be fed in. Yields (item, result, error)
+    tuples in completion order; exactly one of result/error is meaningful."""
+    def call(item):
+        if limiter is not None:
+            limiter.wait()
+        return func(item)
+
+    items = iter(items)
+    pending = {}
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for item in items:
+                pending[pool.submit(call, item)] = item
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                return
+            done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    yield item, future.result(), None
+                else:
+                    yield item, None, error
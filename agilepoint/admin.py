@@ -1,13 +1,21 @@
 """Admin Methods for AgilePoint API"""
 import json
-from ._utils import handle_response, validate_args
+from ._schema import LazySection, NO_VALIDATION
+from ._utils import handle_response
 # pylint: disable=too-many-public-methods
 
+VALIDATORS = LazySection('Admin')
+
+
 class Admin(object):
     """Admin Methods for AgilePoint API"""
     def __init__(self, agilepoint):
         self.admin = agilepoint.agilepoint.Admin
         self.agilepoint = agilepoint
+        if getattr(agilepoint, 'validate', True):
+            self.validate = VALIDATORS
+        else:
+            self.validate = NO_VALIDATION
 
     def activate_delegation(self, delegationid):
         """Activates a delegation.
@@ -30,8 +38,7 @@ class Admin(object):
         Required Body Args: FromUser, ToUser, StartDate, EndDate, Description
         Optional Body Args: None
         Response: JSON"""
-        req_args = ['FromUser', 'ToUser', 'StartDate', 'EndDate', 'Description']
-        validate_args(kwargs, req_args)
+        self.validate['add_delegation'](kwargs)
         resp = self.admin.AddDelegation.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -44,8 +51,7 @@ class Admin(object):
         Required Body Args: TemplateOwnerID, MailTemplateXML
         Optional Body Args: None
         Response: text"""
-        req_args = ['TemplateOwnerID', 'MailTemplateXML']
-        validate_args(kwargs, req_args)
+        self.validate['add_email_template'](kwargs)
         resp = self.admin.AddEMailTemplate.POST(data=json.dumps(kwargs))
         return handle_response('text', resp)
 
@@ -57,8 +63,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: GroupName, ResponsibleUser
         Optional Body Args: Enabled, Description"""
-        req_args = ['GroupName', 'ResponsibleUser']
-        validate_args(kwargs, req_args)
+        self.validate['add_group'](kwargs)
         resp = self.admin.AddGroup.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -70,8 +75,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: Description, Enabled, GroupName, UserName
         Optional Body Args: ClientData"""
-        req_args = ['Description', 'Enabled', 'GroupName', 'UserName']
-        validate_args(kwargs, req_args)
+        self.validate['add_group_member'](kwargs)
         resp = self.admin.AddGroupMember.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -83,8 +87,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: RoleName, Description, Rights, Enabled
         Optional Body Args: None"""
-        req_args = ['RoleName', 'Description', 'Rights', 'Enabled']
-        validate_args(kwargs, req_args)
+        self.validate['add_role'](kwargs)
         resp = self.admin.AddRole.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -97,9 +100,7 @@ class Admin(object):
         Required Body Args: Assignee, AssigneeType, ClientData, ObjectID,
                             ObjectType, RoleName
         Optional Body Args: None"""
-        req_args = ['Assignee', 'AssigneeType', 'ClientData', 'ObjectID',
-                    'ObjectType', 'RoleName']
-        validate_args(kwargs, req_args)
+        self.validate['add_role_member'](kwargs)
         resp = self.admin.AddRoleMember.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -115,7 +116,8 @@ class Admin(object):
         return handle_response('bool', resp)
 
     def get_access_right_names(self):
-        """Retrieves the names of all the access rights in the AgilePoint system.
+        """Retrieves the names of all the access rights in the AgilePoint
+        system.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodGetAccessRightNames.html
 
@@ -133,8 +135,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: userName
         Optional Body Args: None"""
-        req_args = ['userName']
-        validate_args(kwargs, req_args)
+        self.validate['get_access_rights'](kwargs)
         resp = self.admin.GetAccessRights.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -150,7 +151,8 @@ class Admin(object):
         return handle_response('json', resp)
 
     def get_database_info(self):
-        """Retrieves the database information of the current server configuration.
+        """Retrieves the database information of the current server
+        configuration.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodGetDatabaseInfo.html
 
@@ -172,15 +174,15 @@ class Admin(object):
         return handle_response('json', resp)
 
     def get_delegations(self, delegationid, **kwargs):
-        """Retrieves a list of delegation objects that match the specified parameters.
+        """Retrieves a list of delegation objects that match the specified
+        parameters.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodGetDelegation.html
 
         Path Args: delegationID
         Required Body Args: None
         Optional Body Args: FromUser, ToUser, Status"""
-        opt_args = ['FromUser', 'ToUser', 'Status']
-        validate_args(kwargs, opt_args=opt_args)
+        self.validate['get_delegations'](kwargs)
         resp = self.admin.GetDelegations(delegationid).POST(
             data=json.dumps(kwargs))
         return handle_response('json', resp)
@@ -193,8 +195,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: groupDistinguishedName
         Optional Body Args: None"""
-        req_args = ['groupDistinguishedName']
-        validate_args(kwargs, req_args)
+        self.validate['get_domain_group_members'](kwargs)
         resp = self.admin.GetDomainGroupMembers.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -206,8 +207,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: Filter, LDAPPath
         Optional Body Args: None"""
-        req_args = ['Filter', 'LDAPPath']
-        validate_args(kwargs, req_args)
+        self.validate['get_domain_groups'](kwargs)
         resp = self.admin.GetDomainGroups.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -232,8 +232,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: Filter, LDAPPath
         Optional Body Args: None"""
-        req_args = ['Filter', 'LDAPPath']
-        validate_args(kwargs, req_args)
+        self.validate['get_domain_users'](kwargs)
         resp = self.admin.GetDomainUsers.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -301,8 +300,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: userName
         Optional Body Args: None"""
-        req_args = ['userName']
-        validate_args(kwargs, req_args)
+        self.validate['get_register_user'](kwargs)
         resp = self.admin.GetRegisterUser.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -391,8 +389,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: sqlWhereClause
         Optional Body Args: None"""
-        req_args = ['sqlWhereClause']
-        validate_args(kwargs, req_args)
+        self.validate['query_register_users_using_sql'](kwargs)
         resp = self.admin.QueryRegisterUsersUsingSQL.POST(
             data=json.dumps(kwargs))
         return handle_response('json', resp)
@@ -420,12 +417,7 @@ class Admin(object):
                             OnlineContact, RefID, RegisteredDate, TimeZone,
                             Title, UALExpirationDate, UALNeverExpires
         Response: Bool"""
-        req_args = ['UserName', 'FullName']
-        opt_args = ['Department', 'EMailAddress', 'FullName', 'Locale',
-                    'Manager', 'OnlineContact', 'RefID', 'RegisteredDate',
-                    'TimeZone', 'Title', 'UALExpirationDate', 'UALNeverExpires',
-                    'UserName']
-        validate_args(kwargs, req_args, opt_args)
+        self.validate['register_user'](kwargs)
         resp = self.admin.RegisterUser.POST(data=json.dumps(kwargs))
         return handle_response('bool', resp)
 
@@ -459,8 +451,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: GroupName, UserName
         Optional Body Args: None"""
-        req_args = ['GroupName', 'UserName']
-        validate_args(kwargs, req_args)
+        self.validate['remove_group_member'](kwargs)
         resp = self.admin.RemoveGroupMember.POST(data=json.dumps(kwargs))
         return handle_response('bool', resp)
 
@@ -472,8 +463,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: Assignee, AssigneeType, ObjectID, RoleName
         Optional Body Args: None"""
-        req_args = ['Assignee', 'AssigneeType', 'ObjectID', 'RoleName']
-        validate_args(kwargs, req_args)
+        self.validate['remove_role_member'](kwargs)
         resp = self.admin.RemoveRoleMember.POST(data=json.dumps(kwargs))
         return handle_response('bool', resp)
 
@@ -498,8 +488,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: userName
         Optional Body Args: None"""
-        req_args = ['userName']
-        validate_args(kwargs, req_args)
+        self.validate['unregister_user'](kwargs)
         resp = self.admin.UnregisterUser.POST(data=json.dumps(kwargs))
         return handle_response('bool', resp)
 
@@ -512,9 +501,7 @@ class Admin(object):
         Required Body Args: DelegationID
         Optional Body Args: DelegationID, FromUser, ToUser, StartDate, EndDate,
                             Description, Status"""
-        req_args = ['DelegationID', 'FromUser', 'ToUser', 'StartDate',
-                    'EndDate', 'Description', 'Status']
-        validate_args(kwargs, req_args)
+        self.validate['update_delegation'](kwargs)
         resp = self.admin.UpdateDelegation.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -527,9 +514,7 @@ class Admin(object):
         Required Body Args: MailTemplateID, MailTemplateXML,
                             TemplateModifiedUserName
         Optional Body Args: None"""
-        req_args = ['MailTemplateID', 'MailTemplateXML',
-                    'TemplateModifiedUserName']
-        validate_args(kwargs, req_args)
+        self.validate['update_email_template'](kwargs)
         resp = self.admin.UpdateEMailTemplate.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -541,8 +526,7 @@ class Admin(object):
         Path Args: None
         Required Body Args: Description, Enabled, GroupName, ResponsibleUser
         Optional Body Args: None"""
-        req_args = ['Description', 'Enabled', 'GroupName', 'ResponsibleUser']
-        validate_args(kwargs, req_args)
+        self.validate['update_group'](kwargs)
         resp = self.admin.UpdateGroup.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -558,13 +542,7 @@ class Admin(object):
                             RegisteredDate, SupportedLanguage, TimeZone, Title,
                             UALExpirationDate, UALNeverExpires, UserName,
                             UserOrgInfo, WorkCalendarID"""
-        req_args = ['UserName']
-        opt_args = ['Department', 'Disabled', 'EMailAddress', 'FullName',
-                    'Level', 'Locale', 'Manager', 'OnlineContact', 'RefID',
-                    'RegisteredDate', 'SupportedLanguage', 'TimeZone', 'Title',
-                    'UALExpirationDate', 'UALNeverExpires', 'UserName',
-                    'UserOrgInfo', 'WorkCalendarID']
-        validate_args(kwargs, req_args, opt_args)
+        self.validate['update_register_user'](kwargs)
         resp = self.admin.UpdateRegisterUser.POST(data=json.dumps(kwargs))
         return handle_response('bool', resp)
 
@@ -576,7 +554,6 @@ class Admin(object):
         Path Args: None
         Required Body Args: Description, Enabled, Rights, RoleName
         Optional Body Args: None"""
-        req_args = ['Description', 'Enabled', 'Rights', 'RoleName']
-        validate_args(kwargs, req_args)
+        self.validate['update_role'](kwargs)
         resp = self.admin.UpdateRole.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
@@ -0,0 +1,204 @@
+"""Columnar work list analytics (needs numpy: pip install "agilepoint[analytics]")
+
+WorkListSnapshot turns the work item dicts from query_work_list or
+get_work_list_by_user_i_d into numpy columns: interned status, user and
+activity codes and UTC timestamps in epoch seconds (NaN when missing).
+Overdue counts, SLA breaches, age percentiles, aging histograms and per
+user/activity backlogs are then whole-array operations, which keeps a
+refresh over a million items well under a second once loaded.
+
+Example::
+
+    snapshot = WorkListSnapshot.query(ap, ColumnName='Status', Operator='<>',
+                                      IsValue='Completed', WhereClause='')
+    print(snapshot.summary(sla=datetime.timedelta(days=2)))
+    print(snapshot.counts_by('user', snapshot.overdue()))
+"""
+import calendar
+import datetime
+import re
+import time
+from ._utils import decoding, parallel_map, parse_date, unwrap_result
+from .graph import CLOSED_STATUSES
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Age histogram bucket edges in hours
+AGE_BUCKETS = (0, 4, 24, 72, 168, 720)
+WCF_MILLIS = re.compile(r'/Date\((-?\d+)').match
+
+
+def _intern(values):
+    """(int32 codes, list of distinct values) for a sequence of values"""
+    index = {}
+    codes = numpy.fromiter((index.setdefault(value, len(index)) for value in values),
+                           dtype=numpy.int32, count=len(values))
+    names = [None] * len(index)
+    for value, code in index.items():
+        names[code] = value
+    return codes, names
+
+
+def _epoch(value):
+    """Epoch seconds for an AgilePoint date, NaN when empty"""
+    if not value:
+        return float('nan')
+    # WCF dates are UTC milliseconds; the optional offset is display only
+    match = WCF_MILLIS(value)
+    if match:
+        return int(match.group(1)) / 1000.0
+    return calendar.timegm(parse_date(value).timetuple())
+
+
+def _seconds(value):
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class WorkListSnapshot(object):
+    """Work items as numpy columns.
+
+    status/user/activity: int32 codes into statuses/users/activities
+    assigned/due/completed: float64 epoch seconds, NaN when missing
+    ids: work item ids, for mapping masks back to items
+    now: epoch seconds the snapshot was taken at, used for ages"""
+    id_key = 'WorkItemID'
+    status_key = 'Status'
+    user_key = 'UserID'
+    activity_key = 'Name'
+    assigned_key = 'AssignedDate'
+    due_key = 'DueDate'
+    completed_key = 'CompletedDate'
+
+    def __init__(self, records, now=None):
+        if numpy is None:
+            raise ImportError('Work list analytics need numpy: '
+                              'pip install "agilepoint[analytics]"')
+        records = records if isinstance(records, list) else list(records)
+        self.now = time.time() if now is None else now
+        count = len(records)
+        self.ids = [record.get(self.id_key) for record in records]
+        self.status, self.statuses = _intern([r.get(self.status_key) for r in records])
+        self.user, self.users = _intern([r.get(self.user_key) for r in records])
+        self.activity, self.activities = _intern([r.get(self.activity_key) for r in records])
+        self.assigned = numpy.fromiter((_epoch(r.get(self.assigned_key)) for r in records),
+                                       dtype=numpy.float64, count=count)
+        self.due = numpy.fromiter((_epoch(r.get(self.due_key)) for r in records),
+                                  dtype=numpy.float64, count=count)
+        self.completed = numpy.fromiter((_epoch(r.get(self.completed_key)) for r in records),
+                                        dtype=numpy.float64, count=count)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def decoding(cls):
+        """Decode only the snapshot's columns, sharing repeated strings"""
+        return decoding(fields=(cls.id_key, cls.status_key, cls.user_key, cls.activity_key,
+                                cls.assigned_key, cls.due_key, cls.completed_key),
+                        intern=(cls.status_key, cls.user_key, cls.activity_key))
+
+    @classmethod
+    def query(cls, agilepoint, **kwargs):
+        """Snapshot of query_work_list(**kwargs)"""
+        with cls.decoding():
+            return cls(unwrap_result(agilepoint.workflow.query_work_list(**kwargs)) or [])
+
+    @classmethod
+    def for_users(cls, agilepoint, users, status='', workers=8):
+        """Snapshot of get_work_list_by_user_i_d for every user, fetched
+        concurrently"""
+        def fetch(user):
+            with cls.decoding():
+                return unwrap_result(agilepoint.workflow.get_work_list_by_user_i_d(
+                    UserName=user, Status=status)) or []
+        records = []
+        for user, result, error in parallel_map(fetch, users, workers):
+            if error is not None:
+                raise error
+            records.extend(result)
+        return cls(records)
+
+    def status_mask(self, statuses):
+        """Boolean mask of items in any of statuses"""
+        codes = [code for code, name in enumerate(self.statuses) if name in statuses]
+        return numpy.isin(self.status, codes)
+
+    def open(self):
+        """Mask of items not in a closed status"""
+        return ~self.status_mask(CLOSED_STATUSES)
+
+    def overdue(self, now=None):
+        """Mask of open items past their due date"""
+        now = self.now if now is None else now
+        with numpy.errstate(invalid='ignore'):
+            return self.open() & (self.due < now)
+
+    def ages(self, mask=None, now=None):
+        """Seconds since assignment of the (masked) open items"""
+        now = self.now if now is None else now
+        mask = self.open() if mask is None else mask
+        ages = now - self.assigned[mask]
+        return ages[~numpy.isnan(ages)]
+
+    def sla_breaches(self, sla, now=None):
+        """Mask of items that took, or have been open, longer than sla
+        (a timedelta or seconds) since assignment"""
+        now = self.now if now is None else now
+        finished = numpy.where(numpy.isnan(self.completed), now, self.completed)
+        with numpy.errstate(invalid='ignore'):
+            return (finished - self.assigned) > _seconds(sla)
+
+    def age_percentiles(self, percentiles=(50, 90, 99), mask=None):
+        """{percentile: age in seconds} over open (or masked) items"""
+        ages = self.ages(mask)
+        if not len(ages):
+            return dict((pct, None) for pct in percentiles)
+        values = numpy.percentile(ages, percentiles)
+        return dict((pct, float(value)) for pct, value in zip(percentiles, values))
+
+    def aging_histogram(self, buckets=AGE_BUCKETS, mask=None):
+        """[(label, count)] of open (or masked) items by age in hours;
+        the last bucket is open ended"""
+        hours = self.ages(mask) / 3600.0
+        edges = list(buckets) + [numpy.inf]
+        counts, _ = numpy.histogram(hours, bins=edges)
+        labels = ['{}-{}h'.format(low, high) for low, high in zip(buckets, buckets[1:])]
+        labels.append('{}h+'.format(buckets[-1]))
+        return list(zip(labels, (int(count) for count in counts)))
+
+    def counts_by(self, column, mask=None):
+        """{user or activity or status: item count}, optionally masked"""
+        codes = getattr(self, column)
+        names = {'user': self.users, 'activity': self.activities,
+                 'status': self.statuses}[column]
+        if mask is not None:
+            codes = codes[mask]
+        counts = numpy.bincount(codes, minlength=len(names))
+        return dict((names[code], int(count)) for code, count in enumerate(counts) if count)
+
+    def mean_age_by(self, column, mask=None):
+        """{user or activity: mean age in seconds} over open (or masked) items"""
+        mask = self.open() if mask is None else mask
+        mask = mask & ~numpy.isnan(self.assigned)
+        codes = getattr(self, column)[mask]
+        names = {'user': self.users, 'activity': self.activities}[column]
+        totals = numpy.bincount(codes, weights=self.now - self.assigned[mask],
+                                minlength=len(names))
+        counts = numpy.bincount(codes, minlength=len(names))
+        return dict((names[code], float(totals[code] / counts[code]))
+                    for code in numpy.flatnonzero(counts))
+
+    def summary(self, sla=None):
+        """Headline numbers for the snapshot"""
+        open_mask = self.open()
+        result = {'items': len(self), 'open': int(open_mask.sum()),
+                  'overdue': int(self.overdue().sum()),
+                  'age_percentiles': self.age_percentiles(mask=open_mask),
+                  'aging': self.aging_histogram(mask=open_mask)}
+        if sla is not None:
+            result['sla_breaches'] = int(self.sla_breaches(sla).sum())
+        return result
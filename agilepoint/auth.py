@@ -0,0 +1,168 @@
+"""Authenticators that avoid renegotiating credentials on every call
+
+Plain (username, password) makes every request carry Basic credentials,
+and Windows-auth deployments (NTLM/Kerberos) pay a handshake per request.
+The classes here are requests auth objects; pass one to AgilePoint with
+auth= and share the same instance between clients and worker threads.
+
+TokenAuth caches a bearer token and refreshes it before it expires::
+
+    fetch = client_credentials('https://ap/oauth/token', client_id, secret)
+    ap = AgilePoint(host, path, None, None, auth=TokenAuth(fetch))
+
+SessionAuth authenticates once with an expensive scheme and then rides the
+session cookie the server hands back::
+
+    from requests_ntlm import HttpNtlmAuth
+    auth = SessionAuth(HttpNtlmAuth('DOMAIN\\\\user', password))
+    ap = AgilePoint(host, path, None, None, auth=auth)
+"""
+import threading
+import time
+from requests.auth import AuthBase
+from requests.cookies import RequestsCookieJar
+
+HTTP_UNAUTHORIZED = 401
+# Marks a request resent after a 401 so it is not retried again
+RETRIED = '_agilepoint_auth_retried'
+
+
+def _resend(resp, request, **kwargs):
+    """Send request again over the connection that produced resp"""
+    resp.content  # pylint: disable=pointless-statement
+    resp.close()
+    retry = resp.connection.send(request, **kwargs)
+    retry.history.append(resp)
+    retry.request = request
+    return retry
+
+
+class TokenAuth(AuthBase):
+    """Bearer token authentication with cached, proactively refreshed tokens.
+
+    fetch_token: callable returning (token, expires_in_seconds)
+    refresh_margin: refresh this many seconds before expiry; while one
+        thread refreshes, the others keep using the still valid token
+    header/scheme: how the token is sent, 'Authorization: Bearer <token>'
+    A 401 answer forces a refresh and one retry."""
+    def __init__(self, fetch_token, refresh_margin=60, header='Authorization',
+                 scheme='Bearer'):
+        self.fetch_token = fetch_token
+        self.refresh_margin = refresh_margin
+        self.header = header
+        self.scheme = scheme
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires = 0.0
+        self.refreshes = 0
+
+    def _refresh(self):
+        # Called with self._lock held
+        token, expires_in = self.fetch_token()
+        self._token = token
+        self._expires = time.time() + expires_in
+        self.refreshes += 1
+
+    def token(self, force=False):
+        """Current token, fetching or refreshing it as needed"""
+        now = time.time()
+        if force or self._token is None or now >= self._expires:
+            with self._lock:
+                if force or self._token is None or time.time() >= self._expires:
+                    self._refresh()
+        elif now >= self._expires - self.refresh_margin:
+            # Still valid: only refresh if nobody else is already doing it
+            if self._lock.acquire(False):
+                try:
+                    if time.time() >= self._expires - self.refresh_margin:
+                        self._refresh()
+                finally:
+                    self._lock.release()
+        return self._token
+
+    def _value(self, token):
+        return '{} {}'.format(self.scheme, token) if self.scheme else token
+
+    def _handle_401(self, resp, **kwargs):
+        if resp.status_code != HTTP_UNAUTHORIZED or getattr(resp.request, RETRIED, False):
+            return resp
+        request = resp.request.copy()
+        request.headers[self.header] = self._value(self.token(force=True))
+        setattr(request, RETRIED, True)
+        return _resend(resp, request, **kwargs)
+
+    def __call__(self, request):
+        request.headers[self.header] = self._value(self.token())
+        request.register_hook('response', self._handle_401)
+        return request
+
+
+class SessionAuth(AuthBase):
+    """Authenticate once with inner auth, then reuse the server's cookies.
+
+    inner: the expensive auth (Basic tuple, NTLM, Kerberos...) used until
+        the server sets a session cookie, and again whenever it answers 401
+    The cookie jar is shared by every client and thread using this object."""
+    def __init__(self, inner):
+        if isinstance(inner, tuple):
+            from requests.auth import HTTPBasicAuth
+            inner = HTTPBasicAuth(*inner)
+        self.inner = inner
+        self._lock = threading.Lock()
+        self._cookies = RequestsCookieJar()
+        self.logins = 0
+
+    def _capture(self, resp, **kwargs):  # pylint: disable=unused-argument
+        if resp.status_code == HTTP_UNAUTHORIZED:
+            with self._lock:
+                self._cookies.clear()
+            return resp
+        jar = RequestsCookieJar()
+        jar.update(resp.cookies)
+        for history in resp.history:
+            jar.update(history.cookies)
+        if len(jar):
+            with self._lock:
+                self._cookies.update(jar)
+        return resp
+
+    def _handle_401(self, resp, **kwargs):
+        if resp.status_code != HTTP_UNAUTHORIZED or getattr(resp.request, RETRIED, False):
+            return resp
+        request = resp.request.copy()
+        request.headers.pop('Cookie', None)
+        setattr(request, RETRIED, True)
+        request.hooks = {'response': []}
+        with self._lock:
+            self.logins += 1
+        request = self.inner(request)
+        request.register_hook('response', self._capture)
+        return _resend(resp, request, **kwargs)
+
+    def __call__(self, request):
+        with self._lock:
+            cookies = self._cookies.copy() if len(self._cookies) else None
+            if cookies is None:
+                self.logins += 1
+        if cookies is None:
+            request = self.inner(request)
+        else:
+            request.prepare_cookies(cookies)
+            request.register_hook('response', self._handle_401)
+        request.register_hook('response', self._capture)
+        return request
+
+
+def client_credentials(token_url, client_id, client_secret, scope=None, timeout=30):
+    """fetch_token callable for an OAuth2 client credentials token endpoint"""
+    def fetch():
+        import requests
+        data = {'grant_type': 'client_credentials', 'client_id': client_id,
+                'client_secret': client_secret}
+        if scope:
+            data['scope'] = scope
+        resp = requests.post(token_url, data=data, timeout=timeout)
+        resp.raise_for_status()
+        body = resp.json()
+        return body['access_token'], int(body.get('expires_in', 3600))
+    return fetch
@@ -0,0 +1,347 @@
+"""Persistent response cache shared by every process on a host
+
+Process definitions, roles and registered users change rarely but are
+fetched by every worker on start. SQLiteCache keeps them in one SQLite file
+that all AgilePoint clients on the host share; CachingAdapter serves those
+GET endpoints from it. When an entry is missing or expired only one process
+fetches it, while the others wait for the result, so a restart of many
+workers makes one request per endpoint instead of one per worker.
+
+Example::
+
+    cache = SQLiteCache('/var/cache/agilepoint.sqlite', max_bytes=64 * 2 ** 20)
+    ap = AgilePoint(host, path, username, password, cache=cache)
+
+    # gunicorn on_starting hook: fill the cache before the workers fork
+    warm_cache(ap)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from requests.adapters import BaseAdapter, HTTPAdapter
+from ._utils import parallel_map, unwrap_result
+from .transport import build_response, endpoint_name
+
+DEFAULT_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                            os.path.join(os.path.expanduser('~'), '.cache'),
+                            'agilepoint', 'cache.sqlite')
+# Endpoint: seconds a response stays fresh
+CACHED_ENDPOINTS = {
+    'Workflow/GetProcDefs': 300,
+    'Workflow/GetReleasedProcDefs': 300,
+    'Workflow/GetProcDefXml': 3600,
+    'Admin/GetRoles': 300,
+    'Admin/GetRegisterUsers': 300,
+}
+HTTP_OK = 200
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL);
+'''
+
+
+def _open_private(path):
+    """Create path readable by its owner only, or check that an existing
+    one belongs to us: whoever can write the cache decides what every
+    client reads from it"""
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory, 0o700)
+        except OSError:
+            # Another process may have just created it
+            if not os.path.isdir(directory):
+                raise
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    if hasattr(os, 'getuid') and os.stat(path).st_uid != os.getuid():
+        raise ValueError('Cache file {} belongs to another user'.format(path))
+
+
+class SQLiteCache(object):
+    """Key/value cache in a SQLite file, safe across threads and processes.
+
+    path: database file, shared by every process that opens it; created
+        with owner only permissions, and refused when another user owns it.
+        Defaults to ~/.cache/agilepoint/cache.sqlite
+    max_bytes: total size of stored values; least recently used entries
+        are evicted beyond it
+    ttl: default seconds an entry stays fresh
+    lease_timeout: seconds other processes wait for the one fetching a
+        missing entry before fetching it themselves
+    Values are anything json can encode. Expired entries are kept (until
+    evicted) so they can be served when the server is failing."""
+    def __init__(self, path=DEFAULT_PATH, max_bytes=64 * 2 ** 20, ttl=300,
+                 lease_timeout=30, poll_interval=0.05):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        _open_private(path)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # One connection per thread, and never one inherited over fork
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def lookup(self, key):
+        """(value, fresh) for key, or (None, False) when absent"""
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute('SELECT value, expires, accessed FROM entries WHERE key = ?',
+                           (key,)).fetchone()
+        if row is None:
+            return None, False
+        if now - row[2] > 60:
+            # Recency only needs to be rough; avoid a write per hit
+            conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        return json.loads(row[0]), row[1] > now
+
+    def get(self, key, default=None):
+        """Fresh value for key, or default"""
+        value, fresh = self.lookup(key)
+        return value if fresh else default
+
+    def set(self, key, value, ttl=None):
+        """Store value for ttl seconds (the cache default if None)"""
+        data = json.dumps(value)
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                         (key, data, len(data), expires, now))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+                'SELECT key, size FROM entries ORDER BY accessed').fetchall():
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def delete(self, key):
+        """Drop one entry"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def delete_prefix(self, prefix):
+        """Drop the entries whose key starts with prefix"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM entries WHERE substr(key, 1, ?) = ?',
+                         (len(prefix), prefix))
+
+    def clear(self):
+        """Drop every entry"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM leases')
+
+    def _lease_owner(self):
+        return '{}:{}:{}'.format(self._owner, os.getpid(), threading.current_thread().ident)
+
+    def _acquire(self, key):
+        now = time.time()
+        owner = self._lease_owner()
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM leases WHERE key = ? AND expires < ?', (key, now))
+            conn.execute('INSERT OR IGNORE INTO leases VALUES (?, ?, ?)',
+                         (key, owner, now + self.lease_timeout))
+            row = conn.execute('SELECT owner FROM leases WHERE key = ?', (key,)).fetchone()
+        return row is not None and row[0] == owner
+
+    def _release(self, key):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM leases WHERE key = ? AND owner = ?',
+                         (key, self._lease_owner()))
+
+    def get_or_fetch(self, key, fetch, ttl=None, stale_if_error=True):
+        """Fresh value for key, calling fetch() to produce it when needed.
+
+        Only one caller across all processes fetches a given key at a time;
+        the rest wait up to lease_timeout for its result. fetch may raise
+        NotCacheable(value) to return a value without storing it. When fetch
+        fails and an expired value exists, that value is returned instead
+        if stale_if_error."""
+        value, fresh = self.lookup(key)
+        if fresh:
+            self._count('hits')
+            return value
+        self._count('misses')
+        deadline = time.time() + self.lease_timeout
+        while True:
+            acquired = self._acquire(key)
+            if acquired:
+                # The previous holder may have stored it since our lookup
+                value, fresh = self.lookup(key)
+            elif time.time() < deadline:
+                time.sleep(self.poll_interval)
+                value, fresh = self.lookup(key)
+            if fresh:
+                if acquired:
+                    self._release(key)
+                self._count('hits')
+                return value
+            if acquired or time.time() >= deadline:
+                break
+        try:
+            self._count('fetches')
+            try:
+                result = fetch()
+            except NotCacheable as uncached:
+                return uncached.value
+            except Exception:
+                if stale_if_error and value is not None:
+                    return value
+                raise
+            self.set(key, result, ttl)
+            return result
+        finally:
+            self._release(key)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        """Entry count, stored bytes and this process's hit/miss counters"""
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        with self._lock:
+            return {'entries': entries, 'bytes': size, 'hits': self.hits,
+                    'misses': self.misses, 'fetches': self.fetches}
+
+
+class _Transaction(object):
+    """Runs a block in one immediate transaction on an autocommit connection"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+class NotCacheable(Exception):
+    """Raised by a fetch function to hand back a value without caching it"""
+    def __init__(self, value):
+        super(NotCacheable, self).__init__()
+        self.value = value
+
+
+class CachingAdapter(BaseAdapter):
+    """Serve selected GET endpoints from a SQLiteCache.
+
+    cache: SQLiteCache (or a path to one)
+    inner: adapter used for everything else and for cache misses
+    path: server path, to recognise 'Section/RestApi' endpoints
+    endpoints: {'Section/RestApi': ttl seconds}, CACHED_ENDPOINTS by default
+    Only 200 responses are stored. Entries are keyed by URL and a hash of
+    the request's credentials (Authorization and Cookie headers), so a
+    client is only served responses fetched with its own credentials."""
+    def __init__(self, cache, inner=None, path='AgilePointServer', endpoints=None):
+        super(CachingAdapter, self).__init__()
+        self.cache = cache if isinstance(cache, SQLiteCache) else SQLiteCache(cache)
+        self.inner = inner or HTTPAdapter(pool_maxsize=32)
+        self.path = path
+        self.endpoints = CACHED_ENDPOINTS if endpoints is None else endpoints
+
+    @staticmethod
+    def _key(request):
+        credentials = '{}\n{}'.format(request.headers.get('Authorization', ''),
+                                       request.headers.get('Cookie', ''))
+        return 'GET {} {}'.format(request.url,
+                                  hashlib.sha256(credentials.encode('utf-8')).hexdigest())
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        ttl = None
+        if request.method == 'GET' and not kwargs.get('stream'):
+            ttl = self.endpoints.get(endpoint_name(request.url, self.path))
+        if ttl is None:
+            return self.inner.send(request, **kwargs)
+
+        def fetch():
+            resp = self.inner.send(request, **kwargs)
+            entry = {'s': resp.status_code, 'c': resp.headers.get('Content-Type'),
+                     'r': resp.text}
+            if resp.status_code != HTTP_OK:
+                raise NotCacheable(entry)
+            return entry
+        entry = self.cache.get_or_fetch(self._key(request), fetch, ttl)
+        return build_response(request, entry['s'], entry['c'], entry['r'])
+
+    def invalidate(self, url=None):
+        """Forget the entries for one URL (for every account), or every entry"""
+        if url is None:
+            self.cache.clear()
+        else:
+            self.cache.delete_prefix('GET {} '.format(url))
+
+    def close(self):
+        self.inner.close()
+
+
+def _definition_id(definition):
+    for name in ('DefinitionID', 'ProcessDefinitionID', 'ID'):
+        if isinstance(definition, dict) and definition.get(name):
+            return definition[name]
+    return None
+
+
+def warm_cache(agilepoint, xml=True, workers=8):
+    """Fetch every cached endpoint once through agilepoint's cache, e.g.
+    from a pre-fork hook so workers start with a warm cache.
+
+    xml: also fetch get_proc_def_xml for every definition
+    Returns {'Section/RestApi': fetch count}."""
+    counts = {}
+    definitions = unwrap_result(agilepoint.workflow.get_proc_defs()) or []
+    counts['Workflow/GetProcDefs'] = 1
+    agilepoint.admin.get_roles()
+    counts['Admin/GetRoles'] = 1
+    agilepoint.admin.get_register_users()
+    counts['Admin/GetRegisterUsers'] = 1
+    if xml:
+        ids = [i for i in (_definition_id(d) for d in definitions) if i]
+        counts['Workflow/GetProcDefXml'] = 0
+        for _, _, error in parallel_map(agilepoint.workflow.get_proc_def_xml, ids, workers):
+            if error is None:
+                counts['Workflow/GetProcDefXml'] += 1
+    return counts
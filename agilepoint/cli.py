@@ -0,0 +1,321 @@
+"""agilepoint command line
+
+Connection settings come from options or the AGILEPOINT_HOST,
+AGILEPOINT_PATH, AGILEPOINT_USER and AGILEPOINT_PASSWORD environment
+variables.
+
+Single calls print their result as JSON::
+
+    agilepoint call admin.get_database_info
+    agilepoint call workflow.get_proc_inst 9F8E...
+    agilepoint call admin.register_user -s UserName=DOMAIN\\\\bob -s FullName='Bob B'
+
+Bulk commands read ids (one per line, from files or stdin), run on a
+worker pool and stream one JSON line per id as results arrive, then print
+a throughput and latency summary on stderr::
+
+    agilepoint --workers 16 complete ids.txt
+    agilepoint archive < finished.txt
+    agilepoint migrate --source OLD --target NEW --progress done.txt ids.txt
+    agilepoint export --activities ids.txt > instances.ndjson
+    agilepoint each workflow.get_work_item ids.txt
+
+The exit status is 1 when any call failed.
+"""
+from __future__ import print_function
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+from . import AgilePoint
+from ._utils import RateLimiter, parallel_map, unwrap_result
+
+TIMER = getattr(time, 'perf_counter', time.time)
+PERCENTILES = (50, 90, 99)
+
+
+def parse_value(text):
+    """JSON value of a command line argument, or the text itself"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_kwargs(pairs):
+    """{key: value} from key=value arguments"""
+    kwargs = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        if not sep:
+            raise SystemExit('expected key=value, got {}'.format(pair))
+        kwargs[key] = parse_value(value)
+    return kwargs
+
+
+def read_ids(paths):
+    """Ids from files ('-' is stdin), one per line, read lazily. Blank
+    lines and lines starting with # are skipped."""
+    for path in paths or ['-']:
+        handle = sys.stdin if path == '-' else open(path)
+        try:
+            for line in handle:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+def resolve(agilepoint, name):
+    """Bound method for 'workflow.<method>' or 'admin.<method>'"""
+    section, _, method = name.partition('.')
+    if section not in ('workflow', 'admin') or not method or method.startswith('_'):
+        raise SystemExit('method must be workflow.<name> or admin.<name>: {}'.format(name))
+    try:
+        return getattr(getattr(agilepoint, section), method)
+    except AttributeError:
+        raise SystemExit('no such method: {}'.format(name))
+
+
+def percentile(ordered, pct):
+    """Nearest rank percentile of a sorted list"""
+    if not ordered:
+        return float('nan')
+    rank = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+class BulkRun(object):
+    """Run func over ids on a thread pool, streaming NDJSON records.
+
+    Each line is {"id", "ok", "seconds"} plus "result" or "error"."""
+    def __init__(self, func, workers=8, rate=None, out=None):
+        self.func = func
+        self.workers = workers
+        self.limiter = RateLimiter(rate) if rate else None
+        self.out = out or sys.stdout
+        self.latencies = []
+        self.failed = 0
+        self.elapsed = 0.0
+
+    def _timed(self, item):
+        started = TIMER()
+        try:
+            return unwrap_result(self.func(item)), None, TIMER() - started
+        except Exception as error:  # pylint: disable=broad-except
+            return None, error, TIMER() - started
+
+    def run(self, ids):
+        """Process every id; returns the number of failures"""
+        started = TIMER()
+        for item, outcome, _ in parallel_map(self._timed, ids, self.workers, self.limiter):
+            result, error, seconds = outcome
+            if error is None:
+                record = {'id': item, 'ok': True, 'result': result}
+            else:
+                record = {'id': item, 'ok': False,
+                          'error': '{}: {}'.format(type(error).__name__, error)}
+                self.failed += 1
+            record['seconds'] = round(seconds, 6)
+            self.latencies.append(seconds)
+            self.out.write(json.dumps(record, default=str) + '\n')
+            self.out.flush()
+        self.elapsed = TIMER() - started
+        return self.failed
+
+    def summary(self):
+        """One line of throughput and latency figures"""
+        count = len(self.latencies)
+        ordered = sorted(self.latencies)
+        rate = count / self.elapsed if self.elapsed else 0.0
+        latency = ' '.join('p{}={:.1f}ms'.format(pct, percentile(ordered, pct) * 1000)
+                           for pct in PERCENTILES)
+        return ('{} calls, {} ok, {} failed in {:.2f}s ({:.1f}/s); latency {} '
+                'max={:.1f}ms').format(count, count - self.failed, self.failed,
+                                       self.elapsed, rate, latency,
+                                       (ordered[-1] if ordered else float('nan')) * 1000)
+
+
+def client(args):
+    """AgilePoint client from the connection options"""
+    hosts = args.host or [host for host in os.environ.get('AGILEPOINT_HOST', '').split(',')
+                          if host]
+    if not hosts:
+        raise SystemExit('--host or AGILEPOINT_HOST is required')
+    hosts = hosts if len(hosts) > 1 else hosts[0]
+    return AgilePoint(hosts, args.path, args.user, args.password,
+                      http2=args.http2, compression=args.compression or None,
+                      cache=args.cache)
+
+
+def list_methods(args):
+    """Print the workflow and admin methods"""
+    from .admin import Admin
+    from .workflow import Workflow
+    for section, cls in (('workflow', Workflow), ('admin', Admin)):
+        for name, _ in inspect.getmembers(cls, inspect.isfunction if sys.version_info[0] > 2
+                                          else inspect.ismethod):
+            if not name.startswith('_'):
+                print('{}.{}'.format(section, name))
+    return 0
+
+
+def call(args):
+    """Run one method and print its result"""
+    method = resolve(client(args), args.method)
+    result = method(*args.args, **parse_kwargs(args.set))
+    print(json.dumps(result, indent=2, default=str))
+    return 0
+
+
+def bulk(args, func, ids=None):
+    """Run func over ids (default: those of args.files), with summary"""
+    run = BulkRun(func, args.workers, args.rate)
+    try:
+        failed = run.run(read_ids(args.files) if ids is None else ids)
+    except KeyboardInterrupt:
+        failed = run.failed + 1
+    if not args.quiet:
+        print(run.summary(), file=sys.stderr)
+    return 1 if failed else 0
+
+
+def each(args):
+    """method(id, **kwargs) for every id"""
+    method = resolve(client(args), args.method)
+    kwargs = parse_kwargs(args.set)
+    return bulk(args, lambda item: method(item, **kwargs))
+
+
+def complete(args):
+    """complete_work_item for every work item id"""
+    workflow = client(args).workflow
+    return bulk(args, lambda item: workflow.complete_work_item(item, clientData=args.client_data))
+
+
+def archive(args):
+    """archive_proc_inst for every process instance id"""
+    workflow = client(args).workflow
+    return bulk(args, workflow.archive_proc_inst)
+
+
+def migrate(args):
+    """Migrate every process instance id with one shared payload"""
+    from .migration import BulkMigration
+    migration = BulkMigration(
+        client(args), args.source, args.target,
+        mapping=dict(pair.split('=', 1) for pair in args.map or []),
+        matching=parse_value(args.matching) if args.matching else None,
+        action=args.action, include_xml_data=args.include_xml_data,
+        verify=not args.no_verify, progress_path=args.progress)
+    # Computes the activity mapping and the shared payload up front
+    migration.payload  # pylint: disable=pointless-statement
+    if migration.unmapped:
+        print('activities without a target: {}'.format(', '.join(migration.unmapped)),
+              file=sys.stderr)
+    done = migration.done()
+
+    def run(item):
+        migration.migrate_one(item)
+        migration.record(item)
+        return True
+    return bulk(args, run, (item for item in read_ids(args.files) if item not in done))
+
+
+def export(args):
+    """get_proc_inst (and optionally its activities) for every id"""
+    workflow = client(args).workflow
+
+    def fetch(item):
+        instance = unwrap_result(workflow.get_proc_inst(item))
+        if args.activities and isinstance(instance, dict):
+            instance['Activities'] = unwrap_result(
+                workflow.get_activity_insts_by_p_i_i_d(item))
+        return instance
+    return bulk(args, fetch)
+
+
+def parser():
+    """argparse parser of the command line"""
+    env = os.environ.get
+    main_parser = argparse.ArgumentParser(
+        prog='agilepoint', description='AgilePoint REST API client',
+        epilog='Connection options default to AGILEPOINT_HOST (comma separated), '
+               'AGILEPOINT_PATH, AGILEPOINT_USER and AGILEPOINT_PASSWORD.')
+    main_parser.add_argument('--host', action='append',
+                             help='server URL; repeat to balance over several nodes')
+    main_parser.add_argument('--path', default=env('AGILEPOINT_PATH', 'AgilePointServer'))
+    main_parser.add_argument('--user', default=env('AGILEPOINT_USER'))
+    main_parser.add_argument('--password', default=env('AGILEPOINT_PASSWORD'))
+    main_parser.add_argument('--http2', action='store_true', help='needs the http2 extra')
+    main_parser.add_argument('--compression', action='store_true',
+                             help='gzip large request bodies')
+    main_parser.add_argument('--cache', metavar='PATH', help='shared SQLite response cache')
+    main_parser.add_argument('--workers', type=int, default=8, help='concurrent bulk calls')
+    main_parser.add_argument('--rate', type=float, help='maximum bulk calls per second')
+    main_parser.add_argument('--quiet', action='store_true', help='no summary on stderr')
+    commands = main_parser.add_subparsers(dest='command', metavar='command')
+
+    sub = commands.add_parser('methods', help='list the workflow and admin methods')
+    sub.set_defaults(handler=list_methods)
+
+    sub = commands.add_parser('call', help='call one method and print the result')
+    sub.add_argument('method', help='workflow.<name> or admin.<name>')
+    sub.add_argument('args', nargs='*', help='path arguments')
+    sub.add_argument('-s', '--set', action='append', metavar='KEY=VALUE',
+                     help='body argument; JSON values are decoded')
+    sub.set_defaults(handler=call)
+
+    sub = commands.add_parser('each', help='call a method for every id')
+    sub.add_argument('method', help='workflow.<name> or admin.<name>')
+    sub.add_argument('-s', '--set', action='append', metavar='KEY=VALUE',
+                     help='body argument; JSON values are decoded')
+    sub.set_defaults(handler=each)
+
+    sub = commands.add_parser('complete', help='complete work items')
+    sub.add_argument('--client-data', default='')
+    sub.set_defaults(handler=complete)
+
+    sub = commands.add_parser('archive', help='archive process instances')
+    sub.set_defaults(handler=archive)
+
+    sub = commands.add_parser('migrate', help='migrate process instances to another version')
+    sub.add_argument('--source', required=True, help='source process definition id')
+    sub.add_argument('--target', required=True, help='target process definition id')
+    sub.add_argument('--map', action='append', metavar='SOURCE=TARGET',
+                     help='activity mapping overriding the match by name')
+    sub.add_argument('--matching', help='ready MatchingActivityDefinition, as JSON')
+    sub.add_argument('--no-verify', action='store_true',
+                     help='skip checking each instance with get_proc_inst')
+    sub.add_argument('--progress', metavar='PATH',
+                     help='record migrated ids here and skip those already in it')
+    sub.add_argument('--action', default='Migrate')
+    sub.add_argument('--include-xml-data', action='store_true')
+    sub.set_defaults(handler=migrate)
+
+    sub = commands.add_parser('export', help='print process instances')
+    sub.add_argument('--activities', action='store_true',
+                     help='include the activity instances')
+    sub.set_defaults(handler=export)
+
+    for name in ('each', 'complete', 'archive', 'migrate', 'export'):
+        commands.choices[name].add_argument(
+            'files', nargs='*', metavar='FILE', help='files of ids; stdin by default')
+    return main_parser
+
+
+def main(argv=None):
+    """Entry point of the agilepoint command"""
+    args = parser().parse_args(argv)
+    if not getattr(args, 'handler', None):
+        parser().print_help()
+        return 2
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
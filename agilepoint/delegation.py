@@ -0,0 +1,286 @@
+"""Bulk delegation planning and apply
+
+Setting up thousands of holiday delegations one add_delegation call at a
+time is slow and leaves a mess when something fails half way. The planner
+fetches the existing delegations of every user involved concurrently,
+works out the minimal create/update/activate/cancel operations to reach the
+desired set, and applies them on a thread pool, undoing the completed
+operations if any fail.
+
+Example::
+
+    planner = DelegationPlanner(ap, workers=16)
+    plan = planner.plan([
+        {'FromUser': 'DOMAIN\\\\alice', 'ToUser': 'DOMAIN\\\\bob',
+         'StartDate': datetime.datetime(2017, 12, 20), 'EndDate': datetime.datetime(2018, 1, 3),
+         'Description': 'Holiday'},
+    ])
+    print(plan)
+    report = planner.apply(plan, progress=lambda done, total: print(done, total))
+"""
+import collections
+import datetime
+import logging
+from ._utils import parallel_map, parse_date, unwrap_result, wcf_date
+
+CREATE = 'create'
+UPDATE = 'update'
+ACTIVATE = 'activate'
+CANCEL = 'cancel'
+ACTIVE = 'Active'
+CLOSED_STATUSES = frozenset(['Canceled', 'Cancelled', 'Expired', 'Removed'])
+DATE_FIELDS = ('StartDate', 'EndDate')
+COMPARED_FIELDS = DATE_FIELDS + ('Description',)
+# UpdateDelegation takes the whole record
+RECORD_FIELDS = ('DelegationID', 'FromUser', 'ToUser') + COMPARED_FIELDS + ('Status',)
+# Sent instead of an empty field when restoring a record
+RESTORE_DEFAULTS = {'Description': ''}
+
+
+class Operation(object):
+    """One delegation call of a plan.
+
+    fields: the record to create or update
+    previous: the existing record as it was, to undo the operation"""
+    __slots__ = ('action', 'key', 'delegation_id', 'fields', 'previous')
+
+    def __init__(self, action, key, delegation_id=None, fields=None, previous=None):
+        self.action = action
+        self.key = key
+        self.delegation_id = delegation_id
+        self.fields = fields or {}
+        self.previous = previous or {}
+
+    def __repr__(self):
+        return '<Operation: {} {} -> {} {}>'.format(
+            self.action, self.key[0], self.key[1], self.delegation_id or '')
+
+
+class DelegationPlan(object):
+    """Operations grouped per (FromUser, ToUser), in the order they run"""
+    def __init__(self):
+        self.groups = collections.OrderedDict()
+        self.unchanged = 0
+
+    def add(self, operation):
+        """Append an operation to its delegation's group"""
+        self.groups.setdefault(operation.key, []).append(operation)
+
+    @property
+    def operations(self):
+        """Every operation of the plan"""
+        return [op for group in self.groups.values() for op in group]
+
+    def counts(self):
+        """{action: operation count}"""
+        counts = collections.Counter(op.action for op in self.operations)
+        return dict(counts)
+
+    def __len__(self):
+        return sum(len(group) for group in self.groups.values())
+
+    def __repr__(self):
+        counts = self.counts()
+        return '<DelegationPlan: {} unchanged={}>'.format(
+            ' '.join('{}={}'.format(action, counts.get(action, 0))
+                     for action in (CREATE, UPDATE, ACTIVATE, CANCEL)),
+            self.unchanged)
+
+
+class DelegationReport(object):
+    """Outcome of DelegationPlanner.apply"""
+    def __init__(self):
+        self.applied = []
+        self.failures = []
+        self.rolled_back = []
+        self.rollback_failures = []
+
+    @property
+    def ok(self):
+        """True when every operation was applied"""
+        return not self.failures
+
+    def __repr__(self):
+        return ('<DelegationReport: applied={} failed={} rolled_back={} '
+                'rollback_failed={}>').format(
+                    len(self.applied), len(self.failures), len(self.rolled_back),
+                    len(self.rollback_failures))
+
+
+def _normalise(name, value):
+    if name in DATE_FIELDS:
+        return parse_date(value)
+    return value
+
+
+def _changes(fields, existing):
+    """Compared fields differing between desired fields and an existing
+    delegation"""
+    return [name for name in COMPARED_FIELDS
+            if _normalise(name, fields[name]) != _normalise(name, existing.get(name))]
+
+
+def _send_value(value):
+    if isinstance(value, datetime.datetime):
+        return wcf_date(value)
+    return value
+
+
+class DelegationPlanner(object):
+    """Plan and apply a desired set of delegations.
+
+    workers: concurrent calls, for fetching and applying
+    cancel_missing: cancel open delegations of the users in the desired
+        set that the desired set does not contain
+    Delegations are matched on (FromUser, ToUser), case insensitively;
+    when a pair has several open delegations the closest one is updated
+    and the others are cancelled with cancel_missing.
+    Desired delegations are dicts of FromUser, ToUser, StartDate, EndDate,
+    Description and optionally Status ('Active' by default, or
+    'Inactive'); dates may be datetimes or AgilePoint date strings."""
+    id_key = 'DelegationID'
+
+    def __init__(self, agilepoint, workers=8, cancel_missing=False):
+        self.agilepoint = agilepoint
+        self.workers = workers
+        self.cancel_missing = cancel_missing
+
+    @staticmethod
+    def key(delegation):
+        """(from user, to user) identifying a delegation"""
+        return ((delegation.get('FromUser') or '').lower(),
+                (delegation.get('ToUser') or '').lower())
+
+    def existing(self, from_users):
+        """{delegation id: open delegation} for the given users, fetched
+        concurrently"""
+        def fetch(user):
+            return unwrap_result(self.agilepoint.admin.get_delegations('', FromUser=user)) or []
+
+        found = {}
+        for _, result, error in parallel_map(fetch, sorted(set(from_users)), self.workers):
+            if error is not None:
+                raise error
+            for delegation in result:
+                if delegation.get('Status') not in CLOSED_STATUSES:
+                    found[delegation[self.id_key]] = delegation
+        return found
+
+    def plan(self, desired):
+        """DelegationPlan turning the current delegations into desired"""
+        wanted = collections.OrderedDict((self.key(d), d) for d in desired)
+        current = collections.defaultdict(list)
+        for existing in self.existing(d['FromUser'] for d in wanted.values()).values():
+            current[self.key(existing)].append(existing)
+        unwanted = [existing for key, found in current.items() if key not in wanted
+                    for existing in found]
+        plan = DelegationPlan()
+        for key, delegation in wanted.items():
+            status = delegation.get('Status') or ACTIVE
+            fields = dict((name, delegation.get(name)) for name in
+                          ('FromUser', 'ToUser') + COMPARED_FIELDS)
+            # The delegation needing the fewest changes is kept, preferring active ones
+            found = sorted(current.get(key, []), key=lambda d: (
+                len(_changes(fields, d)), d.get('Status') != ACTIVE, d[self.id_key]))
+            if not found:
+                plan.add(Operation(CREATE, key, fields=fields))
+                if status == ACTIVE:
+                    plan.add(Operation(ACTIVATE, key))
+                continue
+            existing = found[0]
+            unwanted.extend(found[1:])
+            delegation_id = existing[self.id_key]
+            previous = dict((name, existing.get(name)) for name in RECORD_FIELDS)
+            changed = _changes(fields, existing)
+            if changed:
+                record = dict(previous)
+                record.update((name, fields[name]) for name in changed)
+                plan.add(Operation(UPDATE, key, delegation_id, record, previous))
+            activate = status == ACTIVE and existing.get('Status') != ACTIVE
+            if activate:
+                plan.add(Operation(ACTIVATE, key, delegation_id, previous=previous))
+            if not changed and not activate:
+                plan.unchanged += 1
+        if self.cancel_missing:
+            for existing in unwanted:
+                plan.add(Operation(CANCEL, self.key(existing), existing[self.id_key],
+                                   previous=dict((name, existing.get(name))
+                                                 for name in RECORD_FIELDS)))
+        return plan
+
+    def _run(self, operation):
+        admin = self.agilepoint.admin
+        if operation.action == CREATE:
+            created = unwrap_result(admin.add_delegation(**dict(
+                (name, _send_value(value)) for name, value in operation.fields.items())))
+            operation.delegation_id = created[self.id_key]
+        elif operation.action == UPDATE:
+            admin.update_delegation(**dict(
+                (name, _send_value(value)) for name, value in operation.fields.items()))
+        elif operation.action == ACTIVATE:
+            admin.activate_delegation(operation.delegation_id)
+        elif operation.action == CANCEL:
+            admin.cancel_delegation(operation.delegation_id)
+
+    def _undo(self, operation, created):
+        """Undo an applied operation; created holds the ids of the
+        delegations the plan created, whose removal undoes them entirely"""
+        admin = self.agilepoint.admin
+        if operation.action == CREATE:
+            admin.remove_delegation(operation.delegation_id)
+        elif operation.delegation_id in created:
+            return
+        elif not operation.previous.get(self.id_key):
+            raise ValueError('no previous record of {} to restore'.format(
+                operation.delegation_id))
+        else:
+            # Empty fields go back as the server returned them, or as their default
+            admin.update_delegation(**dict(
+                (name, RESTORE_DEFAULTS.get(name) if value is None else value)
+                for name, value in operation.previous.items()))
+
+    def apply(self, plan, progress=None, rollback=True):
+        """Run a plan and return a DelegationReport.
+
+        Each delegation's operations run in order; different delegations
+        run in parallel. progress(done, total) is called as operations
+        finish. With rollback, any failure undoes every applied operation
+        in reverse order (a created delegation is removed, updated fields
+        and statuses are restored)."""
+        report = DelegationReport()
+        total = len(plan)
+
+        def run_group(group):
+            done = []
+            for operation in group:
+                # An activate after a create needs the id the create produced
+                if operation.delegation_id is None and done:
+                    operation.delegation_id = done[0].delegation_id
+                try:
+                    self._run(operation)
+                except Exception as error:  # pylint: disable=broad-except
+                    return done, (operation, error)
+                done.append(operation)
+            return done, None
+
+        for _, result, error in parallel_map(run_group, list(plan.groups.values()),
+                                             self.workers):
+            done, failure = result if error is None else ([], (None, error))
+            report.applied.extend(done)
+            if failure is not None:
+                logging.error('Delegation %r failed: %s', failure[0], failure[1])
+                report.failures.append(failure)
+            if progress is not None:
+                progress(len(report.applied) + len(report.failures), total)
+
+        if report.failures and rollback:
+            created = set(operation.delegation_id for operation in report.applied
+                          if operation.action == CREATE)
+            for operation in reversed(report.applied):
+                try:
+                    self._undo(operation, created)
+                    report.rolled_back.append(operation)
+                except Exception as error:  # pylint: disable=broad-except
+                    logging.error('Rollback of %r failed: %s', operation, error)
+                    report.rollback_failures.append((operation, error))
+        return report
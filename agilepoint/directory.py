@@ -0,0 +1,232 @@
+"""In-memory index of users, groups, roles and their memberships
+
+Answering "is user U in group G / role R" with get_group_members or
+query_role_members costs a round trip per check. DirectoryIndex loads the
+registered users, groups, roles and every membership concurrently, interns
+the names to small integers and keeps both forward (group -> users) and
+inverted (user -> groups, roles) maps, so membership checks are a couple of
+dict and set lookups. Names are matched case insensitively, as Windows
+account names are.
+
+Example::
+
+    directory = DirectoryIndex(ap, workers=16).load()
+    directory.in_group('DOMAIN\\\\alice', 'Finance')
+    directory.has_role('DOMAIN\\\\alice', 'Approvers')   # directly or through a group
+    directory.refresh(groups=['Finance'])               # re-read one group only
+"""
+import sys
+import threading
+from ._utils import parallel_map, unwrap_result
+
+EMPTY = frozenset()
+_intern = getattr(sys, 'intern', None) or intern  # pylint: disable=undefined-variable
+
+
+class Names(object):
+    """Interned names numbered in order of first sight.
+
+    add() runs under the index lock; get() and names lookups do not, so a
+    name is appended before its id is published."""
+    __slots__ = ('names', 'ids')
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def add(self, name):
+        """Id of name, numbering it if new"""
+        key = name.lower()
+        found = self.ids.get(key)
+        if found is None:
+            found = len(self.names)
+            self.names.append(_intern(name))
+            self.ids[key] = found
+        return found
+
+    def get(self, name):
+        """Id of name, or None"""
+        return self.ids.get(name.lower()) if name else None
+
+    def __len__(self):
+        return len(self.names)
+
+
+class DirectoryIndex(object):
+    """Users, groups and roles with forward and inverted membership maps.
+
+    workers: concurrent calls while loading and refreshing
+    Every map holds frozensets that are replaced, never changed in place,
+    so lookups need no lock while a refresh runs on another thread."""
+    user_key = 'UserName'
+    group_key = 'GroupName'
+    role_key = 'RoleName'
+    assignee_key = 'Assignee'
+    assignee_type_key = 'AssigneeType'
+
+    def __init__(self, agilepoint, workers=8):
+        self.agilepoint = agilepoint
+        self.workers = workers
+        self.users = {}
+        self.groups = {}
+        self.roles = {}
+        self._users = Names()
+        self._groups = Names()
+        self._roles = Names()
+        self._group_users = {}
+        self._user_groups = {}
+        self._role_users = {}
+        self._user_roles = {}
+        self._role_groups = {}
+        self._group_roles = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, calls):
+        """Run {key: zero-argument call} concurrently; {key: result}"""
+        results = {}
+        for key, result, error in parallel_map(lambda key: unwrap_result(calls[key]()),
+                                               list(calls), self.workers):
+            if error is not None:
+                raise error
+            results[key] = result or []
+        return results
+
+    def load(self):
+        """Read everything; returns self"""
+        self.refresh(groups=True, roles=True, users=True)
+        return self
+
+    @staticmethod
+    def _move(inverse, item, before, after):
+        """Update inverse[member] for item's members changing before -> after"""
+        for member in before - after:
+            inverse[member] = inverse.get(member, EMPTY) - frozenset([item])
+        for member in after - before:
+            inverse[member] = inverse.get(member, EMPTY) | frozenset([item])
+
+    def refresh(self, groups=None, roles=None, users=False):
+        """Re-read part of the directory and apply the differences.
+
+        groups/roles: names whose members are re-read, or True for the full
+            list (groups and roles removed from the server are dropped)
+        users: also re-read the registered users"""
+        admin = self.agilepoint.admin
+        calls = {}
+        if users:
+            calls['users'] = admin.get_register_users
+        if groups is True:
+            calls['groups'] = admin.get_groups
+        if roles is True:
+            calls['roles'] = admin.get_roles
+        listed = self._fetch(calls)
+        if groups is True:
+            groups = [record[self.group_key] for record in listed['groups']]
+        if roles is True:
+            roles = [record[self.role_key] for record in listed['roles']]
+        members = {}
+        for name in groups or []:
+            members['group', name] = (lambda name=name: admin.get_group_members(name))
+        for name in roles or []:
+            members['role', name] = (lambda name=name: admin.query_role_members(name))
+        members = self._fetch(members)
+
+        with self._lock:
+            if users:
+                self.users = dict((record[self.user_key].lower(), record)
+                                  for record in listed['users'])
+                for record in listed['users']:
+                    self._users.add(record[self.user_key])
+            if 'groups' in listed:
+                self.groups = dict((record[self.group_key].lower(), record)
+                                   for record in listed['groups'])
+                for gid in list(self._group_users):
+                    if self._groups.names[gid].lower() not in self.groups:
+                        self._set_group(gid, EMPTY)
+            if 'roles' in listed:
+                self.roles = dict((record[self.role_key].lower(), record)
+                                  for record in listed['roles'])
+                for rid in list(self._role_users):
+                    if self._roles.names[rid].lower() not in self.roles:
+                        self._set_role(rid, EMPTY, EMPTY)
+            for (kind, name), records in members.items():
+                if kind == 'group':
+                    self._set_group(self._groups.add(name), frozenset(
+                        self._users.add(record[self.user_key]) for record in records))
+                    continue
+                role_users, role_groups = set(), set()
+                for record in records:
+                    if record.get(self.assignee_type_key) == 'Group':
+                        role_groups.add(self._groups.add(record[self.assignee_key]))
+                    else:
+                        role_users.add(self._users.add(record[self.assignee_key]))
+                self._set_role(self._roles.add(name), frozenset(role_users),
+                               frozenset(role_groups))
+        return self
+
+    def _set_group(self, gid, users):
+        self._move(self._user_groups, gid, self._group_users.get(gid, EMPTY), users)
+        self._group_users[gid] = users
+
+    def _set_role(self, rid, users, groups):
+        self._move(self._user_roles, rid, self._role_users.get(rid, EMPTY), users)
+        self._move(self._group_roles, rid, self._role_groups.get(rid, EMPTY), groups)
+        self._role_users[rid] = users
+        self._role_groups[rid] = groups
+
+    def in_group(self, user, group):
+        """True if user is a member of group"""
+        return self._groups.get(group) in self._user_groups.get(self._users.get(user), EMPTY)
+
+    def has_role(self, user, role):
+        """True if user is assigned role, directly or through a group"""
+        uid = self._users.get(user)
+        rid = self._roles.get(role)
+        if rid is None or uid is None:
+            return False
+        if rid in self._user_roles.get(uid, EMPTY):
+            return True
+        group_roles = self._group_roles
+        return any(rid in group_roles.get(gid, EMPTY)
+                   for gid in self._user_groups.get(uid, EMPTY))
+
+    def groups_of(self, user):
+        """Names of the groups of user"""
+        names = self._groups.names
+        return sorted(names[gid] for gid in
+                      self._user_groups.get(self._users.get(user), EMPTY))
+
+    def roles_of(self, user):
+        """Names of the roles of user, direct or through a group"""
+        uid = self._users.get(user)
+        rids = set(self._user_roles.get(uid, EMPTY))
+        for gid in self._user_groups.get(uid, EMPTY):
+            rids.update(self._group_roles.get(gid, EMPTY))
+        names = self._roles.names
+        return sorted(names[rid] for rid in rids)
+
+    def members(self, group):
+        """User names in group"""
+        names = self._users.names
+        return sorted(names[uid] for uid in
+                      self._group_users.get(self._groups.get(group), EMPTY))
+
+    def role_members(self, role, expand=True):
+        """User names assigned role; with expand, including the members of
+        groups assigned it"""
+        rid = self._roles.get(role)
+        uids = set(self._role_users.get(rid, EMPTY))
+        if expand:
+            for gid in self._role_groups.get(rid, EMPTY):
+                uids.update(self._group_users.get(gid, EMPTY))
+        names = self._users.names
+        return sorted(names[uid] for uid in uids)
+
+    def user(self, name):
+        """Registered user record, or None"""
+        return self.users.get(name.lower())
+
+    def __repr__(self):
+        return '<DirectoryIndex: users={} groups={} roles={} memberships={}>'.format(
+            len(self.users), len(self.groups), len(self.roles),
+            sum(len(users) for users in self._group_users.values()) +
+            sum(len(users) for users in self._role_users.values()))
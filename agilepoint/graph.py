@@ -0,0 +1,223 @@
+"""In-memory execution graphs of process instances
+
+Debugging a stuck instance means combining get_proc_inst, the activity
+instances and their status, the events and the work items behind them.
+GraphBuilder fetches all of that concurrently for one or many instances,
+following sub-process instances, and returns an ExecutionGraph indexed by
+id, instance, activity and definition.
+
+Example::
+
+    graph = GraphBuilder(ap, workers=16).for_definition(definition_id)
+    for activity, instances in graph.blocked_by_activity(definition_id).items():
+        print(activity, len(instances))
+    graph.work_items_of(graph.activities_of(instance_id)[0])
+"""
+import collections
+import logging
+from ._utils import parallel_map, unwrap_result
+
+# Statuses after which an instance, activity or work item is no longer active
+CLOSED_STATUSES = frozenset(['Completed', 'Canceled', 'Cancelled', 'Archived',
+                             'Deleted', 'Removed', 'Skipped'])
+
+
+class ExecutionGraph(object):
+    """Process instances with their activities, work items and events.
+
+    Records are the dicts returned by the server, looked up by id in the
+    instances, activities, work_items and events dicts; the *_of methods
+    and by_definition are index lookups."""
+    instance_key = 'ProcessInstanceID'
+    activity_key = 'ActivityInstanceID'
+    work_item_key = 'WorkItemID'
+    event_key = 'EventID'
+    definition_key = 'DefinitionID'
+    parent_key = 'ParentProcessInstanceID'
+    name_key = 'Name'
+    status_key = 'Status'
+
+    def __init__(self):
+        self.instances = {}
+        self.activities = {}
+        self.work_items = {}
+        self.events = {}
+        self.errors = []
+        self._activities = collections.defaultdict(list)
+        self._work_items = collections.defaultdict(list)
+        self._instance_work_items = collections.defaultdict(list)
+        self._events = collections.defaultdict(list)
+        self._children = collections.defaultdict(list)
+        self._definitions = collections.defaultdict(set)
+
+    def add_instance(self, record):
+        """Index a process instance"""
+        piid = record[self.instance_key]
+        self.instances[piid] = record
+        self._definitions[record.get(self.definition_key)].add(piid)
+        parent = record.get(self.parent_key)
+        if parent and piid not in self._children[parent]:
+            self._children[parent].append(piid)
+
+    def add_activity(self, record):
+        """Index an activity instance, merging repeated records for it"""
+        aiid = record[self.activity_key]
+        if aiid in self.activities:
+            self.activities[aiid].update(record)
+            return
+        self.activities[aiid] = dict(record)
+        self._activities[record.get(self.instance_key)].append(aiid)
+
+    def add_work_item(self, record):
+        """Index a work item"""
+        wiid = record[self.work_item_key]
+        if wiid not in self.work_items:
+            self._work_items[record.get(self.activity_key)].append(wiid)
+            self._instance_work_items[record.get(self.instance_key)].append(wiid)
+        self.work_items[wiid] = record
+
+    def add_event(self, record):
+        """Index an event"""
+        evid = record[self.event_key]
+        if evid not in self.events:
+            self._events[record.get(self.instance_key)].append(evid)
+        self.events[evid] = record
+
+    def activities_of(self, piid):
+        """Activity instance ids of a process instance, in server order"""
+        return self._activities.get(piid, [])
+
+    def work_items_of(self, aiid):
+        """Work item ids of an activity instance"""
+        return self._work_items.get(aiid, [])
+
+    def instance_work_items(self, piid):
+        """Work item ids of a process instance"""
+        return self._instance_work_items.get(piid, [])
+
+    def events_of(self, piid):
+        """Event ids of a process instance"""
+        return self._events.get(piid, [])
+
+    def children_of(self, piid):
+        """Sub-process instance ids started by a process instance"""
+        return self._children.get(piid, [])
+
+    def by_definition(self, definition_id):
+        """Process instance ids of a definition"""
+        return self._definitions.get(definition_id, set())
+
+    def is_open(self, record):
+        """True unless record has reached a closed status"""
+        return record.get(self.status_key) not in CLOSED_STATUSES
+
+    def blocked(self, piid):
+        """[(activity id, [open work item ids])] where an open instance
+        waits: its open activities, and those of its open children"""
+        instance = self.instances.get(piid)
+        if instance is None or not self.is_open(instance):
+            return []
+        waiting = []
+        for aiid in self.activities_of(piid):
+            if self.is_open(self.activities[aiid]):
+                waiting.append((aiid, [wiid for wiid in self.work_items_of(aiid)
+                                       if self.is_open(self.work_items[wiid])]))
+        for child in self.children_of(piid):
+            waiting.extend(self.blocked(child))
+        return waiting
+
+    def blocked_by_activity(self, definition_id):
+        """{activity name: [process instance ids waiting there]} for every
+        open instance of a definition"""
+        result = collections.defaultdict(list)
+        for piid in sorted(self.by_definition(definition_id)):
+            for aiid, _ in self.blocked(piid):
+                result[self.activities[aiid].get(self.name_key)].append(piid)
+        return dict(result)
+
+    def __repr__(self):
+        return ('<ExecutionGraph: instances={} activities={} work_items={} '
+                'events={} errors={}>').format(
+                    len(self.instances), len(self.activities), len(self.work_items),
+                    len(self.events), len(self.errors))
+
+
+class GraphBuilder(object):
+    """Fetch process instances into an ExecutionGraph on a thread pool.
+
+    workers: concurrent calls to the server
+    children: follow sub-process instances (found with query_proc_insts on
+        the graph's parent_key) this many levels deep
+    work_items: fetch every work item referenced by the instance events
+        with get_procedure
+    Failed calls are recorded in graph.errors as (call, id, exception)
+    rather than aborting the build."""
+    graph_class = ExecutionGraph
+
+    def __init__(self, agilepoint, workers=8, children=3, work_items=True):
+        self.agilepoint = agilepoint
+        self.workers = workers
+        self.children = children
+        self.work_items = work_items
+
+    def _calls(self, graph):
+        workflow = self.agilepoint.workflow
+        return {
+            'instance': (workflow.get_proc_inst, graph.add_instance),
+            'activities': (workflow.get_activity_insts_by_p_i_i_d, graph.add_activity),
+            'status': (workflow.get_activity_inst_status, graph.add_activity),
+            'events': (workflow.get_events_by_proc_inst_i_d, graph.add_event),
+            'work_item': (workflow.get_procedure, graph.add_work_item),
+            'children': (lambda piid: workflow.query_proc_insts(
+                ColumnName=graph.parent_key, Operator='=', IsValue=piid),
+                         graph.add_instance),
+        }
+
+    def _fetch(self, graph, tasks):
+        """Run (call name, id) tasks, feeding results into graph"""
+        calls = self._calls(graph)
+
+        def run(task):
+            return unwrap_result(calls[task[0]][0](task[1]))
+
+        for task, result, error in parallel_map(run, tasks, self.workers):
+            if error is not None:
+                logging.warning('Graph fetch %s(%s) failed: %s', task[0], task[1], error)
+                graph.errors.append((task[0], task[1], error))
+                continue
+            add = calls[task[0]][1]
+            for record in result if isinstance(result, list) else [result]:
+                if isinstance(record, dict):
+                    add(record)
+
+    def build(self, process_instance_ids, graph=None):
+        """ExecutionGraph of the given instances (added to graph if given)"""
+        graph = graph or self.graph_class()
+        pending = [piid for piid in process_instance_ids if piid]
+        depth = 0
+        while pending:
+            self._fetch(graph, [(call, piid) for piid in pending
+                                for call in ('instance', 'activities', 'status', 'events')])
+            follow_up = []
+            if self.work_items:
+                follow_up.extend(
+                    ('work_item', wiid) for wiid in sorted(set(
+                        graph.events[evid].get(graph.work_item_key)
+                        for piid in pending for evid in graph.events_of(piid)))
+                    if wiid and wiid not in graph.work_items)
+            if depth < self.children:
+                follow_up.extend(('children', piid) for piid in pending)
+            known = set(graph.instances)
+            self._fetch(graph, follow_up)
+            pending = [piid for piid in graph.instances if piid not in known]
+            depth += 1
+        return graph
+
+    def for_definition(self, definition_id, open_only=True):
+        """ExecutionGraph of the instances of a process definition"""
+        graph = self.graph_class()
+        found = unwrap_result(self.agilepoint.workflow.query_proc_insts(
+            ColumnName=graph.definition_key, Operator='=', IsValue=definition_id)) or []
+        ids = [record.get(graph.instance_key) for record in found
+               if not open_only or graph.is_open(record)]
+        return self.build(ids, graph)
@@ -0,0 +1,348 @@
+"""Durable write-behind journal for AgilePoint mutations
+
+Callers that must not block on AgilePoint, but must not lose writes either,
+enqueue calls such as complete_work_item or set_custom_attrs into a SQLite
+journal (WAL mode, so an enqueue is one small appended and synced commit).
+Background workers replay them with retries and exponential backoff.
+Calls for the same target run one at a time in enqueue order, and enqueue
+blocks once too many calls are pending.
+
+Example::
+
+    journal = MutationJournal(ap, '/var/lib/app/agilepoint-journal.sqlite', workers=4)
+    journal.start()
+    journal.enqueue('workflow.complete_work_item', (workitemid,),
+                    {'clientData': ''}, key='complete-' + workitemid)
+    ...
+    journal.close()         # waits for pending calls
+
+Calls left pending when the process stops are replayed by the next
+MutationJournal opened on the same file. Several processes may share one
+journal: each claimed call carries its owner and a lease, and only calls
+whose lease expired (their process died or hung) are claimed again.
+"""
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from .exceptions import AgilePointBadResponse, InvalidArg, MissingRequiredArg
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+# Answers worth retrying; any other HTTP error is permanent
+RETRY_STATUSES = frozenset([408, 429, 500, 502, 503, 504])
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS mutations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    target TEXT NOT NULL,
+    method TEXT NOT NULL,
+    args TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_try REAL NOT NULL,
+    created REAL NOT NULL,
+    finished REAL,
+    error TEXT,
+    owner TEXT,
+    lease REAL);
+CREATE INDEX IF NOT EXISTS mutations_target ON mutations (target, state, seq);
+CREATE INDEX IF NOT EXISTS mutations_state ON mutations (state, next_try);
+'''
+
+# Columns added since the first schema: name, definition
+ADDED_COLUMNS = (('owner', 'TEXT'), ('lease', 'REAL'))
+SYNCHRONOUS = ('FULL', 'NORMAL')
+# Seconds between pending count checks while waiting on other processes
+POLL_INTERVAL = 0.5
+
+RECLAIM = '''
+UPDATE mutations SET state = 'pending', owner = NULL, lease = NULL
+WHERE state = 'running' AND (lease IS NULL OR lease < ?)
+'''
+
+CLAIM = '''
+SELECT seq, key, method, args, kwargs, attempts FROM mutations m
+WHERE state = 'pending' AND next_try <= ? AND NOT EXISTS (
+    SELECT 1 FROM mutations o
+    WHERE o.target = m.target AND o.seq < m.seq AND o.state IN ('pending', 'running'))
+    AND NOT EXISTS (
+    SELECT 1 FROM mutations r WHERE r.target = m.target AND r.state = 'running')
+ORDER BY seq LIMIT 1
+'''
+
+
+class JournalFull(Exception):
+    """Raised by enqueue when the pending limit is reached and the wait
+    for room timed out"""
+
+
+def is_permanent(error):
+    """True for failures a retry cannot fix"""
+    if isinstance(error, (MissingRequiredArg, InvalidArg, TypeError, AttributeError)):
+        return True
+    if isinstance(error, AgilePointBadResponse):
+        return error.status_code not in RETRY_STATUSES
+    return False
+
+
+class MutationJournal(object):
+    """Journal of AgilePoint calls replayed by background workers.
+
+    path: SQLite file holding the journal
+    workers: threads replaying calls
+    max_pending: enqueue blocks while this many calls are pending in the
+        file, counting those of other journals sharing it
+    max_attempts: failed attempts before a call is marked failed
+    backoff/max_backoff: seconds before the first retry, doubling per
+        attempt up to max_backoff, with jitter
+    enqueue_timeout: seconds enqueue waits for room before raising
+        JournalFull; None waits forever
+    lease_timeout: seconds a claimed call stays with its worker; once it
+        expires another worker or process may run the call again, so it
+        must exceed the longest call
+    synchronous: SQLite synchronous mode, 'FULL' (default) or 'NORMAL'.
+        FULL syncs every enqueue to disk, so a power loss or OS crash
+        loses nothing that enqueue returned for. NORMAL makes enqueues
+        cheaper but may lose the last ones on such a crash (a crash of
+        the process alone loses nothing either way).
+    Calls answering 4xx (other than 408/429) or failing validation are
+    marked failed at once and kept for inspection (see failures())."""
+    def __init__(self, agilepoint, path, workers=4, max_pending=10000, max_attempts=8,
+                 backoff=1.0, max_backoff=300.0, enqueue_timeout=None,
+                 lease_timeout=600.0, synchronous='FULL'):
+        if synchronous not in SYNCHRONOUS:
+            raise ValueError('synchronous must be one of {}'.format(', '.join(SYNCHRONOUS)))
+        self.agilepoint = agilepoint
+        self.path = path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.enqueue_timeout = enqueue_timeout
+        self.lease_timeout = lease_timeout
+        self.synchronous = synchronous
+        self._owner = uuid.uuid4().hex
+        self._local = threading.local()
+        self._room = threading.Condition()
+        self._work = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._random = random.Random()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(mutations)')]
+        for name, definition in ADDED_COLUMNS:
+            if name not in columns:
+                conn.execute('ALTER TABLE mutations ADD COLUMN {} {}'.format(name, definition))
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous={}'.format(self.synchronous))
+            self._local.conn = conn
+        return conn
+
+    def _count_pending(self, limit=-1):
+        """Pending and running calls in the journal, counting at most limit;
+        read from the file since other journals may share it"""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM mutations "
+            "WHERE state IN ('pending', 'running') LIMIT ?)", (limit,)).fetchone()[0]
+
+    def _wait_room(self, deadline):
+        """Wait on _room until notified, POLL_INTERVAL or deadline; False
+        once the deadline has passed"""
+        remaining = None if deadline is None else deadline - time.time()
+        if remaining is not None and remaining <= 0:
+            return False
+        self._room.wait(POLL_INTERVAL if remaining is None else min(remaining, POLL_INTERVAL))
+        return True
+
+    @property
+    def pending(self):
+        """Calls enqueued and not yet done or failed, by any journal on the file"""
+        return self._count_pending()
+
+    def enqueue(self, method, args=(), kwargs=None, key=None, target=None):
+        """Journal agilepoint.<method>(*args, **kwargs), e.g. method
+        'workflow.complete_work_item'. Returns the idempotency key.
+
+        key: idempotency key; enqueueing a key already in the journal does
+            nothing, so retried requests of the caller are not replayed twice.
+            A random key is used if None.
+        target: calls with the same target run in enqueue order, one at a
+            time; defaults to the first positional argument (the work item,
+            process instance... id)"""
+        section, _, name = method.partition('.')
+        if not name or section not in ('workflow', 'admin'):
+            raise ValueError('method must be workflow.<name> or admin.<name>')
+        key = key or uuid.uuid4().hex
+        if target is None:
+            target = args[0] if args else method
+        with self._room:
+            deadline = None if self.enqueue_timeout is None else \
+                time.time() + self.enqueue_timeout
+            while self._count_pending(self.max_pending) >= self.max_pending:
+                if not self._wait_room(deadline):
+                    raise JournalFull('{} calls pending'.format(self.max_pending))
+            now = time.time()
+            inserted = self._connection().execute(
+                'INSERT OR IGNORE INTO mutations (key, target, method, args, kwargs, state, '
+                'next_try, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, str(target), method, json.dumps(list(args)),
+                 json.dumps(kwargs or {}), PENDING, now, now)).rowcount
+        if inserted:
+            with self._work:
+                self._work.notify()
+        return key
+
+    def _claim(self):
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Calls whose worker died or hung past its lease go back to the queue
+            conn.execute(RECLAIM, (now,))
+            row = conn.execute(CLAIM, (now,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE mutations SET state = 'running', owner = ?, lease = ? "
+                             "WHERE seq = ?", (self._owner, now + self.lease_timeout, row[0]))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return row
+
+    def _call(self, method, args, kwargs):
+        section, _, name = method.partition('.')
+        return getattr(getattr(self.agilepoint, section), name)(*args, **kwargs)
+
+    def _finish(self, seq, state, attempts, next_try=None, error=None):
+        updated = self._connection().execute(
+            'UPDATE mutations SET state = ?, attempts = ?, next_try = COALESCE(?, next_try), '
+            'finished = ?, error = ?, owner = NULL, lease = NULL '
+            "WHERE seq = ? AND state = 'running' AND owner = ?",
+            (state, attempts, next_try, time.time() if state in (DONE, FAILED) else None,
+             error, seq, self._owner)).rowcount
+        if not updated:
+            logging.warning('Journal call %s finished after its lease expired', seq)
+        elif state in (DONE, FAILED):
+            with self._room:
+                self._room.notify_all()
+        with self._work:
+            # The next call for this target may be runnable now
+            self._work.notify_all()
+
+    def run_once(self):
+        """Replay one runnable call; False when there was nothing to run"""
+        row = self._claim()
+        if row is None:
+            return False
+        seq, key, method, args, kwargs, attempts = row
+        attempts += 1
+        try:
+            self._call(method, json.loads(args), json.loads(kwargs))
+        except Exception as error:  # pylint: disable=broad-except
+            message = '{}: {}'.format(type(error).__name__, error)
+            if is_permanent(error) or attempts >= self.max_attempts:
+                logging.error('Journal call %s %s failed: %s', key, method, message)
+                self._finish(seq, FAILED, attempts, error=message)
+            else:
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                delay *= self._random.uniform(0.5, 1.0)
+                self._finish(seq, PENDING, attempts, time.time() + delay, message)
+            return True
+        self._finish(seq, DONE, attempts)
+        return True
+
+    def _worker(self):
+        while not self._stopped.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except sqlite3.Error:
+                logging.exception('Journal worker failed')
+            with self._work:
+                # Woken by enqueue/finish; the timeout catches due retries
+                self._work.wait(0.5)
+
+    def start(self):
+        """Start the worker threads"""
+        self._stopped.clear()
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker,
+                                      name='agilepoint-journal-{}'.format(len(self._threads)))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def flush(self, timeout=None):
+        """Wait until nothing is pending; False if timeout expired first"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._room:
+            while self._count_pending(1):
+                if not self._wait_room(deadline):
+                    return False
+        return True
+
+    def close(self, timeout=None):
+        """Wait for pending calls (up to timeout), then stop the workers.
+        Calls still pending stay in the journal for the next run."""
+        if self._threads:
+            self.flush(timeout)
+        self._stopped.set()
+        with self._work:
+            self._work.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def status(self, key):
+        """State, attempts and last error of one call, or None"""
+        row = self._connection().execute(
+            'SELECT state, attempts, error FROM mutations WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return {'state': row[0], 'attempts': row[1], 'error': row[2]}
+
+    def stats(self):
+        """{state: count} over the journal"""
+        return dict(self._connection().execute(
+            'SELECT state, COUNT(*) FROM mutations GROUP BY state').fetchall())
+
+    def failures(self):
+        """[{key, method, args, kwargs, attempts, error}] of failed calls"""
+        rows = self._connection().execute(
+            "SELECT key, method, args, kwargs, attempts, error FROM mutations "
+            "WHERE state = 'failed' ORDER BY seq").fetchall()
+        return [{'key': key, 'method': method, 'args': json.loads(args),
+                 'kwargs': json.loads(kwargs), 'attempts': attempts, 'error': error}
+                for key, method, args, kwargs, attempts, error in rows]
+
+    def retry_failed(self):
+        """Queue every failed call again; returns how many"""
+        count = self._connection().execute(
+            "UPDATE mutations SET state = 'pending', attempts = 0, next_try = ? "
+            "WHERE state = 'failed'", (time.time(),)).rowcount
+        with self._work:
+            self._work.notify_all()
+        return count
+
+    def purge(self, older_than=86400):
+        """Forget done calls finished more than older_than seconds ago.
+        Their keys are then accepted again by enqueue."""
+        return self._connection().execute(
+            "DELETE FROM mutations WHERE state = 'done' AND finished < ?",
+            (time.time() - older_than,)).rowcount
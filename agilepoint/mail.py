@@ -0,0 +1,163 @@
+"""Bulk recovery of failed mail deliverables
+
+After an SMTP outage the AgilePoint engine can hold a large backlog of
+failed deliverables. MailRecovery walks that backlog, decides per
+deliverable whether it is still worth sending, and resends or cancels it
+on a thread pool throttled to what the SMTP server can take.
+
+Example::
+
+    recovery = MailRecovery(ap, max_age=datetime.timedelta(days=2),
+                            smtp_rates={'smtp.corp.tld': 20})
+    report = recovery.run()
+    print(report)
+"""
+import datetime
+import logging
+import time
+from ._utils import unwrap_result, parse_date, parallel_map, RateLimiter
+
+RESEND = 'resend'
+CANCEL = 'cancel'
+SKIP = 'skip'
+CLASSIFY = 'classify'
+
+
+class MailRecoveryReport(object):
+    """Outcome of a MailRecovery run"""
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.resent = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.failures = []
+
+    @property
+    def elapsed(self):
+        """Seconds spent in the run"""
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def throughput(self):
+        """Resend/cancel calls completed per second"""
+        if not self.elapsed:
+            return 0.0
+        return (self.resent + self.cancelled) / self.elapsed
+
+    def __repr__(self):
+        return ('<MailRecoveryReport: resent={} cancelled={} skipped={} '
+                'failed={} elapsed={:.1f}s throughput={:.1f}/s>').format(
+                    self.resent, self.cancelled, self.skipped,
+                    len(self.failures), self.elapsed, self.throughput)
+
+
+class MailRecovery(object):
+    """Classify and resend/cancel failed mail deliverables in bulk.
+
+    max_age: deliverables older than this timedelta are cancelled
+    cancel_recipients: recipients (or @domain suffixes) that are cancelled
+    smtp_rates: {smtp server name: sends per second}, matched against
+        Admin.get_smtp_server
+    rate: sends per second when the SMTP server has no entry in smtp_rates
+    workers: size of the thread pool issuing the calls
+    """
+    id_key = 'MailID'
+    recipient_key = 'To'
+    date_key = 'CreatedDate'
+
+    def __init__(self, agilepoint, max_age=None, cancel_recipients=None,
+                 smtp_rates=None, rate=10, workers=8):
+        self.agilepoint = agilepoint
+        self.max_age = max_age
+        self.cancel_recipients = [r.lower() for r in cancel_recipients or []]
+        self.smtp_rates = smtp_rates or {}
+        self.rate = rate
+        self.workers = workers
+
+    def deliverables(self, include_expecting=False):
+        """Yield failed deliverables, optionally followed by the ones already
+        scheduled for resend."""
+        calls = [self.agilepoint.workflow.get_mail_deliverables]
+        if include_expecting:
+            calls.append(
+                self.agilepoint.workflow.get_expecting_send_mail_deliverable)
+        seen = set()
+        for call in calls:
+            for deliverable in unwrap_result(call()) or []:
+                mail_id = deliverable.get(self.id_key)
+                if mail_id in seen:
+                    continue
+                seen.add(mail_id)
+                yield deliverable
+
+    def classify(self, deliverable, now=None):
+        """Return RESEND, CANCEL or SKIP for a single deliverable"""
+        if not deliverable.get(self.id_key):
+            return SKIP
+        recipient = (deliverable.get(self.recipient_key) or '').lower()
+        for rule in self.cancel_recipients:
+            if recipient == rule or (rule.startswith('@') and
+                                     recipient.endswith(rule)):
+                return CANCEL
+        if self.max_age is not None:
+            created = parse_date(deliverable.get(self.date_key))
+            now = now or datetime.datetime.utcnow()
+            if created is not None and now - created > self.max_age:
+                return CANCEL
+        return RESEND
+
+    def send_rate(self):
+        """Sends per second allowed for the configured SMTP server"""
+        if not self.smtp_rates:
+            return self.rate
+        server = unwrap_result(self.agilepoint.admin.get_smtp_server())
+        return self.smtp_rates.get(server, self.rate)
+
+    def _apply(self, job):
+        action, mail_id = job
+        if action == RESEND:
+            return self.agilepoint.workflow.resend_mail_deliverable(mail_id)
+        return self.agilepoint.workflow.cancel_mail_deliverable(mail_id)
+
+    def run(self, include_expecting=False, dry_run=False):
+        """Resend or cancel every failed deliverable and return a
+        MailRecoveryReport. With dry_run nothing is sent; the report only
+        holds the classification counts. Deliverables that cannot be
+        classified (e.g. an unrecognised CreatedDate) are reported as
+        failures with the action CLASSIFY."""
+        report = MailRecoveryReport()
+        now = datetime.datetime.utcnow()
+
+        def jobs():
+            for deliverable in self.deliverables(include_expecting):
+                try:
+                    action = self.classify(deliverable, now)
+                except ValueError as error:
+                    # An unparseable date must not stop the whole run
+                    logging.warning('Unable to classify mail %s: %s',
+                                    deliverable.get(self.id_key), error)
+                    report.failures.append((deliverable.get(self.id_key), CLASSIFY, error))
+                    continue
+                if action == SKIP or dry_run:
+                    if action == RESEND:
+                        report.resent += 1
+                    elif action == CANCEL:
+                        report.cancelled += 1
+                    else:
+                        report.skipped += 1
+                    continue
+                yield action, deliverable[self.id_key]
+
+        limiter = RateLimiter(self.send_rate())
+        for job, _, error in parallel_map(self._apply, jobs(), self.workers,
+                                          limiter):
+            if error is not None:
+                logging.warning('Unable to %s mail %s: %s', job[0], job[1], error)
+                report.failures.append((job[1], job[0], error))
+            elif job[0] == RESEND:
+                report.resent += 1
+            else:
+                report.cancelled += 1
+        report.finished = time.time()
+        return report
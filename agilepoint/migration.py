@@ -0,0 +1,181 @@
+"""Bulk migration of process instances to another definition version
+
+migrate_proc_inst sends the full MatchingActivityDefinition for every
+instance. BulkMigration computes the activity mapping of a source/target
+definition pair once (activities matched by name, with overrides), builds
+the MigrateProcInst body once and sends that same body through
+migrate_proc_inst for every instance on a thread pool, optionally rate
+limited. Each instance
+can be verified with get_proc_inst, and every verified instance is
+appended to a progress file so an interrupted run resumes where it
+stopped.
+
+Example::
+
+    migration = BulkMigration(ap, old_definition_id, new_definition_id,
+                              mapping={'Approve': 'Manager Approval'},
+                              workers=16, rate=50, progress_path='migration.log')
+    print(migration.unmapped)   # source activities without a target
+    report = migration.run()    # every open instance of the source definition
+"""
+import logging
+import threading
+import xml.etree.ElementTree as ElementTree
+from ._utils import RateLimiter, parallel_map, unwrap_result
+from .graph import CLOSED_STATUSES
+
+
+class MigrationMismatch(Exception):
+    """Raised when a migrated instance still is not on the target definition"""
+
+
+class MigrationReport(object):
+    """Outcome of BulkMigration.run"""
+    def __init__(self):
+        self.migrated = []
+        self.skipped = []
+        self.failures = []
+
+    @property
+    def ok(self):
+        """True when no instance failed"""
+        return not self.failures
+
+    def __repr__(self):
+        return '<MigrationReport: migrated={} skipped={} failed={}>'.format(
+            len(self.migrated), len(self.skipped), len(self.failures))
+
+
+def activity_names(xml):
+    """Activity names of a process definition xml, in document order"""
+    names = []
+    for element in ElementTree.fromstring(xml.encode('utf-8')).iter():
+        name = element.get('Name')
+        if name and element.tag.rsplit('}', 1)[-1].endswith('Activity') and name not in names:
+            names.append(name)
+    return names
+
+
+class BulkMigration(object):
+    """Migrate many process instances from source to target definition.
+
+    mapping: {source activity name: target activity name} overriding the
+        match by name; map to None to leave an activity unmatched
+    matching: a ready MatchingActivityDefinition; skips the mapping
+    verify: check each instance with get_proc_inst after migrating
+    progress_path: file recording migrated instances; those already in
+        it are skipped, so rerunning resumes an interrupted migration
+    rate: maximum migrations per second"""
+    instance_key = 'ProcessInstanceID'
+    definition_key = 'DefinitionID'
+    status_key = 'Status'
+    name_key = 'Name'
+    value_key = 'Value'
+
+    def __init__(self, agilepoint, source, target, mapping=None, matching=None,
+                 action='Migrate', include_xml_data=False, verify=True,
+                 progress_path=None, workers=8, rate=None):
+        self.agilepoint = agilepoint
+        self.source = source
+        self.target = target
+        self.mapping = mapping or {}
+        self.action = action
+        self.include_xml_data = include_xml_data
+        self.verify = verify
+        self.progress_path = progress_path
+        self.workers = workers
+        self.rate = rate
+        self.unmapped = []
+        self._matching = matching
+        self._payload = None
+        self._lock = threading.Lock()
+
+    @property
+    def matching(self):
+        """MatchingActivityDefinition, computed on first use"""
+        if self._matching is None:
+            workflow = self.agilepoint.workflow
+            sources = activity_names(unwrap_result(workflow.get_proc_def_xml(self.source)))
+            targets = set(activity_names(unwrap_result(workflow.get_proc_def_xml(self.target))))
+            matching = []
+            for name in sources:
+                mapped = self.mapping.get(name, name)
+                if mapped in targets:
+                    matching.append({self.name_key: name, self.value_key: mapped})
+                else:
+                    self.unmapped.append(name)
+            self._matching = matching
+        return self._matching
+
+    @property
+    def payload(self):
+        """The MigrateProcInst body, built and validated once for every
+        instance"""
+        if self._payload is None:
+            with self._lock:
+                if self._payload is None:
+                    body = {'SourceProcessDefinitionID': self.source,
+                            'TargetProcessDefinitionID': self.target,
+                            'MatchingActivityDefinition': self.matching,
+                            'Action': self.action,
+                            'IncludeXmlData': self.include_xml_data}
+                    self.agilepoint.workflow.validate['migrate_proc_inst'](body)
+                    self._payload = body
+        return self._payload
+
+    def migrate_one(self, piid):
+        """Migrate one instance, verifying it if enabled; returns True"""
+        self.agilepoint.workflow.migrate_proc_inst(piid, **self.payload)
+        if self.verify:
+            instance = unwrap_result(self.agilepoint.workflow.get_proc_inst(piid))
+            if instance.get(self.definition_key) != self.target:
+                raise MigrationMismatch('{} is on definition {}'.format(
+                    piid, instance.get(self.definition_key)))
+        return True
+
+    def instances(self, open_only=True):
+        """Ids of the (open) instances of the source definition"""
+        found = unwrap_result(self.agilepoint.workflow.query_proc_insts(
+            ColumnName=self.definition_key, Operator='=', IsValue=self.source)) or []
+        return [record[self.instance_key] for record in found
+                if not open_only or record.get(self.status_key) not in CLOSED_STATUSES]
+
+    def done(self):
+        """Ids recorded as migrated in the progress file"""
+        if not self.progress_path:
+            return set()
+        try:
+            with open(self.progress_path) as handle:
+                return set(line.strip() for line in handle if line.strip())
+        except (IOError, OSError):
+            return set()
+
+    def record(self, piid):
+        """Append a migrated instance to the progress file"""
+        if self.progress_path:
+            with self._lock:
+                with open(self.progress_path, 'a') as handle:
+                    handle.write(piid + '\n')
+
+    def run(self, ids=None, progress=None):
+        """Migrate ids (default: every open source instance) and return a
+        MigrationReport. progress(done, total) is called per instance."""
+        ids = self.instances() if ids is None else list(ids)
+        report = MigrationReport()
+        done = self.done()
+        todo = []
+        for piid in ids:
+            (report.skipped if piid in done else todo).append(piid)
+        # Computes the activity mapping and the shared payload up front
+        self.payload  # pylint: disable=pointless-statement
+        limiter = RateLimiter(self.rate) if self.rate else None
+        for piid, _, error in parallel_map(self.migrate_one, todo, self.workers, limiter):
+            if error is None:
+                report.migrated.append(piid)
+                self.record(piid)
+            else:
+                logging.error('Migration of %s failed: %s', piid, error)
+                report.failures.append((piid, error))
+            if progress is not None:
+                progress(len(report.migrated) + len(report.failures), len(todo))
+        return report
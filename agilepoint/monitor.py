@@ -0,0 +1,223 @@
+"""Background sampling of AgilePoint server health
+
+PerfSampler polls Admin.get_sys_perf_info (and times get_database_info) on
+a daemon thread and keeps the numeric fields in a fixed-size ring buffer of
+doubles, so memory stays bounded however long it runs. Rolling statistics
+are computed over the buffer in place, and AdaptiveLimiter turns them into
+a request rate for the client's own bulk work.
+
+Example::
+
+    sampler = PerfSampler(ap, interval=5, capacity=720)
+    sampler.start()
+    print(sampler.stats('CPUUsage', window=12))
+    limiter = AdaptiveLimiter(sampler, rate=50, rules={'CPUUsage': (60, 90)})
+    for result in parallel_map(work, items, limiter=limiter):
+        ...
+"""
+import array
+import logging
+import math
+import numbers
+import threading
+import time
+from ._utils import RateLimiter, unwrap_result
+
+NAN = float('nan')
+# Columns recorded for every sample ahead of the server's perf fields
+BASE_COLUMNS = ('time', 'perf_seconds', 'database_seconds', 'errors')
+
+
+class PerfSampler(object):
+    """Poll server performance counters into a ring buffer.
+
+    interval: seconds between samples
+    capacity: samples kept; the oldest is overwritten beyond it
+    fields: numeric get_sys_perf_info fields to keep; by default every
+        numeric field of the first successful sample
+    database: also time get_database_info, as database round trip latency
+    Every sample also records its time, the call latencies (NaN when the
+    call failed) and the number of failed calls. listeners are called with
+    the sampler after each sample, on the sampler thread."""
+    def __init__(self, agilepoint, interval=10.0, capacity=360, fields=None,
+                 database=True):
+        self.agilepoint = agilepoint
+        self.interval = interval
+        self.capacity = capacity
+        self.database = database
+        self.columns = None
+        self.listeners = []
+        self._index = {}
+        self._buffer = None
+        self._row = None
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        if fields is not None:
+            self._allocate(fields)
+
+    def _allocate(self, fields):
+        self.columns = BASE_COLUMNS + tuple(fields)
+        self._index = dict((name, i) for i, name in enumerate(self.columns))
+        self._buffer = array.array('d', [NAN]) * (self.capacity * len(self.columns))
+        self._row = array.array('d', [NAN]) * len(self.columns)
+
+    @staticmethod
+    def _timed(call):
+        started = time.time()
+        try:
+            return unwrap_result(call()), time.time() - started
+        except Exception as error:  # pylint: disable=broad-except
+            logging.debug('Perf sample %s failed: %s', call.__name__, error)
+            return None, NAN
+
+    def sample(self):
+        """Take one sample now and store it"""
+        perf, perf_seconds = self._timed(self.agilepoint.admin.get_sys_perf_info)
+        database_seconds = NAN
+        if self.database:
+            _, database_seconds = self._timed(self.agilepoint.admin.get_database_info)
+        perf = perf if isinstance(perf, dict) else {}
+        if self.columns is None:
+            if not perf:
+                return
+            self._allocate(sorted(name for name, value in perf.items()
+                                  if isinstance(value, numbers.Number) and
+                                  not isinstance(value, bool)))
+        row = self._row
+        row[0] = time.time()
+        row[1] = perf_seconds
+        row[2] = database_seconds
+        row[3] = math.isnan(perf_seconds) + (self.database and math.isnan(database_seconds))
+        for position in range(len(BASE_COLUMNS), len(self.columns)):
+            value = perf.get(self.columns[position])
+            row[position] = value if isinstance(value, numbers.Number) else NAN
+        width = len(self.columns)
+        with self._lock:
+            start = (self._count % self.capacity) * width
+            self._buffer[start:start + width] = row
+            self._count += 1
+        for listener in self.listeners:
+            listener(self)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.sample()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception('Perf sampler failed')
+            self._stopped.wait(self.interval)
+
+    def start(self):
+        """Start sampling on a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='agilepoint-perf-sampler')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the sampling thread"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def _positions(self, column, window):
+        """Buffer offsets of column for the last window samples, oldest first"""
+        width = len(self.columns)
+        offset = self._index[column]
+        count = min(self._count, self.capacity, window or self.capacity)
+        first = self._count - count
+        for sample in range(first, self._count):
+            yield (sample % self.capacity) * width + offset
+
+    def latest(self):
+        """The last sample as {column: value}, or None"""
+        with self._lock:
+            if not self._count:
+                return None
+            width = len(self.columns)
+            start = ((self._count - 1) % self.capacity) * width
+            return dict(zip(self.columns, self._buffer[start:start + width]))
+
+    def values(self, column, window=None):
+        """Last window (default all kept) values of a column, oldest first"""
+        with self._lock:
+            if self.columns is None:
+                return []
+            return [self._buffer[pos] for pos in self._positions(column, window)]
+
+    def stats(self, column, window=None):
+        """count/mean/min/max/stdev/last of a column over the last window
+        samples, ignoring NaN (failed) values"""
+        count = 0
+        total = squares = 0.0
+        low = high = last = NAN
+        with self._lock:
+            if self.columns is not None:
+                buffer = self._buffer
+                for pos in self._positions(column, window):
+                    value = buffer[pos]
+                    if value != value:
+                        continue
+                    count += 1
+                    total += value
+                    squares += value * value
+                    low = value if count == 1 or value < low else low
+                    high = value if count == 1 or value > high else high
+                    last = value
+        if not count:
+            return {'count': 0, 'mean': NAN, 'min': NAN, 'max': NAN,
+                    'stdev': NAN, 'last': NAN}
+        mean = total / count
+        return {'count': count, 'mean': mean, 'min': low, 'max': high,
+                'stdev': math.sqrt(max(0.0, squares / count - mean * mean)),
+                'last': last}
+
+
+class AdaptiveLimiter(RateLimiter):
+    """RateLimiter whose rate drops as the sampled server load rises.
+
+    rules: {column: (low, high)}; between low and high the rate falls
+        linearly from rate to min_rate, and stays at min_rate above high.
+        The most loaded column wins.
+    window: samples averaged per column
+    Failed samples (server or database unreachable) count as full load.
+    The rate is recomputed after each sample, so wait() costs the same as
+    a plain RateLimiter."""
+    def __init__(self, sampler, rate, rules, min_rate=1, window=3):
+        super(AdaptiveLimiter, self).__init__(rate)
+        self.sampler = sampler
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.rules = rules
+        self.window = window
+        self.pressure = 0.0
+        sampler.listeners.append(self.update)
+
+    def update(self, sampler):
+        """Recompute the rate from the sampler; called after each sample"""
+        pressure = 0.0
+        if sampler.stats('errors', 1)['last'] > 0:
+            pressure = 1.0
+        for column, (low, high) in self.rules.items():
+            if column not in sampler.columns:
+                continue
+            mean = sampler.stats(column, self.window)['mean']
+            if mean == mean:
+                pressure = max(pressure, min(1.0, max(0.0, (mean - low) / float(high - low))))
+        self.pressure = pressure
+        rate = self.max_rate - (self.max_rate - self.min_rate) * pressure
+        self.interval = 1.0 / rate if rate else 0.0
@@ -0,0 +1,386 @@
+"""Compound queries pushed to the server
+
+query_proc_insts, query_activity_insts, query_work_list and
+query_procedure_list filter on one ColumnName/Operator/IsValue triple.
+Query compiles compound predicates into the forms each endpoint accepts: a
+lone comparison goes out as the triple, anything larger as a WhereClause or
+through the *_using_s_q_l variant's sqlWhereClause. Parts that cannot be
+sent (Python callables, or OR branches mixing them in) are applied to the
+records in one pass as they are decoded off the response.
+
+Example::
+
+    from agilepoint.query import Query, F
+    query = Query(ap, 'work_list').where(
+        (F('Status') == 'Assigned') & F('UserID').isin(team) &
+        (F('DueDate') < datetime.datetime.utcnow()) &
+        F.local(lambda item: item['Name'].startswith('Review')))
+    print(query.explain())
+    for item in query:
+        ...
+"""
+import datetime
+import json
+import numbers
+import re
+from ._utils import iter_result, parse_date
+from .exceptions import InvalidArg
+
+COLUMN = re.compile(r'^[A-Za-z_][\w.]*$')
+OPERATORS = ('=', '<>', '<', '<=', '>', '>=', 'LIKE')
+# Operators of Compare: the triple's, plus IN and IS (NULL) in SQL only
+COMPARE_OPERATORS = frozenset(OPERATORS + ('IN', 'IS'))
+# endpoint: (triple method, sql method or None, where clause argument or None)
+TARGETS = {
+    'proc_insts': ('query_proc_insts', 'query_proc_insts_using_s_q_l', None),
+    'activity_insts': ('query_activity_insts', None, None),
+    'work_list': ('query_work_list', 'query_work_list_using_s_q_l', 'WhereClause'),
+    'procedure_list': ('query_procedure_list', None, 'WhereClause'),
+}
+# method: Workflow REST endpoint, requested directly to stream the response
+ENDPOINTS = {
+    'query_proc_insts': 'QueryProcInsts',
+    'query_proc_insts_using_s_q_l': 'QueryProcInstsUsingSQL',
+    'query_activity_insts': 'QueryActivityInsts',
+    'query_work_list': 'QueryWorkList',
+    'query_work_list_using_s_q_l': 'QueryWorkListUsingSQL',
+    'query_procedure_list': 'QueryProcedureList',
+}
+
+
+def sql_literal(value):
+    """SQL literal of a Python value"""
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, numbers.Number):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def _local_value(value):
+    """Comparable form of a record or query value"""
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, numbers.Number):
+        return value
+    return '' if value is None else str(value).lower()
+
+
+class Condition(object):
+    """Predicate over records; combine with &, | and ~"""
+    __slots__ = ()
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def sql(self):
+        """SQL text of the condition, or None if it cannot be sent"""
+        raise NotImplementedError
+
+    def matches(self, record):
+        """Evaluate the condition on a record dict"""
+        raise NotImplementedError
+
+    def split(self):
+        """(condition for the server or None, residual condition or None)"""
+        if self.sql() is not None:
+            return self, None
+        return None, self
+
+
+class Compare(Condition):
+    """column <operator> value; operator is one of OPERATORS, IN or IS"""
+    __slots__ = ('column', 'operator', 'value')
+
+    def __init__(self, column, operator, value):
+        if not COLUMN.match(column):
+            raise InvalidArg('column: {}'.format(column))
+        if operator not in COMPARE_OPERATORS:
+            raise InvalidArg('operator: {}'.format(operator))
+        self.column = column
+        self.operator = operator
+        self.value = value
+
+    def sql(self):
+        column = '[{}]'.format(self.column)
+        if self.operator == 'IS':
+            return '{} IS {}NULL'.format(column, '' if self.value else 'NOT ')
+        if self.operator == 'IN':
+            if not self.value:
+                return '1 = 0'
+            return '{} IN ({})'.format(column, ', '.join(sql_literal(v) for v in self.value))
+        return '{} {} {}'.format(column, self.operator, sql_literal(self.value))
+
+    def matches(self, record):
+        actual = record.get(self.column)
+        if self.operator == 'IS':
+            return (actual is None) == bool(self.value)
+        if self.operator == 'IN':
+            return _local_value(actual) in set(_local_value(v) for v in self.value)
+        if actual is None:
+            return False
+        expected = self.value
+        if self.operator == 'LIKE':
+            pattern = ''.join({'%': '.*', '_': '.'}.get(c) or re.escape(c) for c in expected)
+            return re.match('^{}$'.format(pattern), str(actual), re.I | re.S) is not None
+        if isinstance(expected, datetime.datetime):
+            actual = parse_date(actual)
+        elif isinstance(expected, numbers.Number) and not isinstance(actual, numbers.Number):
+            actual = float(actual)
+        actual, expected = _local_value(actual), _local_value(expected)
+        return {'=': actual == expected, '<>': actual != expected,
+                '<': actual < expected, '<=': actual <= expected,
+                '>': actual > expected, '>=': actual >= expected}[self.operator]
+
+    def triple(self):
+        """ColumnName/Operator/IsValue body args, or None"""
+        if self.operator not in OPERATORS:
+            return None
+        value = self.value
+        if isinstance(value, datetime.datetime):
+            value = value.strftime('%Y-%m-%d %H:%M:%S')
+        return {'ColumnName': self.column, 'Operator': self.operator, 'IsValue': value}
+
+    def __repr__(self):
+        return self.sql()
+
+
+class Local(Condition):
+    """Python predicate, always applied client side"""
+    __slots__ = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+    def sql(self):
+        return None
+
+    def matches(self, record):
+        return bool(self.func(record))
+
+    def __repr__(self):
+        return '<local {}>'.format(getattr(self.func, '__name__', 'predicate'))
+
+
+class And(Condition):
+    """All of the conditions"""
+    __slots__ = ('parts',)
+
+    def __init__(self, *parts):
+        flat = []
+        for part in parts:
+            flat.extend(part.parts if isinstance(part, And) else [part])
+        self.parts = flat
+
+    def sql(self):
+        texts = [part.sql() for part in self.parts]
+        if None in texts:
+            return None
+        return ' AND '.join('({})'.format(text) for text in texts)
+
+    def matches(self, record):
+        return all(part.matches(record) for part in self.parts)
+
+    def split(self):
+        pushed, residual = [], []
+        for part in self.parts:
+            server, local = part.split()
+            if server is not None:
+                pushed.append(server)
+            if local is not None:
+                residual.append(local)
+        return _combine(And, pushed), _combine(And, residual)
+
+    def __repr__(self):
+        return ' AND '.join('({!r})'.format(part) for part in self.parts)
+
+
+class Or(Condition):
+    """Any of the conditions; sent only when every branch can be"""
+    __slots__ = ('parts',)
+
+    def __init__(self, *parts):
+        flat = []
+        for part in parts:
+            flat.extend(part.parts if isinstance(part, Or) else [part])
+        self.parts = flat
+
+    def sql(self):
+        texts = [part.sql() for part in self.parts]
+        if None in texts:
+            return None
+        return ' OR '.join('({})'.format(text) for text in texts)
+
+    def matches(self, record):
+        return any(part.matches(record) for part in self.parts)
+
+    def __repr__(self):
+        return ' OR '.join('({!r})'.format(part) for part in self.parts)
+
+
+class Not(Condition):
+    """Negated condition"""
+    __slots__ = ('part',)
+
+    def __init__(self, part):
+        self.part = part
+
+    def sql(self):
+        text = self.part.sql()
+        return None if text is None else 'NOT ({})'.format(text)
+
+    def matches(self, record):
+        return not self.part.matches(record)
+
+    def __repr__(self):
+        return 'NOT ({!r})'.format(self.part)
+
+
+def _combine(cls, parts):
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else cls(*parts)
+
+
+class F(object):
+    """Column reference building conditions: F('Status') == 'Running'"""
+    __slots__ = ('column',)
+
+    def __init__(self, column):
+        self.column = column
+
+    def __eq__(self, value):
+        if value is None:
+            return Compare(self.column, 'IS', True)
+        return Compare(self.column, '=', value)
+
+    def __ne__(self, value):
+        if value is None:
+            return Compare(self.column, 'IS', False)
+        return Compare(self.column, '<>', value)
+
+    def __lt__(self, value):
+        return Compare(self.column, '<', value)
+
+    def __le__(self, value):
+        return Compare(self.column, '<=', value)
+
+    def __gt__(self, value):
+        return Compare(self.column, '>', value)
+
+    def __ge__(self, value):
+        return Compare(self.column, '>=', value)
+
+    __hash__ = None
+
+    def like(self, pattern):
+        """SQL LIKE pattern (% and _ wildcards), case insensitive"""
+        return Compare(self.column, 'LIKE', pattern)
+
+    def isin(self, values):
+        """Value is one of values"""
+        return Compare(self.column, 'IN', list(values))
+
+    @staticmethod
+    def local(func):
+        """Condition applied client side by calling func(record)"""
+        return Local(func)
+
+
+class Query(object):
+    """Query of one of the TARGETS endpoints.
+
+    where() calls are ANDed. The part of the condition the server can
+    evaluate is sent as the triple when it is a single comparison, else as
+    the WhereClause or the *_using_s_q_l variant; for endpoints with
+    neither, one comparison of a top level AND is sent and the rest is
+    applied locally. With nothing to send, the *_using_s_q_l variant is
+    called without a filter; endpoints lacking one need at least one
+    comparison the triple can carry, or compile() raises InvalidArg.
+    Iterating runs the query and yields matching records as they are read
+    off the response (honouring agilepoint._utils.decoding()); the generated
+    query methods return whole lists, so the body is validated with their
+    validator and posted to the endpoint with stream=True."""
+    def __init__(self, agilepoint, target):
+        if target not in TARGETS:
+            raise InvalidArg('target: {} (one of {})'.format(target, ', '.join(sorted(TARGETS))))
+        self.agilepoint = agilepoint
+        self.target = target
+        self.condition = None
+
+    def where(self, condition):
+        """Add a condition; returns self"""
+        self.condition = condition if self.condition is None else self.condition & condition
+        return self
+
+    def compile(self):
+        """(method name, body, residual condition or None)"""
+        triple_method, sql_method, where_arg = TARGETS[self.target]
+        if self.condition is None:
+            server, residual = None, None
+        else:
+            server, residual = self.condition.split()
+        if isinstance(server, Compare) and server.triple() is not None:
+            body = server.triple()
+            if where_arg:
+                body[where_arg] = ''
+            return triple_method, body, residual
+        if sql_method:
+            return sql_method, {'sqlWhereClause': server.sql() if server else '1 = 1'}, residual
+        # Send one comparison as the triple, an equality if there is one (it
+        # is usually the most selective); the rest goes as WhereClause or
+        # stays local
+        parts = server.parts if isinstance(server, And) else [server] if server else []
+        candidates = [part for part in parts
+                      if isinstance(part, Compare) and part.triple() is not None]
+        first = min(candidates, key=lambda part: part.operator != '=') if candidates else None
+        if first is None:
+            raise InvalidArg('{} needs a comparison ({}) ANDed at the top level: {!r}'.format(
+                self.target, ', '.join(OPERATORS), self.condition))
+        rest = [part for part in parts if part is not first]
+        body = first.triple()
+        if where_arg:
+            body[where_arg] = _combine(And, rest).sql() if rest else ''
+        elif rest:
+            residual = _combine(And, rest + ([residual] if residual is not None else []))
+        return triple_method, body, residual
+
+    def explain(self):
+        """What is sent and what is applied locally"""
+        method, body, residual = self.compile()
+        return {'method': method, 'body': body,
+                'residual': None if residual is None else repr(residual)}
+
+    def __iter__(self):
+        method, body, residual = self.compile()
+        workflow = self.agilepoint.workflow
+        workflow.validate[method](body)
+        resp = getattr(workflow.workflow, ENDPOINTS[method]).POST(
+            data=json.dumps(body), stream=True)
+        records = iter_result(resp)
+        if residual is None:
+            return records
+        return (record for record in records if residual.matches(record))
+
+    def all(self):
+        """Matching records as a list"""
+        return list(self)
+
+    def first(self):
+        """First matching record, or None; the rest of the response is
+        not read"""
+        records = iter(self)
+        try:
+            return next(records, None)
+        finally:
+            records.close()
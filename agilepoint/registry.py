@@ -0,0 +1,174 @@
+"""Shared AgilePoint clients for services talking to many environments
+
+Building an AgilePoint client per request creates a new requests session
+and connection pool every time. ClientRegistry hands out one client per
+(host, path, user) and shares a single connection pool per host between
+all users of that host, with bounds on hosts, clients and sockets.
+
+Example::
+
+    registry = ClientRegistry(max_hosts=20, max_clients=200, connections_per_host=10)
+    ap = registry.get(host, path, username, password)
+    ap.workflow.get_work_item(workitemid)
+    print(registry.metrics())
+"""
+import collections
+import hashlib
+import threading
+import weakref
+from . import AgilePoint
+from ._utils import STRING_TYPES
+
+
+class TenantMetrics(object):
+    """Request counters for one (host, user) pair"""
+    counters = ('lookups', 'created', 'requests', 'errors', 'seconds')
+    __slots__ = counters + ('_lock',)
+
+    def __init__(self):
+        self.lookups = 0
+        self.created = 0
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def response_hook(self, resp, *args, **kwargs):  # pylint: disable=unused-argument
+        """requests response hook counting traffic; runs on the threads of
+        every client of the tenant"""
+        seconds = resp.elapsed.total_seconds()
+        with self._lock:
+            self.requests += 1
+            if resp.status_code >= 400:
+                self.errors += 1
+            self.seconds += seconds
+
+    def as_dict(self):
+        """Counters as a plain dict"""
+        with self._lock:
+            return dict((name, getattr(self, name)) for name in self.counters)
+
+
+class _SharedAdapter(object):
+    """A host's adapter and the number of live clients using it"""
+    __slots__ = ('adapter', 'clients', 'evicted')
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.clients = 0
+        self.evicted = False
+
+
+def _option_key(value):
+    """Hashable stand-in for an AgilePoint keyword argument: plain values
+    compare by value, objects (auth, cache, ...) by identity"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _option_key(v)) for k, v in value.items()))
+    if value is None or isinstance(value, (bool, int, float) + STRING_TYPES):
+        return value
+    return 'id:{}'.format(id(value))
+
+
+class ClientRegistry(object):
+    """Cache of AgilePoint clients sharing connection pools per host.
+
+    max_hosts: hosts with a live pool; beyond this the least recently
+        used host's clients are dropped from the cache and its pool is
+        closed once the clients already handed out are garbage collected
+    max_clients: cached clients across all hosts, least recently used first out
+    connections_per_host: pool size per host, so sockets stay below
+        max_hosts * connections_per_host
+    Extra keyword arguments to get() are passed on to AgilePoint and are
+    part of the cache key; http2 is refused since the host's pool is shared."""
+    def __init__(self, max_hosts=32, max_clients=256, connections_per_host=10):
+        self.max_hosts = max_hosts
+        self.max_clients = max_clients
+        self.connections_per_host = connections_per_host
+        # Reentrant: dropping a client may run _released on this thread
+        self._lock = threading.RLock()
+        self._adapters = collections.OrderedDict()
+        self._clients = collections.OrderedDict()
+        self._metrics = {}
+        self._watches = set()
+
+    def _adapter(self, host, path):
+        key = (host, path)
+        if key in self._adapters:
+            self._adapters[key] = self._adapters.pop(key)
+            return self._adapters[key]
+        from requests.adapters import HTTPAdapter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.connections_per_host,
+                              pool_block=True)
+        if isinstance(host, tuple):
+            from .transport import BalancingAdapter
+            adapter = BalancingAdapter(host, path, inner=adapter)
+        shared = self._adapters[key] = _SharedAdapter(adapter)
+        while len(self._adapters) > self.max_hosts:
+            old_key, old = self._adapters.popitem(last=False)
+            old.evicted = True
+            for client_key in [k for k in self._clients if k[:2] == old_key]:
+                del self._clients[client_key]
+            if not old.clients:
+                old.adapter.close()
+        return shared
+
+    def _watch(self, client, shared):
+        """Count client as a user of shared until it is garbage collected"""
+        shared.clients += 1
+
+        def released(ref):
+            with self._lock:
+                self._watches.discard(ref)
+                shared.clients -= 1
+                if shared.evicted and not shared.clients:
+                    shared.adapter.close()
+        self._watches.add(weakref.ref(client, released))
+
+    def get(self, host, path, username, password, **kwargs):
+        """Cached AgilePoint client for host/path/username.
+
+        Clients built with different keyword arguments are cached apart. A
+        changed password yields a fresh client replacing the old one; the
+        shared pool is kept."""
+        if kwargs.get('http2'):
+            raise ValueError('ClientRegistry shares an HTTP/1.1 pool per host; '
+                             'http2 is not supported')
+        if isinstance(host, list):
+            host = tuple(host)
+        digest = hashlib.sha1((password or '').encode('utf-8')).hexdigest()
+        options = _option_key(kwargs)
+        key = (host, path, username, options, digest)
+        tenant = (host, username)
+        with self._lock:
+            metrics = self._metrics.setdefault(tenant, TenantMetrics())
+            metrics.lookups += 1
+            client = self._clients.pop(key, None)
+            if client is None:
+                for stale in [k for k in self._clients if k[:4] == key[:4]]:
+                    del self._clients[stale]
+                shared = self._adapter(host, path)
+                first = host[0] if isinstance(host, tuple) else host
+                client = AgilePoint(first, path, username, password, adapter=shared.adapter,
+                                    **kwargs)
+                self._watch(client, shared)
+                client.agilepoint._session.hooks['response'].append(  # pylint: disable=protected-access
+                    metrics.response_hook)
+                metrics.created += 1
+            self._clients[key] = client
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            return client
+
+    def metrics(self):
+        """{(host, user): counters} for every tenant seen"""
+        with self._lock:
+            return dict((tenant, metrics.as_dict())
+                        for tenant, metrics in self._metrics.items())
+
+    def close(self):
+        """Drop every client and close the shared pools, including those of
+        clients still held elsewhere"""
+        with self._lock:
+            self._clients.clear()
+            while self._adapters:
+                self._adapters.popitem()[1].adapter.close()
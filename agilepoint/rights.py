@@ -0,0 +1,162 @@
+"""Precomputed effective access rights
+
+Checking permissions with get_access_rights costs a round trip per user per
+request. RightsMatrix fetches the rights of every user concurrently and
+keeps them as a users x rights bit matrix: one integer bitset per user, one
+bit per access right name. Checks are then a shift and a mask, and whole
+sets of rights are checked at once with a precomputed mask.
+
+Example::
+
+    matrix = RightsMatrix(ap, workers=16).load()
+    matrix.has_right('DOMAIN\\\\alice', 'Cancel Process')
+    needed = matrix.mask(['Cancel Process', 'Reassign Work Item'])
+    matrix.allows('DOMAIN\\\\alice', needed)
+    # after roles change, re-read only the users holding them
+    matrix.refresh_roles(['Role 3'])
+"""
+import threading
+from ._utils import parallel_map, unwrap_result
+from .directory import Names
+
+
+class RightsMatrix(object):
+    """Users x access rights bit matrix.
+
+    users: user names to resolve; by default every registered user
+    directory: an agilepoint.directory.DirectoryIndex used to find the
+        members of changed roles (including through groups); without one
+        query_role_members and get_group_members are called
+    Users are matched case insensitively."""
+    user_key = 'UserName'
+    assignee_key = 'Assignee'
+    assignee_type_key = 'AssigneeType'
+
+    def __init__(self, agilepoint, users=None, workers=8, directory=None):
+        self.agilepoint = agilepoint
+        self.workers = workers
+        self.directory = directory
+        self._wanted = list(users) if users is not None else None
+        self._users = Names()
+        self._rights = Names()
+        self._rows = []
+        self._lock = threading.Lock()
+
+    @property
+    def rights(self):
+        """Access right names, in bit order"""
+        return list(self._rights.names)
+
+    @property
+    def users(self):
+        """User names in the matrix"""
+        return list(self._users.names)
+
+    def load(self):
+        """Fetch the right names and every user's rights; returns self"""
+        admin = self.agilepoint.admin
+        for name in unwrap_result(admin.get_access_right_names()) or []:
+            self._rights.add(name)
+        users = self._wanted
+        if users is None:
+            users = [record[self.user_key] for record in
+                     unwrap_result(admin.get_register_users()) or []]
+        self.refresh(users)
+        return self
+
+    def _bits(self, names):
+        row = 0
+        for name in names or []:
+            row |= 1 << self._rights.add(name)
+        return row
+
+    def refresh(self, users):
+        """Re-fetch the rights of users concurrently and update their rows"""
+        admin = self.agilepoint.admin
+
+        def fetch(user):
+            return unwrap_result(admin.get_access_rights(userName=user))
+
+        for user, rights, error in parallel_map(fetch, users, self.workers):
+            if error is not None:
+                raise error
+            with self._lock:
+                row = self._bits(rights)
+                uid = self._users.get(user)
+                if uid is None:
+                    # The row exists before readers can look the user up
+                    self._rows.append(row)
+                    self._users.add(user)
+                else:
+                    self._rows[uid] = row
+        return self
+
+    def role_users(self, role):
+        """Names of the users holding role, directly or through a group"""
+        if self.directory is not None:
+            self.directory.refresh(roles=[role])
+            return self.directory.role_members(role)
+        admin = self.agilepoint.admin
+        users = set()
+        for record in unwrap_result(admin.query_role_members(role)) or []:
+            if record.get(self.assignee_type_key) == 'Group':
+                users.update(member[self.user_key] for member in unwrap_result(
+                    admin.get_group_members(record[self.assignee_key])) or [])
+            else:
+                users.add(record[self.assignee_key])
+        return sorted(users)
+
+    def refresh_roles(self, roles, previous_users=()):
+        """Re-fetch the rights of the users of changed roles.
+
+        previous_users: users who held the roles before the change, so those
+            removed from a role lose its rights; with a directory index its
+            last view of the roles is used as well"""
+        users = set(previous_users)
+        if self.directory is not None:
+            # Members before the change, as the index last saw them
+            for role in roles:
+                users.update(self.directory.role_members(role))
+        for role in roles:
+            users.update(self.role_users(role))
+        return self.refresh(sorted(users))
+
+    def mask(self, rights):
+        """Bitset of right names, for allows()"""
+        mask = 0
+        for name in rights:
+            bit = self._rights.get(name)
+            if bit is None:
+                raise KeyError(name)
+            mask |= 1 << bit
+        return mask
+
+    def has_right(self, user, right):
+        """True if user has the named access right"""
+        uid = self._users.get(user)
+        bit = self._rights.get(right)
+        if uid is None or bit is None:
+            return False
+        return bool(self._rows[uid] >> bit & 1)
+
+    def allows(self, user, mask):
+        """True if user has every right of mask (see mask())"""
+        uid = self._users.get(user)
+        return uid is not None and self._rows[uid] & mask == mask
+
+    def rights_of(self, user):
+        """Names of the rights of user"""
+        uid = self._users.get(user)
+        row = self._rows[uid] if uid is not None else 0
+        return [name for bit, name in enumerate(self._rights.names) if row >> bit & 1]
+
+    def users_with(self, right):
+        """Names of the users having right"""
+        bit = self._rights.get(right)
+        if bit is None:
+            return []
+        names = self._users.names
+        return [names[uid] for uid, row in enumerate(self._rows) if row >> bit & 1]
+
+    def __repr__(self):
+        return '<RightsMatrix: users={} rights={}>'.format(len(self._users), len(self._rights))
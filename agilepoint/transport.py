@@ -0,0 +1,688 @@
+"""Transport adapters for the AgilePoint client
+
+The client talks HTTP through a requests session, so alternative transports
+are requests adapters mounted on that session. Pass one to AgilePoint with
+the adapter argument.
+
+Record/replay::
+
+    cassette = Cassette('prod-hour.jsonl.gz')
+    ap = AgilePoint(host, path, username, password,
+                    adapter=RecordingAdapter(cassette))
+    ...                         # normal traffic is recorded
+    cassette.close()
+
+    ap = AgilePoint(host, path, 'user', 'pass',
+                    adapter=ReplayAdapter(Cassette('prod-hour.jsonl.gz')))
+    print(replay_traffic(ap, Cassette('prod-hour.jsonl.gz'), speed=10))
+
+Several server nodes (see BalancingAdapter)::
+
+    ap = AgilePoint(['https://ap1:14490', 'https://ap2:14490'], path,
+                    username, password)
+
+HTTP/2, multiplexing concurrent requests over a few connections (see
+HTTP2Adapter, needs ``pip install "agilepoint[http2]"``)::
+
+    ap = AgilePoint(host, path, username, password, http2=True)
+
+Compressed request bodies and per endpoint compression figures (see
+CompressionAdapter)::
+
+    ap = AgilePoint(host, path, username, password, compression={'threshold': 8192})
+    print(ap.compression.stats())
+"""
+import datetime
+import gzip
+import inspect
+import json
+import random
+import re
+import threading
+import time
+import zlib
+try:
+    from urllib.parse import urlsplit, unquote
+except ImportError:  # Python 2
+    from urlparse import urlsplit
+    from urllib import unquote
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from ._utils import accept_encoding
+
+SECRET_KEYS = re.compile(r'pass(word)?|secret|token|credential', re.I)
+SCRUBBED = '***'
+PROBE_HEADERS = ('authorization', 'cookie')
+RESTAPI_CALL = re.compile(r'self\.(?:workflow|admin)\.(\w+)')
+try:
+    CPU_CLOCK = time.process_time
+except AttributeError:  # Python 2
+    CPU_CLOCK = time.clock
+
+
+def scrub(data):
+    """Replace credential looking values in a decoded json body"""
+    if isinstance(data, dict):
+        return dict((key, SCRUBBED if SECRET_KEYS.search(key) else scrub(value))
+                    for key, value in data.items())
+    if isinstance(data, list):
+        return [scrub(value) for value in data]
+    return data
+
+
+class Cassette(object):
+    """Gzipped newline-delimited json file of request/response pairs.
+
+    Each entry holds the offset from the start of recording (t), method (m),
+    path (p), request body (b), status (s), content type (c), response body
+    (r) and server time (e). Authorization headers are never stored and
+    credential looking body fields are scrubbed."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._handle = None
+        self._started = None
+
+    def append(self, entry):
+        """Write one entry, opening the file for writing on first use"""
+        with self._lock:
+            if self._handle is None:
+                self._handle = gzip.open(self.path, 'wt')
+                self._started = time.time()
+            entry['t'] = round(time.time() - self._started - entry['e'], 6)
+            self._handle.write(json.dumps(entry, separators=(',', ':')))
+            self._handle.write('\n')
+
+    def close(self):
+        """Flush and close the cassette file"""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def __iter__(self):
+        with gzip.open(self.path, 'rt') as f_handle:
+            for line in f_handle:
+                yield json.loads(line)
+
+
+def endpoint_name(url, path):
+    """'Section/RestApi' for a request URL under the server path"""
+    parts = urlsplit(url).path.split('/')
+    if path in parts:
+        index = parts.index(path)
+        return '/'.join(parts[index + 1:index + 3])
+    return parts[-1]
+
+
+def build_response(request, status, content_type, text):
+    """requests Response for request with a stored status and utf-8 body"""
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers = CaseInsensitiveDict({'Content-Type': content_type or 'application/json'})
+    resp._content = text.encode('utf-8')  # pylint: disable=protected-access
+    resp.encoding = 'utf-8'
+    resp.url = request.url
+    resp.request = request
+    return resp
+
+
+def _request_body(request):
+    body = request.body
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    try:
+        return json.dumps(scrub(json.loads(body)), sort_keys=True)
+    except ValueError:
+        return body
+
+
+def _request_key(method, path, body):
+    return method.upper(), path, body
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that appends every exchange to a Cassette"""
+    def __init__(self, cassette, **kwargs):
+        super(RecordingAdapter, self).__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        started = time.time()
+        resp = super(RecordingAdapter, self).send(request, **kwargs)
+        content = resp.content
+        self.cassette.append({
+            'm': request.method, 'p': urlsplit(request.url).path,
+            'b': _request_body(request), 's': resp.status_code,
+            'c': resp.headers.get('Content-Type'),
+            'r': content.decode(resp.encoding or 'utf-8', 'replace'),
+            'e': round(time.time() - started, 6)})
+        return resp
+
+
+class ReplayAdapter(BaseAdapter):
+    """Adapter answering requests from a Cassette without touching the network.
+
+    Requests are matched on method, path and scrubbed body; repeated
+    requests get the recorded responses in order, cycling when exhausted.
+    speed scales the recorded server time: 0 answers immediately, 1 replays
+    at the original pace, 10 ten times faster."""
+    def __init__(self, cassette, speed=0):
+        super(ReplayAdapter, self).__init__()
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._cursor = {}
+        for entry in cassette:
+            key = _request_key(entry['m'], entry['p'], entry['b'])
+            self._entries.setdefault(key, []).append(entry)
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        key = _request_key(request.method, urlsplit(request.url).path,
+                           _request_body(request))
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise requests.exceptions.ConnectionError(
+                    'No recorded response for {} {}'.format(request.method, request.url),
+                    request=request)
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+        entry = entries[index % len(entries)]
+        if self.speed:
+            time.sleep(entry['e'] / float(self.speed))
+        return build_response(request, entry['s'], entry['c'], entry['r'])
+
+    def close(self):
+        pass
+
+
+def method_table(agilepoint):
+    """Map 'Section/RestApi' to the bound generated method on a client"""
+    table = {}
+    for section in ('workflow', 'admin'):
+        obj = getattr(agilepoint, section)
+        for name, func in inspect.getmembers(obj, inspect.ismethod):
+            if name.startswith('_'):
+                continue
+            match = RESTAPI_CALL.search(inspect.getsource(func))
+            if match:
+                table['{}/{}'.format(section.capitalize(), match.group(1))] = func
+    return table
+
+
+def replay_traffic(agilepoint, cassette, speed=0):
+    """Re-issue recorded traffic through the client's generated methods.
+
+    Returns a dict with the number of requests, errors, wall time, CPU
+    microseconds per request and peak traced memory. speed of 0 issues requests
+    back to back; otherwise the recorded inter-arrival times are divided by
+    speed. Requests that do not map onto a generated method are sent through
+    the raw session instead."""
+    table = method_table(agilepoint)
+    session = agilepoint.agilepoint._session  # pylint: disable=protected-access
+    base = urlsplit(agilepoint.agilepoint._url()).path  # pylint: disable=protected-access
+    stats = {'requests': 0, 'errors': 0, 'unmapped': 0}
+    if tracemalloc is not None:
+        tracemalloc.start()
+    cpu_started = CPU_CLOCK()
+    started = time.time()
+    for entry in cassette:
+        if speed:
+            delay = started + entry['t'] / float(speed) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        parts = [unquote(p) for p in entry['p'][len(base):].strip('/').split('/')]
+        func = table.get('/'.join(parts[:2]))
+        stats['requests'] += 1
+        try:
+            if func is None:
+                stats['unmapped'] += 1
+                session.request(entry['m'], agilepoint.agilepoint._url() + entry['p'][len(base):],  # pylint: disable=protected-access
+                                data=entry['b'])
+            else:
+                body = json.loads(entry['b']) if entry['b'] else {}
+                func(*parts[2:], **body)
+        except Exception:  # pylint: disable=broad-except
+            stats['errors'] += 1
+    stats['wall_seconds'] = time.time() - started
+    stats['cpu_per_request_us'] = ((CPU_CLOCK() - cpu_started) /
+                                   max(stats['requests'], 1) * 1e6)
+    if tracemalloc is not None:
+        stats['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return stats
+
+
+class Node(object):
+    """One AgilePoint server behind a BalancingAdapter"""
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.url = url
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.outstanding = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.healthy = True
+
+    def score(self, strategy):
+        """Lower is better"""
+        latency = self.latency or 0.0
+        if strategy == 'ewma':
+            return latency * (self.outstanding + 1)
+        return (self.outstanding, latency)
+
+    def stats(self):
+        """Counters for monitoring"""
+        return {'url': self.url, 'healthy': self.healthy,
+                'outstanding': self.outstanding, 'latency': self.latency,
+                'error_rate': self.error_rate, 'requests': self.requests,
+                'errors': self.errors}
+
+
+class BalancingAdapter(BaseAdapter):
+    """Spread requests over several AgilePoint server nodes.
+
+    Each request goes to the better of two randomly picked healthy nodes,
+    by outstanding requests ('least_outstanding') or by EWMA latency
+    weighted by outstanding requests ('ewma'). A node is ejected after
+    max_failures consecutive connection errors/5xx responses or when its
+    decayed error rate passes max_error_rate; a background thread probes
+    every node each probe_interval seconds (GET <path>/<probe>, by default
+    Admin.get_database_info) and re-admits ejected nodes that answer. Probes
+    reuse the headers of the last request the client sent so they
+    authenticate the same way. Idempotent requests that fail to connect are
+    retried once on another node.
+
+    Built for you when AgilePoint is given a list of hosts; to tune it,
+    build it yourself and pass it as adapter with the first host."""
+    def __init__(self, endpoints, path='AgilePointServer', strategy='least_outstanding',
+                 inner=None, decay=0.2, max_failures=3, max_error_rate=0.5,
+                 probe='Admin/GetDatabaseInfo', probe_interval=10.0):
+        super(BalancingAdapter, self).__init__()
+        if strategy not in ('least_outstanding', 'ewma'):
+            raise ValueError('Unknown balancing strategy {}'.format(strategy))
+        self.nodes = [Node(url) for url in endpoints]
+        self.path = path
+        self.strategy = strategy
+        self.inner = inner or HTTPAdapter(pool_maxsize=32)
+        self.decay = decay
+        self.max_failures = max_failures
+        self.max_error_rate = max_error_rate
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._headers = {}
+        self._stopped = threading.Event()
+        self._prober = None
+
+    def _choose(self, exclude=None):
+        with self._lock:
+            nodes = [n for n in self.nodes if n.healthy and n is not exclude]
+            if not nodes:
+                # Everything is ejected: fail open rather than refuse traffic
+                nodes = [n for n in self.nodes if n is not exclude] or self.nodes
+            if len(nodes) > 1:
+                nodes = self._random.sample(nodes, 2)
+            node = min(nodes, key=lambda n: n.score(self.strategy))
+            node.outstanding += 1
+            node.requests += 1
+        return node
+
+    def _record(self, node, elapsed, failed):
+        with self._lock:
+            node.outstanding -= 1
+            if node.latency is None:
+                node.latency = elapsed
+            else:
+                node.latency += self.decay * (elapsed - node.latency)
+            node.error_rate += self.decay * ((1.0 if failed else 0.0) - node.error_rate)
+            if failed:
+                node.errors += 1
+                node.failures += 1
+                if (node.failures >= self.max_failures or
+                        node.error_rate > self.max_error_rate):
+                    node.healthy = False
+            else:
+                node.failures = 0
+
+    def _route(self, request, node):
+        parts = urlsplit(request.url)
+        routed = request.copy()
+        routed.url = '{}://{}{}'.format(node.scheme, node.netloc, request.url[
+            len(parts.scheme) + 3 + len(parts.netloc):])
+        return routed
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        self._headers = dict((k, v) for k, v in request.headers.items()
+                             if k.lower() in PROBE_HEADERS)
+        self._start_prober()
+        attempts = 2 if request.method in ('GET', 'HEAD', 'OPTIONS') else 1
+        node = None
+        for attempt in range(attempts):
+            node = self._choose(exclude=node)
+            started = time.time()
+            try:
+                resp = self.inner.send(self._route(request, node), **kwargs)
+            except requests.exceptions.ConnectionError:
+                self._record(node, time.time() - started, True)
+                if attempt + 1 == attempts:
+                    raise
+                continue
+            self._record(node, time.time() - started, resp.status_code >= 500)
+            return resp
+
+    def _start_prober(self):
+        if self._prober is None and self.probe_interval:
+            with self._lock:
+                if self._prober is None:
+                    self._prober = threading.Thread(target=self._probe_loop)
+                    self._prober.daemon = True
+                    self._prober.start()
+
+    def probe_node(self, node):
+        """Probe one node now, updating and returning its health"""
+        url = '{}/{}/{}'.format(node.url.rstrip('/'), self.path, self.probe)
+        request = requests.Request('GET', url, headers=self._headers).prepare()
+        try:
+            healthy = self.inner.send(request, timeout=self.probe_interval or 10).status_code < 500
+        except requests.exceptions.RequestException:
+            healthy = False
+        with self._lock:
+            if healthy and not node.healthy:
+                node.failures = 0
+                node.error_rate = 0.0
+            node.healthy = healthy
+        return healthy
+
+    def _probe_loop(self):
+        while not self._stopped.wait(self.probe_interval):
+            for node in self.nodes:
+                self.probe_node(node)
+
+    def stats(self):
+        """Per node counters"""
+        with self._lock:
+            return [node.stats() for node in self.nodes]
+
+    def close(self):
+        self._stopped.set()
+        self.inner.close()
+
+
+class HTTP2Adapter(BaseAdapter):
+    """Send requests over HTTP/2 with httpx, multiplexing concurrent
+    requests as streams on a few connections instead of one request per
+    pooled HTTP/1.1 connection.
+
+    max_connections: connections kept per server; each carries many streams
+    prior_knowledge: speak HTTP/2 straight away on plain http:// URLs (h2c)
+        instead of HTTP/1.1; https:// negotiates HTTP/2 through ALPN and
+        falls back to HTTP/1.1 when the server does not offer it
+    verify/cert: TLS options as for requests
+    Idempotent requests are retried once when their connection drops.
+    Thread safe; share one instance between threads for best multiplexing."""
+    def __init__(self, max_connections=2, prior_knowledge=False, verify=True, cert=None):
+        super(HTTP2Adapter, self).__init__()
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError('HTTP/2 support needs httpx: '
+                              'pip install "agilepoint[http2]"')
+        self._httpx = httpx
+        self.client = httpx.Client(
+            http2=True, http1=not prior_knowledge, verify=verify, cert=cert,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections))
+
+    def _timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return self._httpx.Timeout(read, connect=connect)
+        return self._httpx.Timeout(timeout)
+
+    def send(self, request, stream=False, timeout=None, **kwargs):  # pylint: disable=arguments-differ
+        httpx = self._httpx
+        body = request.body
+        if hasattr(body, 'read'):
+            body = body.read()
+        attempts = 2 if request.method in ('GET', 'HEAD', 'OPTIONS') else 1
+        for attempt in range(attempts):
+            try:
+                answer = self.client.request(request.method, request.url,
+                                             headers=dict(request.headers), content=body,
+                                             timeout=self._timeout(timeout))
+                break
+            except httpx.TimeoutException as error:
+                raise requests.exceptions.Timeout(error, request=request)
+            except httpx.TransportError as error:
+                # A connection torn down (GOAWAY) takes every stream on it
+                # along; idempotent requests get one more try on a new one
+                if attempt + 1 == attempts:
+                    raise requests.exceptions.ConnectionError(error, request=request)
+        resp = requests.Response()
+        resp.status_code = answer.status_code
+        resp.reason = answer.reason_phrase
+        resp.headers = CaseInsensitiveDict(answer.headers.multi_items())
+        # httpx has already decoded any content encoding
+        resp.headers.pop('Content-Encoding', None)
+        resp._content = answer.content  # pylint: disable=protected-access
+        resp.encoding = answer.encoding
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        resp.elapsed = answer.elapsed if answer.elapsed else datetime.timedelta(0)
+        for name, value in answer.cookies.items():
+            resp.cookies.set(name, value)
+        resp.http_version = answer.http_version
+        resp.raw = _Downloaded(answer.num_bytes_downloaded)
+        return resp
+
+    def close(self):
+        self.client.close()
+
+
+class _CountingReader(object):
+    """Counts the body bytes read off a response's socket file, chunk
+    framing included; urllib3's tell() stays at 0 for chunked responses"""
+    def __init__(self, fp):
+        self._fp = fp
+        self.count = 0
+
+    @classmethod
+    def wrap(cls, raw):
+        """Counter installed under a urllib3 response, or None when raw is
+        not one (HTTP/2 responses report their size through tell())"""
+        connection = getattr(raw, '_fp', None)
+        if getattr(connection, 'fp', None) is None:
+            return None
+        counter = connection.fp = cls(connection.fp)
+        return counter
+
+    def _counted(self, data):
+        self.count += len(data)
+        return data
+
+    def read(self, *args):
+        return self._counted(self._fp.read(*args))
+
+    def read1(self, *args):
+        return self._counted(self._fp.read1(*args))
+
+    def readline(self, *args):
+        return self._counted(self._fp.readline(*args))
+
+    def readinto(self, buf):
+        size = self._fp.readinto(buf)
+        self.count += size or 0
+        return size
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+
+class _Downloaded(object):
+    """Stands in for Response.raw so wire sizes can be read with tell()"""
+    def __init__(self, size):
+        self.size = size
+
+    def tell(self):
+        """Bytes received for the body"""
+        return self.size
+
+    def close(self):
+        pass
+
+
+def _gzip(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _deflate(data, level):
+    return zlib.compress(data, level)
+
+
+def _brotli(data, level):
+    import brotli
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+    import zstandard
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+COMPRESSORS = {'gzip': _gzip, 'deflate': _deflate, 'br': _brotli, 'zstd': _zstd}
+
+
+class EndpointCompression(object):
+    """Byte counters for one endpoint"""
+    __slots__ = ('requests', 'compressed', 'request_bytes', 'request_wire_bytes',
+                 'response_bytes', 'response_wire_bytes', 'compress_seconds')
+
+    def __init__(self):
+        self.requests = 0
+        self.compressed = 0
+        self.request_bytes = 0
+        self.request_wire_bytes = 0
+        self.response_bytes = 0
+        self.response_wire_bytes = 0
+        self.compress_seconds = 0.0
+
+    def as_dict(self, bandwidth):
+        """Counters plus ratios and the estimated transfer time saved at
+        bandwidth bytes per second, net of time spent compressing"""
+        result = dict((name, getattr(self, name)) for name in self.__slots__)
+        saved = (self.request_bytes - self.request_wire_bytes +
+                 self.response_bytes - self.response_wire_bytes)
+        result['request_ratio'] = (float(self.request_bytes) / self.request_wire_bytes
+                                   if self.request_wire_bytes else 1.0)
+        result['response_ratio'] = (float(self.response_bytes) / self.response_wire_bytes
+                                    if self.response_wire_bytes else 1.0)
+        result['saved_seconds'] = float(saved) / bandwidth - self.compress_seconds
+        return result
+
+
+class CompressionAdapter(BaseAdapter):
+    """Negotiate compressed responses, compress large request bodies and
+    count what it saves per endpoint.
+
+    inner: adapter doing the actual sending (a pooled HTTPAdapter by default)
+    path: server path, to name endpoints Section/RestApi in stats()
+    threshold: compress request bodies of at least this many bytes; None
+        leaves request bodies alone (the server must accept compressed
+        requests, which IIS only does when configured to)
+    encoding/level: request compression, 'gzip' (default), 'deflate', or
+        'br'/'zstd' when brotli/zstandard are installed
+    accept: Accept-Encoding to send instead of the client's, which names
+        every coding urllib3 can decode (gzip and deflate, plus br/zstd
+        when their libraries are installed)
+    bandwidth: bytes per second used to turn saved bytes into saved time
+
+    Responses are decompressed transparently by requests."""
+    def __init__(self, inner=None, path='AgilePointServer', threshold=None,
+                 encoding='gzip', level=6, accept=None, bandwidth=12.5e6):
+        super(CompressionAdapter, self).__init__()
+        if encoding not in COMPRESSORS:
+            raise ValueError('Unknown request encoding {}'.format(encoding))
+        self.inner = inner or HTTPAdapter(pool_maxsize=32)
+        self.path = path
+        self.threshold = threshold
+        self.encoding = encoding
+        self.level = level
+        self.accept = accept
+        self.bandwidth = bandwidth
+        self._compress = COMPRESSORS[encoding]
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _prepare(self, request):
+        """(request to send, raw body size, sent body size, seconds compressing)"""
+        body = request.body
+        if body is None or hasattr(body, 'read'):
+            return request, 0, 0, 0.0
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        if (self.threshold is None or len(body) < self.threshold or
+                'Content-Encoding' in request.headers):
+            return request, len(body), len(body), 0.0
+        started = CPU_CLOCK()
+        compressed = self._compress(body, self.level)
+        elapsed = CPU_CLOCK() - started
+        if len(compressed) >= len(body):
+            return request, len(body), len(body), elapsed
+        request = request.copy()
+        request.body = compressed
+        request.headers['Content-Encoding'] = self.encoding
+        request.headers['Content-Length'] = str(len(compressed))
+        return request, len(body), len(compressed), elapsed
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        if self.accept:
+            request.headers['Accept-Encoding'] = self.accept
+        elif 'Accept-Encoding' not in request.headers:
+            request.headers['Accept-Encoding'] = accept_encoding()
+        sent, raw_size, wire_size, elapsed = self._prepare(request)
+        resp = self.inner.send(sent, **kwargs)
+        response_size = response_wire = 0
+        if not kwargs.get('stream'):
+            counter = _CountingReader.wrap(resp.raw)
+            response_size = len(resp.content)
+            if counter is not None:
+                response_wire = counter.count
+            else:
+                response_wire = getattr(resp.raw, 'tell', lambda: response_size)()
+        endpoint = endpoint_name(request.url, self.path)
+        with self._lock:
+            counters = self._endpoints.get(endpoint)
+            if counters is None:
+                counters = self._endpoints[endpoint] = EndpointCompression()
+            counters.requests += 1
+            counters.compressed += int(sent is not request)
+            counters.request_bytes += raw_size
+            counters.request_wire_bytes += wire_size
+            counters.response_bytes += response_size
+            counters.response_wire_bytes += response_wire
+            counters.compress_seconds += elapsed
+        return resp
+
+    def stats(self):
+        """{endpoint: counters, ratios and saved_seconds}"""
+        with self._lock:
+            return dict((endpoint, counters.as_dict(self.bandwidth))
+                        for endpoint, counters in self._endpoints.items())
+
+    def close(self):
+        self.inner.close()
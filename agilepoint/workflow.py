@@ -1,14 +1,21 @@
 """Workflow Methods for AgilePoint API"""
 import json
-from ._utils import handle_response, validate_args
+from ._schema import LazySection, NO_VALIDATION
+from ._utils import handle_response
 # pylint: disable=too-many-public-methods,too-many-lines
 
+VALIDATORS = LazySection('Workflow')
+
 
 class Workflow(object):
     """Workflow Methods for AgilePoint API"""
     def __init__(self, agilepoint):
         self.workflow = agilepoint.agilepoint.Workflow
         self.agilepoint = agilepoint
+        if getattr(agilepoint, 'validate', True):
+            self.validate = VALIDATORS
+        else:
+            self.validate = NO_VALIDATION
 
     def activate_work_item(self, workitemid, activate, **kwargs):
         """Activates a work item.
@@ -18,17 +25,16 @@ class Workflow(object):
         Path Args: workItemID, activate
         Required Body Args: clientData
         Optional Body Args: None"""
-        req_args = ['clientData']
-        validate_args(kwargs, req_args)
-        resp = self.workflow.ActivateWorkItem(workitemid)(
-            activate).POST(data=json.dumps(kwargs))
+        self.validate['activate_work_item'](kwargs)
+        resp = self.workflow.ActivateWorkItem(workitemid)(activate).POST(
+            data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def archive_proc_inst(self, procinstid):
         """Archives a process instance based on a specified process instance
         identifier by moving the set of process instance records from the
-        current AgilePoint Database into the AgilePoint Archive Database.
-        The process instance records and all of the associated data are then
+        current AgilePoint Database into the AgilePoint Archive Database. The
+        process instance records and all of the associated data are then
         deleted from the AgilePoint Database. The process instance to be
         archived must be completed or canceled.
 
@@ -43,8 +49,8 @@ class Workflow(object):
     def assign_work_item(self, workitemid, **kwargs):
         """Assigns a work item to a user, which often means claiming a work
         item for oneself. This is often used with task pools where work items
-        are created, and then multiple users are notified, but the work item
-        is not immediately assigned to a user. A user then claims the work item,
+        are created, and then multiple users are notified, but the work item is
+        not immediately assigned to a user. A user then claims the work item,
         or his manager assigns it to him. The user must have privileges to
         claim or assign the work item.
 
@@ -53,8 +59,7 @@ class Workflow(object):
         Path Args: workItemID
         Required Body Args: clientData
         Optional Body Args: None"""
-        req_args = ['clientData']
-        validate_args(kwargs, req_args)
+        self.validate['assign_work_item'](kwargs)
         resp = self.workflow.AssignWorkItem(workitemid).POST(
             data=json.dumps(kwargs))
         return handle_response('json', resp)
@@ -63,8 +68,8 @@ class Workflow(object):
         """Cancels a manual activity instance along with all manual work items
         associated with the specified manual activity instance ID. Note that an
         activity instance can be associated with one or more manual work items.
-        Once the manual activity instance is canceled, the process instance will
-        move forward to the next activity.
+        Once the manual activity instance is canceled, the process instance
+        will move forward to the next activity.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodCancelActivityInst.html
 
@@ -123,24 +128,22 @@ class Workflow(object):
         Path Args: workItemID
         Required Body Args: clientData
         Optional Body Args: None"""
-        req_args = ['clientData']
-        validate_args(kwargs, req_args)
-        resp = self.workflow.CancelWorkItem(
-            workitemid).POST(data=json.dumps(kwargs))
+        self.validate['cancel_work_item'](kwargs)
+        resp = self.workflow.CancelWorkItem(workitemid).POST(
+            data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def checkin_proc_def(self, **kwargs):
-        """Checks in the process definition to the AgilePoint Server and returns
-        the process definition identifier. This method accepts a string with the
-        updated process definition in XML format.
+        """Checks in the process definition to the AgilePoint Server and
+        returns the process definition identifier. This method accepts a string
+        with the updated process definition in XML format.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodCheckinProcDef.html
 
         Path Args: None
         Required Body Args: xml
         Optional Body Args: None"""
-        req_args = ['xml']
-        validate_args(kwargs, req_args)
+        self.validate['checkin_proc_def'](kwargs)
         resp = self.workflow.CheckinProcDef.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -178,18 +181,16 @@ class Workflow(object):
         Path Args: None
         Required Body Args: clientData
         Optional Body Args: None"""
-        req_args = ['clientData']
-        validate_args(kwargs, req_args)
+        self.validate['complete_work_item'](kwargs)
         resp = self.workflow.CompleteWorkItem(workitemid).POST(
             data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def create_linked_work_item(self, **kwargs):
         """Creates a manual work item that is linked to another manual work
-        item. The work item you create does not depend on the completion of
-        the work item to which it is linked. In other words, the original
-        (source) work item can be marked as completed before new work item is
-        completed.
+        item. The work item you create does not depend on the completion of the
+        work item to which it is linked. In other words, the original (source)
+        work item can be marked as completed before new work item is completed.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodCreateLinkedWorkItem.html
 
@@ -197,9 +198,7 @@ class Workflow(object):
         Required Body Args: bDependent, BusinessTime, ClientData, Length,
                             SourceWorkItemID, Unit, UserID, WorkToPerform
         Optional Body Args: None"""
-        req_args = ['bDependent', 'BusinessTime', 'ClientData', 'Length',
-                    'SourceWorkItemID', 'Unit', 'UserID', 'WorkToPerform']
-        validate_args(kwargs, req_args)
+        self.validate['create_linked_work_item'](kwargs)
         resp = self.workflow.CreateLinkedWorkItem.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -223,13 +222,9 @@ class Workflow(object):
         Path Args: None
         Required Body Args: Attributes, blnStartImmediately, CustomID,
                             Initiator, ProcessID, ProcessInstID, ProcInstName,
-                            WorkObjID, 
+                            WorkObjID,
         Optional Body Args: SuperProcInstID, WorkObjInfo"""
-        req_args = ['Attributes', 'blnStartImmediately', 'CustomID',
-                    'Initiator', 'ProcessID', 'ProcessInstID', 'ProcInstName',
-                    'WorkObjID']
-
-        validate_args(kwargs, req_args)
+        self.validate['create_proc_inst'](kwargs)
         resp = self.workflow.CreateProcInst.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -252,9 +247,7 @@ class Workflow(object):
         Required Body Args: bReserved, BusinessTime, ClientData, Length,
                             SourceWorkItemID, Unit, UserID, WorkToPerform
         Optional Body Args: None"""
-        req_args = ['bReserved', 'BusinessTime', 'ClientData', 'Length',
-                    'SourceWorkItemID', 'Unit', 'UserID', 'WorkToPerform']
-        validate_args(kwargs, req_args)
+        self.validate['create_pseudo_work_item'](kwargs)
         resp = self.workflow.CreatePseudoWorkItem.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -270,9 +263,7 @@ class Workflow(object):
         Required Body Args: bDependent, BusinessTime, ClientData, Length,
                             SourceWorkItemID, Unit, UserID, WorkToPerform
         Optional Body Args: None"""
-        req_args = ['bReserved', 'BusinessTime', 'ClientData', 'Length',
-                    'SourceWorkItemID', 'Unit', 'UserID', 'WorkToPerform']
-        validate_args(kwargs, req_args)
+        self.validate['create_work_item'](kwargs)
         resp = self.workflow.CreateWorkItem.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -289,11 +280,11 @@ class Workflow(object):
 
     def delete_proc_def(self, processtemplateid):
         """Deletes the process definition and all of the process instances
-        associated with the process definition. The process definition cannot be
-        deleted if one or more process instances associated with the process
-        definition is running or suspended. The function may take a long time to
-        execute if there are many process instances associated with the process
-        definition.
+        associated with the process definition. The process definition cannot
+        be deleted if one or more process instances associated with the process
+        definition is running or suspended. The function may take a long time
+        to execute if there are many process instances associated with the
+        process definition.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodDeleteProcDef.html
 
@@ -304,9 +295,9 @@ class Workflow(object):
         return handle_response('bool', resp)
 
     def delete_proc_inst(self, processinstanceid):
-        """Deletes a process instance. This method removes the specified process
-        instance and all the associated data from the database, such as work
-        items, email, and activity instances associated with this process
+        """Deletes a process instance. This method removes the specified
+        process instance and all the associated data from the database, such as
+        work items, email, and activity instances associated with this process
         instance. It may take some time to complete this transaction.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodDeleteProcInst.html
@@ -375,8 +366,7 @@ class Workflow(object):
         Path Args: customID
         Required Body Args: attrName
         Optional Body Args: None"""
-        req_args = ['attrName']
-        validate_args(kwargs, req_args)
+        self.validate['get_custom_attr'](kwargs)
         resp = self.workflow.GetCustomAttr(customid).POST(
             data=json.dumps(kwargs))
         return handle_response('json', resp)
@@ -401,9 +391,9 @@ class Workflow(object):
         Path Args: None
         Required Body Args: AttrNames, CustomIDs
         Optional Body Args: None"""
-        req_args = ['AttrNames', 'CustomIDs']
-        validate_args(kwargs, req_args)
-        resp = self.workflow.GetCustomAttrsByNames.POST(data=json.dumps(kwargs))
+        self.validate['get_custom_attrs_by_names'](kwargs)
+        resp = self.workflow.GetCustomAttrsByNames.POST(
+            data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def get_event(self, eventid):
@@ -431,7 +421,8 @@ class Workflow(object):
         return handle_response('json', resp)
 
     def get_expecting_send_mail_deliverable(self):  # pylint: disable=invalid-name
-        """Retrieves all the failed and scheduled to resend email notifications.
+        """Retrieves all the failed and scheduled to resend email
+        notifications.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodGetExpectingSendMailDeliverable.html
 
@@ -620,8 +611,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: Status, UserName
         Optional Body Args: None"""
-        req_args = ['Status', 'UserName']
-        validate_args(kwargs, req_args)
+        self.validate['get_work_list_by_user_i_d'](kwargs)
         resp = self.workflow.GetWorkListByUserID.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -635,8 +625,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: MergingProcessInstanceIDs, MergedProcessInstance
         Optional Body Args: None"""
-        req_args = ['MergingProcessInstanceIDs', 'MergedProcessInstance']
-        validate_args(kwargs, req_args)
+        self.validate['merge_proc_insts'](kwargs)
         resp = self.workflow.MergeProcInsts.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -647,13 +636,12 @@ class Workflow(object):
 
         Path Args: processInstanceID, reserved
         Required Body Args: IncludeXmlData, Action, MatchingActivityDefinition,
-                            SourceProcessDefinitionID, TargetProcessDefinitionID
+                            SourceProcessDefinitionID,
+                            TargetProcessDefinitionID
         Optional Body Args: None"""
-        req_args = ['IncludeXmlData', 'Action', 'MatchingActivityDefinition',
-                    'SourceProcessDefinitionID', 'TargetProcessDefinitionID']
-        validate_args(kwargs, req_args)
-        resp = self.workflow.MigrateProcInst(processinstanceid)(
-            reserved).POST(data=json.dumps(kwargs))
+        self.validate['migrate_proc_inst'](kwargs)
+        resp = self.workflow.MigrateProcInst(processinstanceid)(reserved).POST(
+            data=json.dumps(kwargs))
         return handle_response('bool', resp)
 
     def query_activity_insts(self, **kwargs):
@@ -664,8 +652,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: ColumnName, Operator, IsValue
         Optional Body Args: None"""
-        req_args = ['ColumnName', 'Operator', 'IsValue']
-        validate_args(kwargs, req_args)
+        self.validate['query_activity_insts'](kwargs)
         resp = self.workflow.QueryActivityInsts.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -677,36 +664,33 @@ class Workflow(object):
         Path Args: None
         Required Body Args: where
         Optional Body Args: None"""
-        req_args = ['where']
-        validate_args(kwargs, req_args)
+        self.validate['query_audit_trail'](kwargs)
         resp = self.workflow.QueryAuditTrail.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def query_database(self, **kwargs):
-        """Queries the database with any valid sql query and returns the dataset
-        as a string in XML format.
+        """Queries the database with any valid sql query and returns the
+        dataset as a string in XML format.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodQueryDatabase.html
 
         Path Args: None
         Required Body Args: sql
         Optional Body Args: None"""
-        req_args = ['sql']
-        validate_args(kwargs, req_args)
+        self.validate['query_database'](kwargs)
         resp = self.workflow.QueryDatabase.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def query_procedure_list(self, **kwargs):
-        """Retrieves a list of automatic work items that match a specified query
-        expression.
+        """Retrieves a list of automatic work items that match a specified
+        query expression.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodQueryProcedureList.html
 
         Path Args: None
         Required Body Args: ColumnName, Operator, WhereClause, IsValue
         Optional Body Args: None"""
-        req_args = ['ColumnName', 'Operator', 'WhereClause', 'IsValue']
-        validate_args(kwargs, req_args)
+        self.validate['query_procedure_list'](kwargs)
         resp = self.workflow.QueryProcedureList.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -720,8 +704,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: ColumnName, Operator, IsValue
         Optional Body Args: None"""
-        req_args = ['ColumnName', 'Operator', 'IsValue']
-        validate_args(kwargs, req_args)
+        self.validate['query_proc_insts'](kwargs)
         resp = self.workflow.QueryProcInsts.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -734,8 +717,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: sqlWhereClause
         Optional Body Args: None"""
-        req_args = ['sqlWhereClause']
-        validate_args(kwargs, req_args)
+        self.validate['query_proc_insts_using_s_q_l'](kwargs)
         resp = self.workflow.QueryProcInstsUsingSQL.POST(
             data=json.dumps(kwargs))
         return handle_response('json', resp)
@@ -749,8 +731,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: ColumnName, Operator, WhereClause, IsValue
         Optional Body Args: None"""
-        req_args = ['ColumnName', 'Operator', 'WhereClause', 'IsValue']
-        validate_args(kwargs, req_args)
+        self.validate['query_work_list'](kwargs)
         resp = self.workflow.QueryWorkList.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -763,9 +744,9 @@ class Workflow(object):
         Path Args: None
         Required Body Args: sqlWhereClause
         Optional Body Args: None"""
-        req_args = ['sqlWhereClause']
-        validate_args(kwargs, req_args)
-        resp = self.workflow.QueryWorkListUsingSQL.POST(data=json.dumps(kwargs))
+        self.validate['query_work_list_using_s_q_l'](kwargs)
+        resp = self.workflow.QueryWorkListUsingSQL.POST(
+            data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def reassign_work_item(self, **kwargs):
@@ -777,8 +758,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: ClientData, UserName, WorkItemID
         Optional Body Args: None"""
-        req_args = ['ClientData', 'UserName', 'WorkItemID']
-        validate_args(kwargs, req_args)
+        self.validate['reassign_work_item'](kwargs)
         resp = self.workflow.ReassignWorkItem.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -801,8 +781,7 @@ class Workflow(object):
         Path Args: customID
         Required Body Args: attributeName
         Optional Body Args: None"""
-        req_args = ['attributeName']
-        validate_args(kwargs, req_args)
+        self.validate['remove_custom_attr'](kwargs)
         resp = self.workflow.RemoveCustomAttr(customid).POST(
             data=json.dumps(kwargs))
         return handle_response('bool', resp)
@@ -815,9 +794,9 @@ class Workflow(object):
         Path Args: customID
         Required Body Args: namesArray
         Optional Body Args: None"""
-        req_args = ['namesArray']
-        validate_args(kwargs, req_args)
-        resp = self.workflow.RemoveCustomAttrs(customid).POST(data=json.dumps(kwargs))
+        self.validate['remove_custom_attrs'](kwargs)
+        resp = self.workflow.RemoveCustomAttrs(customid).POST(
+            data=json.dumps(kwargs))
         return handle_response('bool', resp)
 
     def resend_mail_deliverable(self, mailid):
@@ -833,9 +812,9 @@ class Workflow(object):
 
     def restore_proc_inst(self, procinstid):
         """Restores a process instance and associated data from the
-        ArchiveDatabase to the AgilePoint Server. The process instance
-        records are written to the AgilePoint Database deleted from the
-        AgilePoint Archive Database.
+        ArchiveDatabase to the AgilePoint Server. The process instance records
+        are written to the AgilePoint Database deleted from the AgilePoint
+        Archive Database.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodRestoreProcInst.html
 
@@ -880,9 +859,9 @@ class Workflow(object):
         Path Args: None
         Required Body Args: PartialRollbackUnits
         Optional Body Args: None"""
-        req_args = ['PartialRollbackUnits']
-        validate_args(kwargs, req_args)
-        resp = self.workflow.RollbackActivityInsts.POST(data=json.dumps(kwargs))
+        self.validate['rollback_activity_insts'](kwargs)
+        resp = self.workflow.RollbackActivityInsts.POST(
+            data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def rollback_proc_inst(self, activityinstanceid):
@@ -908,8 +887,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: Attachments, Body, CC, From, Subject, To
         Optional Body Args: None"""
-        req_args = ['Attachments, Body, CC, From, Subject, To']
-        validate_args(kwargs, req_args)
+        self.validate['send_mail'](kwargs)
         resp = self.workflow.SendMail.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -922,9 +900,9 @@ class Workflow(object):
         Path Args: customID
         Required Body Args: attributes
         Optional Body Args: None"""
-        req_args = ['attributes']
-        validate_args(kwargs, req_args)
-        resp = self.workflow.SetCustomAttrs(customid).POST(data=json.dumps(kwargs))
+        self.validate['set_custom_attrs'](kwargs)
+        resp = self.workflow.SetCustomAttrs(customid).POST(
+            data=json.dumps(kwargs))
         return handle_response('bool', resp)
 
     def set_proc_def_supplement(self, processdefinitionid, activitydefinitionid):
@@ -948,8 +926,7 @@ class Workflow(object):
         Path Args: None
         Required Body Args: SplitProcessInstances, SplittingProcessInstanceID
         Optional Body Args: None"""
-        req_args = ['SplitProcessInstances', 'SplittingProcessInstanceID']
-        validate_args(kwargs, req_args)
+        self.validate['split_proc_inst'](kwargs)
         resp = self.workflow.SplitProcInst.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -991,26 +968,25 @@ class Workflow(object):
         Path Args: workItemID
         Required Body Args: clientData
         Optional Body Args: None"""
-        req_args = ['clientData']
-        validate_args(kwargs, req_args)
+        self.validate['undo_assign_work_item'](kwargs)
         resp = self.workflow.UndoAssignWorkItem(workitemid).POST(
             data=json.dumps(kwargs))
         return handle_response('json', resp)
 
     def update_proc_def(self, **kwargs):
         """Updates a process definition without using version control. This
-        method is intended for minor changes only, such as typographical errors.
-        Warning: Changes made using this method circumvent version control,
-        meaning changes are not tracked, and versions cannot be managed. Do not
-        use this call for making any major changes to the process definition.
+        method is intended for minor changes only, such as typographical
+        errors. Warning: Changes made using this method circumvent version
+        control, meaning changes are not tracked, and versions cannot be
+        managed. Do not use this call for making any major changes to the
+        process definition.
 
         http://documentation.agilepoint.com/SupportPortal/DOCS/ProductDocumentation/CurrentRelease/DocumentationLibrary/maps/restmethodUpdateProcDef.html
 
         Path Args: None
         Required Body Args: xml
         Optional Body Args: None"""
-        req_args = ['xml']
-        validate_args(kwargs, req_args)
+        self.validate['update_proc_def'](kwargs)
         resp = self.workflow.UpdateProcDef.POST(data=json.dumps(kwargs))
         return handle_response('json', resp)
 
@@ -1023,8 +999,7 @@ class Workflow(object):
         Path Args: processInstanceID
         Required Body Args: attributes
         Optional Body Args: None"""
-        req_args = ['attributes']
-        validate_args(kwargs, req_args)
+        self.validate['update_proc_inst'](kwargs)
         resp = self.workflow.UpdateProcInst(processinstanceid).POST(
             data=json.dumps(kwargs))
         return handle_response('bool', resp)
@@ -1037,8 +1012,7 @@ class Workflow(object):
         Path Args: workItemID
         Required Body Args: attributes
         Optional Body Args: None"""
-        req_args = ['attributes']
-        validate_args(kwargs, req_args)
+        self.validate['update_work_item'](kwargs)
         resp = self.workflow.UpdateWorkItem(workitemid).POST(
             data=json.dumps(kwargs))
         return handle_response('bool', resp)
@@ -0,0 +1,53 @@
+"""asyncio mode of benchmark.py (Python 3 only).
+
+The generated Workflow/Admin methods are synchronous, so the async mode
+replays the request a method builds through httpx.AsyncClient: calls run
+as coroutines on one event loop over at most workers connections, with no
+thread per call. Client-side request building is measured by the overhead
+figures instead. Needs httpx (pip install httpx).
+"""
+import asyncio
+import time
+import httpx
+
+TIMER = time.perf_counter
+# Set by httpx itself from the body it sends
+SKIPPED_HEADERS = ('content-length', 'connection', 'transfer-encoding')
+
+
+def run_async(request, iterations, workers):
+    """Send a requests PreparedRequest iterations times from workers
+    coroutines; returns (ops/s, latencies, errors) like run_mode"""
+    headers = dict((key, value) for key, value in request.headers.items()
+                   if key.lower() not in SKIPPED_HEADERS)
+    body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+    latencies = []
+    errors = [0]
+    remaining = [iterations]
+
+    async def worker(client):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            started = TIMER()
+            try:
+                resp = await client.request(request.method, request.url, headers=headers,
+                                            content=body)
+                resp.raise_for_status()
+                resp.json()
+            except Exception:  # pylint: disable=broad-except
+                errors[0] += 1
+            latencies.append(TIMER() - started)
+
+    async def main():
+        limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+        async with httpx.AsyncClient(limits=limits) as client:
+            started = TIMER()
+            await asyncio.gather(*[worker(client) for _ in range(workers)])
+            return TIMER() - started
+
+    loop = asyncio.new_event_loop()
+    try:
+        elapsed = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    return iterations / elapsed, latencies, errors[0]
@@ -0,0 +1,545 @@
+#!/usr/bin/env python
+"""Per-endpoint benchmarks for the generated Workflow and Admin methods.
+
+Two measurements are taken for every public method:
+
+overhead
+    Client-side cost of one call with the network replaced by a canned
+    response: URL building, validate_args, json encoding, the requests
+    session machinery, response decoding and handle_response.
+throughput
+    Calls per second and latency percentiles against the stand-in server
+    from stub_server.py, run sync, on a thread pool and as asyncio
+    coroutines over httpx.AsyncClient (see bench_async.py; Python 3 with
+    httpx only).
+
+Results can be stored as a baseline and later runs compared against it::
+
+    python helper/benchmark.py --save-baseline helper/bench_baseline.json
+    python helper/benchmark.py --baseline helper/bench_baseline.json --threshold 0.2
+
+The comparison exits non-zero when any method's overhead grew or its
+throughput dropped by more than the threshold.
+
+--import-time measures cold start instead: fresh interpreters importing the
+package, building a client and touching its sections.
+
+--memory measures result decoding instead: RSS retained and peak while
+handle_response decodes a large query_work_list response, plain and with
+agilepoint._utils.decoding projection and string interning, each in a fresh
+interpreter.
+
+--http2 compares transports instead: threaded get_work_item/get_proc_inst
+fan-out over pooled HTTP/1.1 connections and over multiplexed HTTP/2, both
+against the hypercorn stand-in server (needs httpx[http2] and hypercorn).
+"""
+from __future__ import print_function
+import argparse
+import inspect
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent import futures
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from agilepoint import AgilePoint  # pylint: disable=wrong-import-position
+from agilepoint import _utils  # pylint: disable=wrong-import-position
+from agilepoint._schema import Validator, field_type  # pylint: disable=wrong-import-position
+from agilepoint.admin import Admin  # pylint: disable=wrong-import-position
+from agilepoint.exceptions import MissingRequiredArg  # pylint: disable=wrong-import-position
+from agilepoint.workflow import Workflow  # pylint: disable=wrong-import-position
+import stub_server  # pylint: disable=wrong-import-position
+
+try:
+    import bench_async
+except (ImportError, SyntaxError):  # Python 2, or httpx missing
+    bench_async = None
+
+MODES = ('sync', 'threaded', 'async')
+TIMER = getattr(time, 'perf_counter', time.time)
+PLACEHOLDERS = {'bool': True, 'list': [], 'date': '/Date(1500000000000)/'}
+
+
+class CannedAdapter(requests.adapters.BaseAdapter):
+    """requests adapter answering every request with the same json body"""
+    def __init__(self, payload=None):
+        super(CannedAdapter, self).__init__()
+        self.content = json.dumps(payload or {'Result': {'Status': 'OK'}}).encode('utf-8')
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = self.content  # pylint: disable=protected-access
+        resp.headers['Content-Type'] = 'application/json'
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(CannedAdapter):
+    """CannedAdapter keeping the last request it was sent"""
+    request = None
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        self.request = request
+        return super(RecordingAdapter, self).send(request, **kwargs)
+
+
+def offline_client():
+    """AgilePoint client whose transport never leaves the process"""
+    client = AgilePoint('http://offline', 'AgilePointServer', 'user', 'pass')
+    session = client.agilepoint._session  # pylint: disable=protected-access
+    session.mount('http://', CannedAdapter())
+    return client
+
+
+def generated_methods(section_cls):
+    """Names of the generated endpoint methods on Workflow or Admin"""
+    return sorted(name for name, _ in inspect.getmembers(section_cls)
+                  if not name.startswith('_') and callable(getattr(section_cls, name)))
+
+
+def path_arg_names(func):
+    """Positional arguments of a generated method, minus self"""
+    try:
+        params = inspect.signature(func).parameters
+        return [p.name for p in params.values()
+                if p.kind == p.POSITIONAL_OR_KEYWORD and p.name != 'self']
+    except AttributeError:  # Python 2
+        return inspect.getargspec(func).args[1:]  # pylint: disable=deprecated-method
+
+
+def discover_call(func, ids=None):
+    """Build (args, kwargs) that satisfy a generated method's validation.
+
+    Required body args are discovered by calling the method against an
+    offline client until it stops raising MissingRequiredArg."""
+    ids = ids or {}
+    args = [ids.get(name, 'X') for name in path_arg_names(func)]
+    kwargs = {}
+    for _ in range(30):
+        try:
+            func(*args, **kwargs)
+            return args, kwargs
+        except MissingRequiredArg as error:
+            if error.message in kwargs:
+                break
+            kwargs[error.message] = PLACEHOLDERS.get(field_type(error.message), 'X')
+        except Exception:  # pylint: disable=broad-except
+            break
+    return args, kwargs
+
+
+def time_calls(func, args, kwargs, iterations):
+    """Mean microseconds per call"""
+    started = TIMER()
+    for _ in range(iterations):
+        func(*args, **kwargs)
+    elapsed = TIMER() - started
+    return elapsed / iterations * 1e6
+
+
+def component_overhead(iterations):
+    """Microbenchmarks for the individual pieces of a generated call"""
+    client = offline_client()
+    kwargs = {'ColumnName': 'Status', 'Operator': '=', 'IsValue': 'New',
+              'WhereClause': ''}
+    req_args = ['ColumnName', 'Operator', 'WhereClause', 'IsValue']
+    body = json.dumps(kwargs)
+    resp = client.agilepoint.Workflow.QueryWorkList.POST(data=body)
+    results = {
+        'url_build': time_calls(lambda: client.agilepoint.Workflow.GetWorkItem('X')._url(),
+                                (), {}, iterations),
+        'validate_args': time_calls(_utils.validate_args, (kwargs, req_args), {},
+                                    iterations),
+        'compiled_validator': time_calls(Validator(req_args), (kwargs,), {}, iterations),
+        'json_encode': time_calls(json.dumps, (kwargs,), {}, iterations),
+        'json_decode': time_calls(json.loads, (body,), {}, iterations),
+        'handle_response': time_calls(_utils.handle_response, ('json', resp), {},
+                                      iterations),
+    }
+    return results
+
+
+IMPORT_SCENARIOS = [
+    ('import', 'import agilepoint'),
+    ('client', 'import agilepoint; agilepoint.AgilePoint("http://h", "p", "u", "p")'),
+    ('workflow', 'import agilepoint; '
+                 'agilepoint.AgilePoint("http://h", "p", "u", "p").workflow'),
+    ('workflow_admin', 'import agilepoint; '
+                       'ap = agilepoint.AgilePoint("http://h", "p", "u", "p"); '
+                       'ap.workflow; ap.admin'),
+]
+
+
+def import_time(runs):
+    """Median milliseconds for fresh interpreters to run each cold start
+    scenario, alongside an empty interpreter for reference"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.join(here, '..'), here, os.environ.get('PYTHONPATH', '')]))
+
+    def median_ms(code):
+        samples = []
+        for _ in range(runs):
+            started = TIMER()
+            subprocess.check_call([sys.executable, '-c', code], env=env)
+            samples.append((TIMER() - started) * 1000)
+        return percentile(samples, 50)
+
+    results = {'interpreter': median_ms('pass')}
+    for name, code in IMPORT_SCENARIOS:
+        results[name] = median_ms(code)
+    return results
+
+
+MEMORY_VARIANTS = (
+    ('plain', None),
+    ('intern', {'intern': True}),
+    ('fields', {'fields': ('WorkItemID', 'Status', 'UserID', 'Name')}),
+    ('fields+intern', {'fields': ('WorkItemID', 'Status', 'UserID', 'Name'),
+                       'intern': True}),
+)
+
+
+def work_list_payload(rows, path):
+    """Write a query_work_list response of rows synthetic work items"""
+    rand = stub_server.random.Random(1)
+    statuses = ('New', 'Assigned', 'Completed', 'Canceled', 'Overdue')
+    users = ['DOMAIN\\user{:06d}'.format(i) for i in range(2000)]
+    activities = ['Activity {}'.format(i) for i in range(50)]
+    definitions = ['{:032X}'.format(rand.getrandbits(128)) for _ in range(20)]
+    items = []
+    for i in range(rows):
+        items.append({
+            'WorkItemID': '{:032X}'.format(rand.getrandbits(128)),
+            'ActivityInstanceID': '{:032X}'.format(rand.getrandbits(128)),
+            'ProcessInstanceID': '{:032X}'.format(i // 5),
+            'ProcessDefinitionID': rand.choice(definitions),
+            'Name': rand.choice(activities), 'Status': rand.choice(statuses),
+            'UserID': rand.choice(users),
+            'AssignedDate': '/Date({})/'.format(1500000000000 + i * 1000),
+            'DueDate': '/Date({})/'.format(1500086400000 + i * 1000),
+            'CompletedDate': None})
+    with open(path, 'w') as f_handle:
+        json.dump({'QueryWorkListResult': items}, f_handle)
+
+
+def _rss_mb():
+    with open('/proc/self/statm') as f_handle:
+        return int(f_handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def _memory_run(path, options):
+    """Decode the payload at path once; print json figures (run in a child)"""
+    import gc
+    import resource
+    resp = requests.Response()
+    resp.status_code = 200
+    with open(path, 'rb') as f_handle:
+        resp._content = f_handle.read()  # pylint: disable=protected-access
+    resp.encoding = 'utf-8'
+    gc.collect()
+    before = _rss_mb()
+    started = TIMER()
+    if options is None:
+        result = _utils.handle_response('json', resp)
+    else:
+        with _utils.decoding(**options):
+            result = _utils.handle_response('json', resp)
+    seconds = TIMER() - started
+    gc.collect()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+    print(json.dumps({'rows': len(result['QueryWorkListResult']), 'seconds': seconds,
+                      'retained_mb': _rss_mb() - before, 'peak_mb': peak - before}))
+
+
+def memory(rows):
+    """Decode figures per MEMORY_VARIANTS entry for a rows item response"""
+    import tempfile
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.join(here, '..'), here, os.environ.get('PYTHONPATH', '')]))
+    handle, path = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        work_list_payload(rows, path)
+        results = {}
+        for name, options in MEMORY_VARIANTS:
+            output = subprocess.check_output(
+                [sys.executable, '-c', 'import benchmark; benchmark._memory_run({!r}, {!r})'
+                 .format(path, options)], env=env)
+            results[name] = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        return results
+    finally:
+        os.remove(path)
+
+
+def overhead(methods, iterations):
+    """Per method client-side overhead in microseconds"""
+    client = offline_client()
+    results = {}
+    for section, name in methods:
+        func = getattr(getattr(client, section), name)
+        args, kwargs = discover_call(func)
+        try:
+            results['{}.{}'.format(section, name)] = time_calls(func, args, kwargs,
+                                                                iterations)
+        except Exception as error:  # pylint: disable=broad-except
+            print('  overhead {}.{} failed: {!r}'.format(section, name, error))
+    return results
+
+
+def sample_ids(state):
+    """Real identifiers from the stand-in server for path arguments"""
+    first = lambda table: sorted(table)[0] if table else 'X'
+    proc_inst = first(state.proc_insts)
+    return {
+        'workitemid': first(state.work_items),
+        'processinstanceid': proc_inst, 'procinstid': proc_inst,
+        'customid': proc_inst,
+        'activityinstanceid': first(state.activity_insts),
+        'processtemplateid': first(state.proc_defs),
+        'baseprocesstemplateid': first(state.proc_defs),
+        'processid': first(state.proc_defs),
+        'eventid': first(state.events),
+        'mailid': first(state.mail),
+        'groupname': first(state.groups),
+        'rolename': first(state.roles),
+        'delegationid': first(state.delegations),
+    }
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def run_mode(mode, call, iterations, workers):
+    """Run call iterations times, sync or threaded, returning
+    (ops/s, latencies, errors)"""
+    latencies = []
+    errors = [0]
+
+    def timed():
+        started = TIMER()
+        try:
+            call()
+        except Exception:  # pylint: disable=broad-except
+            errors[0] += 1
+        latencies.append(TIMER() - started)
+
+    started = TIMER()
+    if mode == 'sync':
+        for _ in range(iterations):
+            timed()
+    else:
+        with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda _: timed(), range(iterations)))
+    elapsed = TIMER() - started
+    return iterations / elapsed, latencies, errors[0]
+
+
+def recorded_request(client, section, name, args, kwargs):
+    """The PreparedRequest client's section.name(*args, **kwargs) sends"""
+    session = client.agilepoint._session  # pylint: disable=protected-access
+    recorder = RecordingAdapter()
+    session.mount('http://', recorder)
+    try:
+        getattr(getattr(client, section), name)(*args, **kwargs)
+    except Exception:  # pylint: disable=broad-except
+        pass  # the canned answer may not decode as this method expects
+    return recorder.request
+
+
+def throughput(methods, iterations, workers, modes, server_options):
+    """Per method and mode throughput and latency against the stub server"""
+    server = stub_server.start_server(**server_options)
+    ids = sample_ids(server.state)
+    offline = offline_client()
+    results = {}
+    try:
+        client = AgilePoint(server.url, server.path, 'user', 'pass')
+        recorder = AgilePoint(server.url, server.path, 'user', 'pass')
+        for section, name in methods:
+            func = getattr(getattr(client, section), name)
+            args, kwargs = discover_call(getattr(getattr(offline, section), name), ids)
+            key = '{}.{}'.format(section, name)
+            results[key] = {}
+            for mode in modes:
+                if mode == 'async':
+                    request = recorded_request(recorder, section, name, args, kwargs)
+                    if request is None:
+                        continue
+                    ops, latencies, errors = bench_async.run_async(request, iterations,
+                                                                   workers)
+                else:
+                    ops, latencies, errors = run_mode(
+                        mode, lambda: func(*args, **kwargs), iterations, workers)
+                results[key][mode] = {
+                    'ops': ops, 'errors': errors,
+                    'p50_ms': percentile(latencies, 50) * 1000,
+                    'p99_ms': percentile(latencies, 99) * 1000}
+    finally:
+        server.shutdown()
+    return results
+
+
+HTTP2_METHODS = (('workflow', 'get_work_item', 'workitemid'),
+                 ('workflow', 'get_proc_inst', 'processinstanceid'))
+
+
+def transport_comparison(iterations, workers, server_options):
+    """Threaded throughput of HTTP2_METHODS per transport"""
+    from requests.adapters import HTTPAdapter
+    from stub_http2 import start_http2_server
+    server = start_http2_server(**server_options)
+    ids = sample_ids(server.state)
+    transports = (
+        ('http/1.1 pool={}'.format(workers),
+         {'adapter': HTTPAdapter(pool_maxsize=workers)}),
+        ('http/2 connections=1', {'http2': {'prior_knowledge': True,
+                                             'max_connections': 1}}),
+        ('http/2 connections=2', {'http2': {'prior_knowledge': True,
+                                             'max_connections': 2}}),
+    )
+    results = {}
+    try:
+        for label, options in transports:
+            client = AgilePoint(server.url, server.path, 'user', 'pass', **options)
+            for section, name, id_name in HTTP2_METHODS:
+                func = getattr(getattr(client, section), name)
+                ops, latencies, errors = run_mode(
+                    'threaded', lambda: func(ids[id_name]), iterations, workers)
+                results.setdefault('{}.{}'.format(section, name), {})[label] = {
+                    'ops': ops, 'errors': errors,
+                    'p50_ms': percentile(latencies, 50) * 1000,
+                    'p99_ms': percentile(latencies, 99) * 1000}
+            client.agilepoint._session.close()  # pylint: disable=protected-access
+    finally:
+        server.shutdown()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression descriptions"""
+    regressions = []
+    for key, value in results.get('overhead', {}).items():
+        base = baseline.get('overhead', {}).get(key)
+        if base and value > base * (1 + threshold):
+            regressions.append('{} overhead {:.1f}us -> {:.1f}us'.format(key, base, value))
+    for key, modes in results.get('throughput', {}).items():
+        for mode, value in modes.items():
+            base = baseline.get('throughput', {}).get(key, {}).get(mode)
+            if base and value['ops'] < base['ops'] * (1 - threshold):
+                regressions.append('{} {} throughput {:.0f}/s -> {:.0f}/s'.format(
+                    key, mode, base['ops'], value['ops']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--methods', default='.*',
+                        help='regex selecting Section.method names to run')
+    parser.add_argument('--overhead-iterations', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='calls per method and mode against the stub server')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--skip-throughput', action='store_true')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='stub server latency in ms')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='stub server jitter in ms')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--baseline', metavar='PATH')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative regression against the baseline')
+    parser.add_argument('--json', action='store_true', help='print raw results')
+    parser.add_argument('--import-time', type=int, metavar='RUNS', nargs='?',
+                        const=20, help='measure cold start over RUNS interpreters')
+    parser.add_argument('--http2', action='store_true',
+                        help='compare HTTP/1.1 and HTTP/2 transports')
+    parser.add_argument('--memory', type=int, metavar='ROWS', nargs='?', const=500000,
+                        help='measure decoding memory on a ROWS item work list')
+    args = parser.parse_args()
+
+    if args.memory:
+        results = memory(args.memory)
+        if args.json:
+            print(json.dumps(results, indent=2, sort_keys=True))
+            return
+        for name, _ in MEMORY_VARIANTS:
+            stats = results[name]
+            print('{:<16} retained {:>8.1f}MB  peak {:>8.1f}MB  decode {:>6.2f}s'.format(
+                name, stats['retained_mb'], stats['peak_mb'], stats['seconds']))
+        return
+
+    if args.import_time:
+        for name, value in sorted(import_time(args.import_time).items(),
+                                  key=lambda item: item[1]):
+            print('{:<40} {:>10.2f}ms'.format(name, value))
+        return
+    if args.http2:
+        results = transport_comparison(args.iterations, args.workers,
+                                       {'latency': args.latency, 'jitter': args.jitter})
+        if args.json:
+            print(json.dumps(results, indent=2, sort_keys=True))
+            return
+        for name, transports in sorted(results.items()):
+            for label, stats in sorted(transports.items()):
+                print('{:<24} {:<24} {:>7.0f}/s p50 {:>6.2f}ms p99 {:>6.2f}ms{}'.format(
+                    name, label, stats['ops'], stats['p50_ms'], stats['p99_ms'],
+                    '  errors {}'.format(stats['errors']) if stats['errors'] else ''))
+        return
+
+    pattern = re.compile(args.methods)
+    methods = [(section.lower(), name)
+               for section, cls in (('Workflow', Workflow), ('Admin', Admin))
+               for name in generated_methods(cls)
+               if pattern.search('{}.{}'.format(section.lower(), name))]
+    modes = [m for m in args.modes.split(',') if m != 'async' or bench_async]
+
+    results = {'components': component_overhead(args.overhead_iterations * 10),
+               'overhead': overhead(methods, args.overhead_iterations)}
+    if not args.skip_throughput:
+        results['throughput'] = throughput(
+            methods, args.iterations, args.workers, modes,
+            {'latency': args.latency, 'jitter': args.jitter})
+
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        for name, value in sorted(results['components'].items()):
+            print('{:<40} {:>10.2f}us'.format(name, value))
+        for name, value in sorted(results['overhead'].items()):
+            line = '{:<40} {:>10.2f}us'.format(name, value)
+            for mode, stats in sorted(results.get('throughput', {}).get(name, {}).items()):
+                line += '  {} {:>7.0f}/s p99 {:>6.2f}ms'.format(mode, stats['ops'],
+                                                               stats['p99_ms'])
+            print(line)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f_handle:
+            json.dump(results, f_handle, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f_handle:
+            regressions = compare(results, json.load(f_handle), args.threshold)
+        for regression in regressions:
+            print('REGRESSION {}'.format(regression))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,16 +3,19 @@ import logging
 import json
 try:
     from bs4 import BeautifulSoup, SoupStrainer
-except ImportError:
-    print('Missing BeautifulSoup try: "pip install beautifulsoup4"')
-    quit(1)
-import requests
+except ImportError:  # only scraping needs it, see scrape()
+    BeautifulSoup = SoupStrainer = None
 import subprocess
 import os
+import argparse
+import ast
+import hashlib
+import multiprocessing
+import re
+import textwrap
 
 FORMAT = '%(asctime)-15s %(levelname)s %(module)s.%(funcName)s %(message)s'
 DATEFMT = "%Y-%m-%d %H:%M:%S"
-logging.basicConfig(level=logging.INFO, format=FORMAT, datefmt=DATEFMT)
 
     # def update_role(self, **kwargs):
     #     """Updates information for a role.
@@ -57,12 +60,32 @@ def fix_camel_case(string):
         newstring = newstring.replace('p_i_i_d', 'piid')
     return newstring
 
+if SoupStrainer is not None:
+    METHOD_SECTIONS = SoupStrainer('div', class_='section')
+    CLASS_PROPERTIES = SoupStrainer('div', id='Properties')
+CACHE_FILE = '.parse_cache.json'
+CLASS_CACHE = {}
+
+
+def file_hash(file_name):
+    with open(file_name, 'rb') as f_handle:
+        return hashlib.sha1(f_handle.read()).hexdigest()
+
+
+def class_file(class_name):
+    return '{}/restapiclass{}.html'.format(BASE_PATH, class_name)
+
+
 def describe_class(class_name):
+    """Property names of an AgilePoint class page, memoised per process"""
+    if class_name in CLASS_CACHE:
+        return list(CLASS_CACHE[class_name])
     req_args = []
-    file_name = '{}/restapiclass{}.html'.format(BASE_PATH, class_name)
+    file_name = class_file(class_name)
     if os.path.exists(file_name):
         f_handle = open(file_name, 'r')
-        soup = BeautifulSoup(f_handle.read(), 'html.parser')
+        soup = BeautifulSoup(f_handle.read(), 'html.parser', parse_only=CLASS_PROPERTIES)
+        f_handle.close()
         try:
             table = soup.find('div', id='Properties').table
             tr_ = table.find_all('tr', class_='strow', recursive=False)
@@ -74,11 +97,13 @@ def describe_class(class_name):
             raise
     else:
         logging.error('Unable to finish processing describe_class for %s', file_name)
-    return req_args
+    CLASS_CACHE[class_name] = req_args
+    return list(req_args)
 
 class PyMethod(object):
     def __init__(self, html):
-        self.soup = BeautifulSoup(html, 'html.parser')
+        self.soup = BeautifulSoup(html, 'html.parser', parse_only=METHOD_SECTIONS)
+        self.classes = []
         self.req_args = []
         self.path_args = []
         self.methodname = ''
@@ -128,6 +153,7 @@ class PyMethod(object):
                         for i_, dd_ in enumerate(row.find_all('dd', class_='dd')):
                             # logging.info('DD row %s', i_)
                             if index == i_:
+                                self.classes.append(dd_.text.strip())
                                 self.req_args.extend(describe_class(dd_.text.strip()))
                     else:
                         self.req_args.append(property_)
@@ -147,57 +173,55 @@ class PyMethod(object):
                 pass
 
         self.url = 'http://{}/restmethod{}.html'.format(BASE_PATH, self.restapi)
+        # The soup is large and does not pickle; drop it once parsed so
+        # results can come back from the process pool and be cached.
+        self.soup = None
+
+    FIELDS = ('section', 'restapi', 'methodname', 'url', 'resp_type',
+              'req_type', 'req_args', 'path_args', 'description', 'classes')
+
+    def to_dict(self):
+        data = dict((field, getattr(self, field)) for field in self.FIELDS)
+        if isinstance(data['description'], bytes) and bytes is not str:
+            data['description'] = data['description'].decode('utf-8')
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        method = cls.__new__(cls)
+        method.soup = None
+        for field in cls.FIELDS:
+            setattr(method, field, data[field])
+        if bytes is str and not isinstance(method.description, str):
+            method.description = method.description.encode('utf-8')
+        return method
+
+    def to_spec(self):
+        """Spec entry for this method, see render_method"""
+        description = self.description
+        if isinstance(description, bytes) and bytes is not str:
+            description = description.decode('utf-8')
+        return {
+            'section': self.section,
+            'restapi': self.restapi,
+            'method': self.methodname,
+            'description': description,
+            'url': self.url,
+            'verb': self.req_type.upper(),
+            'path_args': list(self.path_args),
+            'params': [fix_camel_case(a) for a in self.path_args],
+            'defaults': {},
+            'required': list(self.req_args),
+            'optional': None,
+            'doc': {'required': list(self.req_args), 'optional': [], 'response': None},
+            'pylint': [],
+            'body': len(self.req_args) > 0,
+            'response': self.resp_type,
+        }
 
     def generate_method(self):
-        method = []
-
-        line1 = '    def {methodname}(self'.format(methodname=self.methodname)
-        if len(self.path_args) > 0:
-            line1 += ', {}'.format(', '.join([fix_camel_case(a) for a in self.path_args]))
-        if len(self.req_args) > 0:
-            line1 += ', **kwargs'
-        line1 += '):'
-        method.append(line1)
-
-        line2 = '        """{description}'.format(description=self.description)
-        if not line2.endswith('.'):
-            line2 += '.'
-        method.append(line2)
-
-        method.append('')
-        method.append('        {}'.format(self.url))
-        method.append('')
-
-        if len(self.path_args) > 0:
-            method.append('        Path Args: {}'.format(', '.join(self.path_args)))
-        else:
-            method.append('        Path Args: None')
-
-        if len(self.req_args) > 0:
-            method.append('        Required Body Args: {}'.format(', '.join(self.req_args)))
-            # method.append('    Optional Body Args: {}"""'.format(', '.join(self.req_args)))
-            method.append('        Optional Body Args: None"""')
-            method.append('        req_args = {}'.format(repr(self.req_args)))
-            method.append('        validate_args(kwargs, req_args)')
-        else:
-            method.append('        Required Body Args: None')
-            method.append('        Optional Body Args: None"""')
+        return render_method(self.to_spec())
 
-        line8 = '        resp = self.{}.{}'.format(self.section.lower(), self.restapi)
-        if len(self.path_args) > 0:
-            for arg in [fix_camel_case(a) for a in self.path_args]:
-                line8 += '({})'.format(arg)
-
-        line8 += '.{}'.format(self.req_type.upper())
-        if len(self.req_args) > 0:
-            line8 += '(data=json.dumps(kwargs))'
-        else:
-            line8 += '()'
-        method.append(line8)
-
-        method.append("        return handle_response('{}', resp)".format(self.resp_type))
-        return '\n'.join(method)
-        
     def __repr__(self):
         return '<PyMethod: section={section} || restapi={restapi} || methodname={methodname} || url={url} || resp_type={resp_type} || req_args={req_args} || path_args={path_args} || description={description}>'.format(
             section=self.section,
@@ -211,26 +235,345 @@ class PyMethod(object):
             description=self.description)
 
 
+SPEC_VERSION = 2
+SPEC_FILE = 'api_spec.json'
+WIDTH = 79
+INDENT = ' ' * 8
+# Module docstring and pylint disables used when a spec has no 'modules'
+MODULES = {
+    'Admin': {'docstring': 'Admin Methods for AgilePoint API',
+              'pylint': ['too-many-public-methods']},
+    'Workflow': {'docstring': 'Workflow Methods for AgilePoint API',
+                 'pylint': ['too-many-public-methods', 'too-many-lines']},
+}
+
+
+def _wrap(text, first, rest):
+    return textwrap.wrap(text, WIDTH, initial_indent=first, subsequent_indent=rest,
+                         break_long_words=False, break_on_hyphens=False) or [first.rstrip()]
+
+
+def _verbatim(paragraph):
+    """True for description paragraphs kept line for line (lists etc)"""
+    return any(line[:1] in (' ', '*', '-') for line in paragraph.split('\n'))
+
+
+def render_docstring(spec):
+    """Docstring lines of a generated method, opening and closing quotes
+    included"""
+    lines = []
+    paragraphs = spec['description'].split('\n\n')
+    if not paragraphs[0].endswith('.') and len(paragraphs) == 1:
+        paragraphs[0] += '.'
+    for number, paragraph in enumerate(paragraphs):
+        first = INDENT + '"""' if number == 0 else INDENT
+        if number:
+            lines.append('')
+        if _verbatim(paragraph):
+            lines.extend((first if i == 0 else INDENT) + line if line else ''
+                         for i, line in enumerate(paragraph.split('\n')))
+        else:
+            lines.extend(_wrap(paragraph, first, INDENT))
+    lines.append('')
+    if spec['url']:
+        lines.append(INDENT + spec['url'])
+        lines.append('')
+    for label, values in (('Path Args', spec['path_args']),
+                          ('Required Body Args', spec['doc']['required']),
+                          ('Optional Body Args', spec['doc']['optional'])):
+        first = '{}{}: '.format(INDENT, label)
+        lines.extend(_wrap(', '.join(values) or 'None', first, ' ' * len(first)))
+    if spec['doc']['response']:
+        lines.append('{}Response: {}'.format(INDENT, spec['doc']['response']))
+    lines[-1] += '"""'
+    return lines
+
+
+def render_method(spec):
+    """Python source for one generated method from its spec entry.
+
+    Spec entries hold: section, restapi, method, description (paragraphs
+    separated by blank lines; those holding indented or bulleted lines are
+    kept line for line, the rest wrapped), url (or None), verb, path_args
+    (names as documented), params (python argument names), defaults
+    ({param: default}), required and optional body args for validation
+    (optional None means unchecked), doc (the required and optional body
+    args and the Response line the docstring lists, as documented), pylint
+    (messages disabled on the def line), body (whether kwargs are sent) and
+    response (json, text, xml or bool)."""
+    params = []
+    for param in spec['params']:
+        if param in spec['defaults']:
+            params.append('{}={!r}'.format(param, spec['defaults'][param]))
+        else:
+            params.append(param)
+    if spec['body']:
+        params.append('**kwargs')
+    method = ['    def {}({}):'.format(spec['method'], ', '.join(['self'] + params))]
+    if spec['pylint']:
+        method[0] += '  # pylint: disable={}'.format(','.join(spec['pylint']))
+    method.extend(render_docstring(spec))
+
+    if spec['required'] or spec['optional'] is not None:
+        method.append("{}self.validate['{}'](kwargs)".format(INDENT, spec['method']))
+
+    endpoint = 'self.{}.{}'.format(spec['section'].lower(), spec['restapi'])
+    call = '{}.{}('.format(''.join('({})'.format(p) for p in spec['params']), spec['verb'])
+    data = 'data=json.dumps(kwargs))' if spec['body'] else ')'
+    line = '{}resp = {}{}{}'.format(INDENT, endpoint, call, data)
+    if len(line) > WIDTH:
+        # Break before the body, else inside the first path argument call
+        if spec['body'] and len(line) - len(data) <= WIDTH:
+            line = '{}resp = {}{}\n{}    {}'.format(INDENT, endpoint, call, INDENT, data)
+        elif spec['params']:
+            line = '{}resp = {}(\n{}    {}{}'.format(INDENT, endpoint, INDENT, call[1:], data)
+    method.append(line)
+    method.append("{}return handle_response('{}', resp)".format(INDENT, spec['response']))
+    return '\n'.join(method)
+
+
+def write_spec(methods, file_name=SPEC_FILE, modules=None):
+    """Write a spec; methods are rendered in the order given"""
+    spec = {'version': SPEC_VERSION, 'source': BASE_PATH,
+            'modules': modules or MODULES, 'methods': list(methods)}
+    with open(file_name, 'w') as f_handle:
+        json.dump(spec, f_handle, indent=1, sort_keys=True)
+        f_handle.write('\n')
+    return spec
+
+
+def load_spec(file_name=SPEC_FILE):
+    with open(file_name) as f_handle:
+        spec = json.load(f_handle)
+    if spec.get('version') != SPEC_VERSION:
+        raise ValueError('Unsupported spec version {} in {}'.format(
+            spec.get('version'), file_name))
+    return spec
+
+
+def render_module(spec, section):
+    """Source of admin.py or workflow.py rendered from a spec"""
+    methods = [render_method(method) for method in spec['methods']
+               if method['section'] == section]
+    header = write_header(section, spec.get('modules', MODULES)[section])
+    return header + '\n' + '\n\n'.join(methods) + '\n'
+
+
+def render_modules(spec, out_dir='.'):
+    """Write admin.py and workflow.py rendered from a spec"""
+    for section in ('Admin', 'Workflow'):
+        with open(os.path.join(out_dir, '{}.py'.format(section.lower())), 'w') as f_handle:
+            f_handle.write(render_module(spec, section))
+
+
+def _chain_call(node):
+    """Unpick self.<section>.<RestApi>(a)(b).<VERB>(...) into its parts"""
+    verb = node.func.attr
+    body = any(k.arg == 'data' for k in node.keywords)
+    params = []
+    chain = node.func.value
+    while isinstance(chain, ast.Call):
+        params.insert(0, chain.args[0].id)
+        chain = chain.func
+    return chain.value.attr.capitalize(), chain.attr, verb, params, body
+
+
+def _split_list(text):
+    values = [value.strip() for value in ' '.join(text.split()).split(',')]
+    return [] if values == ['None'] else values
+
+
+def _parse_docstring(doc):
+    """Spec fields held in a generated method's docstring"""
+    paragraphs = doc.split('\n\n')
+    fields_at = next(i for i, p in enumerate(paragraphs) if p.startswith('Path Args:'))
+    url = None
+    if fields_at and paragraphs[fields_at - 1].startswith('http'):
+        url = paragraphs[fields_at - 1].strip()
+    description = [p if _verbatim(p) else ' '.join(p.split())
+                   for p in paragraphs[:fields_at - (1 if url else 0)]]
+    fields = dict(re.findall(r'^(\w[\w ]*): *(.*(?:\n +.*)*)', paragraphs[fields_at], re.M))
+    return {'description': '\n\n'.join(description), 'url': url,
+            'path_args': _split_list(fields['Path Args']),
+            'doc': {'required': _split_list(fields['Required Body Args']),
+                    'optional': _split_list(fields['Optional Body Args']),
+                    'response': fields.get('Response', '').strip() or None}}
+
+
+def spec_from_module(file_name):
+    """Spec entries read back from a checked-in generated module.
+
+    Everything the module holds (signature, docstring, endpoint call and
+    response type) comes from the module. The validation fields (required
+    and optional) live only in the spec once modules call self.validate,
+    so they are taken from the api_spec.json next to the module unless the
+    module still assigns req_args/opt_args."""
+    with open(file_name) as f_handle:
+        source = f_handle.read()
+    tree = ast.parse(source)
+    lines = source.split('\n')
+    existing = {}
+    spec_file = os.path.join(os.path.dirname(file_name), SPEC_FILE)
+    if os.path.exists(spec_file):
+        # Any version: only the validation fields are carried over
+        with open(spec_file) as f_handle:
+            existing = dict(((m['section'], m['method']), m)
+                            for m in json.load(f_handle)['methods'])
+    methods = []
+    for cls in [n for n in tree.body if isinstance(n, ast.ClassDef)]:
+        for func in cls.body:
+            if not isinstance(func, ast.FunctionDef) or func.name.startswith('_'):
+                continue
+            entry = {'method': func.name}
+            entry.update(_parse_docstring(ast.get_docstring(func)))
+            disabled = re.search(r'# pylint: disable=(\S+)', lines[func.lineno - 1])
+            entry['pylint'] = disabled.group(1).split(',') if disabled else []
+            names = [a.arg if hasattr(a, 'arg') else a.id for a in func.args.args][1:]
+            defaults = [ast.literal_eval(d) for d in func.args.defaults]
+            entry['defaults'] = dict(zip(names[len(names) - len(defaults):], defaults))
+            assigned = {}
+            for node in ast.walk(func):
+                if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+                    target = node.targets[0].id
+                    if target == 'req_args':
+                        assigned['required'] = ast.literal_eval(node.value)
+                    elif target == 'opt_args':
+                        assigned['optional'] = ast.literal_eval(node.value)
+                    elif target == 'resp':
+                        (entry['section'], entry['restapi'], entry['verb'],
+                         entry['params'], entry['body']) = _chain_call(node.value)
+                elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and
+                      node.func.id == 'handle_response'):
+                    entry['response'] = ast.literal_eval(node.args[0])
+            merged = {'required': [], 'optional': None}
+            previous = existing.get((entry['section'], func.name), {})
+            merged.update((field, previous[field]) for field in ('required', 'optional')
+                          if field in previous)
+            merged.update(assigned)
+            merged.update(entry)
+            methods.append(merged)
+    return methods
+
+
+def modules_from_files(directory):
+    """Spec 'modules' entry (docstring, pylint disables) of the checked-in
+    admin.py and workflow.py"""
+    modules = {}
+    for section in ('Admin', 'Workflow'):
+        with open(os.path.join(directory, '{}.py'.format(section.lower()))) as f_handle:
+            source = f_handle.read()
+        disabled = re.search(r'^# pylint: disable=(.*)$', source, re.M)
+        modules[section] = {'docstring': ast.get_docstring(ast.parse(source)),
+                            'pylint': disabled.group(1).split(',') if disabled else []}
+    return modules
+
+
+def diff_specs(old, new):
+    """Added, removed and changed methods between two specs"""
+    old_methods = dict(((m['section'], m['method']), m) for m in old['methods'])
+    new_methods = dict(((m['section'], m['method']), m) for m in new['methods'])
+    changes = []
+    for key in sorted(set(old_methods) | set(new_methods)):
+        name = '{}.{}'.format(*key)
+        if key not in old_methods:
+            changes.append('+ {}'.format(name))
+        elif key not in new_methods:
+            changes.append('- {}'.format(name))
+        else:
+            for field in sorted(set(old_methods[key]) | set(new_methods[key])):
+                before = old_methods[key].get(field)
+                after = new_methods[key].get(field)
+                if before != after:
+                    changes.append('~ {} {}: {!r} -> {!r}'.format(name, field, before, after))
+    return changes
+
+
 FNULL = open(os.devnull, 'w')
 
-def write_header(section):
+def write_header(section, module=None):
+    """Module docstring, imports and class preamble of a generated module"""
+    module = module or MODULES[section]
     resp = []
-    resp.append('"""{} Methods for AgilePoint API."""'.format(section))
+    resp.append('"""{}"""'.format(module['docstring']))
     resp.append('import json')
-    resp.append('from ._utils import handle_response, validate_args')
-    resp.append('# pylint: disable=too-many-public-methods,too-many-lines')
+    resp.append('from ._schema import LazySection, NO_VALIDATION')
+    resp.append('from ._utils import handle_response')
+    if module['pylint']:
+        resp.append('# pylint: disable={}'.format(','.join(module['pylint'])))
+    resp.append('')
+    resp.append("VALIDATORS = LazySection('{}')".format(section))
     resp.append('')
     resp.append('')
     resp.append('class {}(object):'.format(section))
-    resp.append('    """{} Methods for AgilePoint API."""'.format(section))
+    resp.append('    """{}"""'.format(module['docstring']))
     resp.append('    def __init__(self, agilepoint):')
     resp.append('        self.{} = agilepoint.agilepoint.{}'.format(section.lower(), section))
     resp.append('        self.agilepoint = agilepoint')
+    resp.append("        if getattr(agilepoint, 'validate', True):")
+    resp.append('            self.validate = VALIDATORS')
+    resp.append('        else:')
+    resp.append('            self.validate = NO_VALIDATION')
     resp.append('')
     return '\n'.join(resp)
 
 
-def main():
+def parse_file(full_path):
+    f_handle = open(full_path)
+    method = PyMethod(f_handle.read())
+    f_handle.close()
+    method.parse_html()
+    return method.to_dict()
+
+
+def load_cache():
+    if not os.path.exists(CACHE_FILE):
+        return {}
+    with open(CACHE_FILE) as f_handle:
+        return json.load(f_handle)
+
+
+def cache_valid(entry, digest):
+    if entry is None or entry['hash'] != digest:
+        return False
+    for class_name, class_digest in entry['class_hashes'].items():
+        name = class_file(class_name)
+        if not os.path.exists(name) or file_hash(name) != class_digest:
+            return False
+    return True
+
+
+def parse_files(file_names):
+    """Parse restmethod pages on a process pool, skipping pages whose
+    content (and referenced class pages) hash the same as last run"""
+    cache = load_cache()
+    hashes = dict((name, file_hash(name)) for name in file_names)
+    stale = [name for name in file_names
+             if not cache_valid(cache.get(name), hashes[name])]
+    logging.info('Parsing %s of %s pages (%s cached)', len(stale), len(file_names),
+                 len(file_names) - len(stale))
+    if stale:
+        pool = multiprocessing.Pool()
+        try:
+            parsed = pool.map(parse_file, stale, chunksize=8)
+        finally:
+            pool.close()
+            pool.join()
+        for name, data in zip(stale, parsed):
+            class_hashes = dict((c, file_hash(class_file(c))) for c in data['classes']
+                                if os.path.exists(class_file(c)))
+            cache[name] = {'hash': hashes[name], 'class_hashes': class_hashes,
+                           'method': data}
+        with open(CACHE_FILE, 'w') as f_handle:
+            json.dump(dict((name, cache[name]) for name in file_names), f_handle)
+    return [PyMethod.from_dict(cache[name]['method']) for name in file_names]
+
+
+def scrape():
+    """Mirror the doc site if needed and return spec entries for every
+    restmethod page"""
+    if BeautifulSoup is None:
+        print('Missing BeautifulSoup try: "pip install beautifulsoup4"')
+        quit(1)
     stor_dir = 'api_docs'
 
     if os.path.exists(stor_dir):
@@ -246,16 +589,6 @@ def main():
                          mirror_url], stdout=FNULL, stderr=subprocess.STDOUT)
         print('Completed mirror process')
 
-    count = 0
-    admin_write = open('admin.py', 'w')
-    workflow_write = open('workflow.py', 'w')
-
-    admin_write.write(write_header('Admin'))
-    admin_write.write('\n')
-
-    workflow_write.write(write_header('Workflow'))
-    workflow_write.write('\n')
-    
     file_names = []
     for subdir, dirs, files in os.walk(BASE_PATH):
         for filename in files:
@@ -267,26 +600,49 @@ def main():
             full_path = os.path.join(subdir, filename)
             file_names.append(full_path)
 
-    for full_path in sorted(file_names):
-        # print(full_path)
-        f_handle = open(full_path)
-        method = PyMethod(f_handle.read())
-        f_handle.close()
-        method.parse_html()
-        if method.section == 'Workflow':
-            workflow_write.write(method.generate_method())
-            workflow_write.write('\n\n')
-        elif method.section == 'Admin':
-            admin_write.write(method.generate_method())
-            admin_write.write('\n\n')
+    methods = []
+    for full_path, method in zip(sorted(file_names), parse_files(sorted(file_names))):
+        if method.section in ('Workflow', 'Admin'):
+            methods.append(method.to_spec())
         else:
             logging.error('Unable to find useable section for %s', full_path)
             logging.error(repr(method))
+    return sorted(methods, key=lambda m: (m['section'], m['method']))
 
-    admin_write.close()
-    workflow_write.close()
-        # print(repr(method))
-        # quit()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format=FORMAT, datefmt=DATEFMT)
+    parser = argparse.ArgumentParser(
+        description='Scrape the AgilePoint docs into {} and render admin.py '
+                    'and workflow.py from it'.format(SPEC_FILE))
+    parser.add_argument('--from-spec', metavar='SPEC',
+                        help='render modules from an existing spec, no scraping')
+    parser.add_argument('--spec-only', action='store_true',
+                        help='write the spec without rendering modules')
+    parser.add_argument('--spec-from-modules', metavar='DIR',
+                        help='rebuild the spec from checked-in admin.py/workflow.py')
+    parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'),
+                        help='print the differences between two specs')
+    args = parser.parse_args()
+
+    if args.diff:
+        for change in diff_specs(load_spec(args.diff[0]), load_spec(args.diff[1])):
+            print(change)
+        return
+    if args.spec_from_modules:
+        methods = []
+        for section in ('admin', 'workflow'):
+            methods.extend(spec_from_module(
+                os.path.join(args.spec_from_modules, '{}.py'.format(section))))
+        write_spec(methods, os.path.join(args.spec_from_modules, SPEC_FILE),
+                   modules_from_files(args.spec_from_modules))
+        return
+    if args.from_spec:
+        spec = load_spec(args.from_spec)
+    else:
+        spec = write_spec(scrape())
+    if not args.spec_only:
+        render_modules(spec)
 
 if __name__ == '__main__':
     main()
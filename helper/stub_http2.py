@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""HTTP/2 flavour of the stand-in AgilePoint server (Python 3 only).
+
+Serves the same handlers and state as stub_server.py through hypercorn, which
+speaks HTTP/1.1 and cleartext HTTP/2 (prior knowledge) on one port. Used to
+compare the multiplexed transport against pooled HTTP/1.1 connections::
+
+    python helper/stub_server.py --http2 --port 14490 --latency 5
+
+Needs hypercorn (pip install hypercorn).
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from stub_server import State, StubSettings, encode_body, respond
+
+
+class Http2StubServer(StubSettings):
+    """Stand-in server speaking HTTP/2 (cleartext, prior knowledge) and
+    HTTP/1.1 through hypercorn, for comparing multiplexed transports.
+    Takes the same keyword arguments as StubServer."""
+    def __init__(self, address, state, **kwargs):
+        self.configure(state, **kwargs)
+        sock = socket.socket()
+        sock.bind(address)
+        self.server_address = sock.getsockname()
+        sock.close()
+        self.config = Config()
+        self.config.bind = ['{}:{}'.format(*self.server_address[:2])]
+        self.config.loglevel = 'INFO' if self.verbose else 'WARNING'
+        self.config.accesslog = '-' if self.verbose else None
+        # hypercorn closes connections after 1000 requests by default, which
+        # turns a long benchmark into GOAWAY errors on the shared connection
+        self.config.keep_alive_max_requests = 2 ** 31
+        self._loop = None
+        self._stopped = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        """Host argument for AgilePoint()"""
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    async def app(self, scope, receive, send):
+        """ASGI application answering through respond()"""
+        if scope['type'] != 'http':
+            return
+        raw = b''
+        more = True
+        while more:
+            message = await receive()
+            raw += message.get('body', b'')
+            more = message.get('more_body', False)
+        headers = dict((key.decode('latin-1'), value.decode('latin-1'))
+                       for key, value in scope['headers'])
+        delay, code, payload = respond(self, scope['path'], raw,
+                                       headers.get('content-encoding'),
+                                       headers.get('authorization'))
+        if delay:
+            await asyncio.sleep(delay)
+        data = json.dumps(payload).encode('utf-8')
+        encoding = None
+        if self.compress:
+            data, encoding = encode_body(data, headers.get('accept-encoding'))
+        answer = [(b'content-type', b'application/json'),
+                  (b'content-length', str(len(data)).encode())]
+        if encoding:
+            answer.append((b'content-encoding', encoding.encode()))
+        await send({'type': 'http.response.start', 'status': code,
+                    'headers': answer})
+        await send({'type': 'http.response.body', 'body': data})
+
+    def serve_forever(self):
+        """Run the server until shutdown() is called"""
+        self._loop = asyncio.new_event_loop()
+        self._stopped = asyncio.Event()
+        self._loop.call_soon(self._ready.set)
+        self._loop.run_until_complete(
+            serve(self.app, self.config, shutdown_trigger=self._stopped.wait))
+
+    def shutdown(self):
+        """Stop a server started with serve_forever()"""
+        self._ready.wait()
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+
+def start_http2_server(port=0, state=None, **kwargs):
+    """Http2StubServer counterpart of start_server()"""
+    if state is None:
+        state = State(kwargs.get('seed', 0))
+        state.populate()
+    server = Http2StubServer(('127.0.0.1', port), state, **kwargs)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(server.server_address[:2], 0.1).close()
+            break
+        except socket.error:
+            time.sleep(0.05)
+    return server
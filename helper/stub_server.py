@@ -0,0 +1,1022 @@
+#!/usr/bin/env python
+"""Stand-in AgilePoint REST server for load and performance testing.
+
+Serves the Workflow and Admin endpoints the client calls from in-memory
+state seeded with a synthetic dataset, so Workflow/Admin can be exercised
+without a real AgilePoint server. Latency, jitter and error injection are
+configurable to make throughput and tail latency runs reproducible.
+
+Run standalone::
+
+    python helper/stub_server.py --port 14490 --instances 10000 --latency 5
+
+and point the client at it::
+
+    ap = AgilePoint('http://127.0.0.1:14490', 'AgilePointServer', 'u', 'p')
+
+Or start it in-process with start_server(), which returns the server; its
+url attribute is the host argument for AgilePoint. Endpoints without a
+handler answer 200 with a null result unless strict mode is enabled.
+Responses over COMPRESS_MIN bytes are gzip/deflate encoded when the client
+accepts it, and gzip/deflate request bodies are decoded.
+"""
+from __future__ import print_function
+import argparse
+import datetime
+import json
+import random
+import re
+import socket
+import threading
+import time
+import zlib
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import unquote
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+
+HANDLERS = {}
+COMPRESS_MIN = 1024
+CHUNK_SIZE = 4096
+EPOCH = datetime.datetime(1970, 1, 1)
+
+WORK_ITEM_STATUSES = ['Assigned', 'New', 'Overdue', 'Completed', 'Canceled']
+PROC_INST_STATUSES = ['Running', 'Running', 'Running', 'Completed',
+                      'Suspended', 'Canceled']
+ACCESS_RIGHTS = ['Administrator', 'Access Admin Tools', 'Cancel Process',
+                 'Suspend/Resume Process', 'Reassign Work Item',
+                 'Modify Process Definition', 'Release Process Definition',
+                 'Register Users', 'Delegate Work Items', 'View Reports']
+
+
+def route(section, name):
+    """Register a handler for /<section>/<name>/<path args...>"""
+    def decorator(func):
+        HANDLERS[(section, name)] = func
+        return func
+    return decorator
+
+
+def wcf_date(when):
+    """Format a datetime the way AgilePoint does"""
+    return '/Date({})/'.format(int((when - EPOCH).total_seconds() * 1000))
+
+
+class NotFound(Exception):
+    """Raised by handlers when the addressed object does not exist"""
+    pass
+
+
+class State(object):
+    """In-memory AgilePoint data"""
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.users = {}
+        self.groups = {}
+        self.group_members = {}
+        self.roles = {}
+        self.role_members = {}
+        self.proc_defs = {}
+        self.proc_insts = {}
+        self.activity_insts = {}
+        self.work_items = {}
+        self.events = {}
+        self.custom_attrs = {}
+        self.delegations = {}
+        self.mail = {}
+        self.stats = {}
+        # Accepted bearer tokens; None lets every request through
+        self.tokens = None
+
+    def uuid(self):
+        """Deterministic AgilePoint style identifier"""
+        return '{:032X}'.format(self.random.getrandbits(128))
+
+    def date(self, days_back=30):
+        """Deterministic timestamp within the last days_back days"""
+        offset = self.random.randint(0, days_back * 86400)
+        return wcf_date(datetime.datetime(2017, 7, 1) -
+                        datetime.timedelta(seconds=offset))
+
+    def populate(self, users=100, groups=10, roles=10, definitions=10,
+                 instances=1000, activities=4, mail=100):
+        """Fill the state with a synthetic dataset"""
+        rand = self.random
+        for i in range(users):
+            name = 'DOMAIN\\user{:06d}'.format(i)
+            self.users[name] = {'UserName': name,
+                                'FullName': 'User {}'.format(i),
+                                'EMailAddress': 'user{:06d}@domain.tld'.format(i),
+                                'Department': 'Dept {}'.format(i % 20),
+                                'Disabled': False,
+                                'Locale': 'en-US'}
+        user_names = sorted(self.users)
+        for i in range(groups):
+            name = 'Group {}'.format(i)
+            self.groups[name] = {'GroupName': name, 'Enabled': True,
+                                 'Description': '',
+                                 'ResponsibleUser': rand.choice(user_names)}
+            self.group_members[name] = set(
+                rand.sample(user_names, min(len(user_names), 25)))
+        for i in range(roles):
+            name = 'Role {}'.format(i)
+            self.roles[name] = {'RoleName': name, 'Enabled': True,
+                                'Description': '',
+                                'Rights': rand.sample(ACCESS_RIGHTS, 3)}
+            self.role_members[name] = set(
+                rand.sample(user_names, min(len(user_names), 10)))
+        for i in range(definitions):
+            def_id = self.uuid()
+            self.proc_defs[def_id] = {
+                'DefinitionID': def_id, 'DefName': 'Process {}'.format(i),
+                'Version': '1.00', 'Status': 'Released',
+                'Activities': ['Activity {}'.format(a) for a in range(activities)]}
+        def_ids = sorted(self.proc_defs)
+        for _ in range(instances):
+            self.create_instance(rand.choice(def_ids), rand.choice(user_names),
+                                 user_names, rand.choice(PROC_INST_STATUSES))
+        for _ in range(mail):
+            mail_id = self.uuid()
+            self.mail[mail_id] = {'MailID': mail_id,
+                                  'To': rand.choice(list(self.users.values()))['EMailAddress'],
+                                  'Subject': 'Task assigned',
+                                  'CreatedDate': self.date(),
+                                  'Status': 'Failed'}
+
+    def create_instance(self, def_id, initiator, user_names, status='Running',
+                        name=None, parent=None):
+        """Create a process instance with activity instances, work items
+        and events"""
+        rand = self.random
+        definition = self.proc_defs[def_id]
+        pi_id = self.uuid()
+        started = self.date()
+        self.proc_insts[pi_id] = {
+            'ProcessInstanceID': pi_id,
+            'ProcessInstanceName': name or '{} {}'.format(definition['DefName'], pi_id[:8]),
+            'DefinitionID': def_id, 'DefName': definition['DefName'],
+            'Status': status, 'Initiator': initiator, 'StartedDate': started,
+            'CompletedDate': None, 'ParentProcessInstanceID': parent}
+        current = rand.randrange(len(definition['Activities']))
+        for index, activity in enumerate(definition['Activities'][:current + 1]):
+            ai_id = self.uuid()
+            done = index < current or status != 'Running'
+            self.activity_insts[ai_id] = {
+                'ActivityInstanceID': ai_id, 'ProcessInstanceID': pi_id,
+                'ActivityDefinitionID': 'A{}'.format(index), 'Name': activity,
+                'Status': 'Completed' if done else 'Running',
+                'StartedDate': started}
+            wi_id = self.uuid()
+            self.work_items[wi_id] = {
+                'WorkItemID': wi_id, 'ActivityInstanceID': ai_id,
+                'ProcessInstanceID': pi_id, 'ProcessDefinitionID': def_id,
+                'Name': activity, 'UserID': rand.choice(user_names),
+                'Status': 'Completed' if done else rand.choice(WORK_ITEM_STATUSES[:3]),
+                'AssignedDate': started, 'DueDate': self.date(),
+                'CompletedDate': None}
+            ev_id = self.uuid()
+            self.events[ev_id] = {
+                'EventID': ev_id, 'EventName': 'ActivityStarted',
+                'ProcessInstanceID': pi_id, 'WorkItemID': wi_id,
+                'Status': 'Processed', 'PostedDate': started}
+        return self.proc_insts[pi_id]
+
+    def get(self, table, key):
+        """Look up key in table or raise NotFound"""
+        try:
+            return getattr(self, table)[key]
+        except KeyError:
+            raise NotFound('{} {}'.format(table, key))
+
+
+# Minimal SQL-ish where clause support: comparisons joined with AND/OR/NOT,
+# parentheses, LIKE, IN (...) and IS [NOT] NULL.
+WCF_MILLIS = re.compile(r'/Date\((-?\d+)').match
+TOKEN = re.compile(r"\s*(?:(?P<str>'(?:[^']|'')*')|(?P<num>-?\d+(?:\.\d+)?)|"
+                   r"(?P<op><>|!=|<=|>=|=|<|>|\(|\)|,)|(?P<word>[\w.\[\]]+))")
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if not match:
+            raise ValueError('Bad where clause near: {}'.format(text[pos:]))
+        pos = match.end()
+        if match.group('str') is not None:
+            tokens.append(('val', match.group('str')[1:-1].replace("''", "'")))
+        elif match.group('num') is not None:
+            tokens.append(('val', match.group('num')))
+        elif match.group('op') is not None:
+            tokens.append(('op', match.group('op')))
+        else:
+            word = match.group('word')
+            if word.upper() in ('AND', 'OR', 'NOT', 'LIKE', 'IN', 'IS', 'NULL'):
+                tokens.append(('kw', word.upper()))
+            else:
+                tokens.append(('col', word.strip('[]')))
+    return tokens
+
+
+def compare(value, operator, expected):
+    """Apply an AgilePoint query operator to a record value"""
+    operator = operator.upper()
+    if operator == 'LIKE':
+        wildcards = {'%': '.*', '_': '.'}
+        pattern = ''.join(wildcards.get(c) or re.escape(c) for c in str(expected))
+        pattern = '^{}$'.format(pattern)
+        return value is not None and re.match(pattern, str(value), re.I) is not None
+    if operator == 'IN':
+        return str(value) in [str(e) for e in expected]
+    value = '' if value is None else str(value)
+    expected = str(expected)
+    match = WCF_MILLIS(value)
+    if match:
+        # Compare WCF dates against SQL 'YYYY-MM-DD HH:MM:SS' literals
+        value = (datetime.datetime(1970, 1, 1) + datetime.timedelta(
+            milliseconds=int(match.group(1)))).strftime('%Y-%m-%d %H:%M:%S')
+    if operator == '=':
+        return value.lower() == expected.lower()
+    if operator in ('<>', '!='):
+        return value.lower() != expected.lower()
+    return {'<': value < expected, '<=': value <= expected,
+            '>': value > expected, '>=': value >= expected}[operator]
+
+
+def parse_where(text):
+    """Compile a where clause into a predicate over record dicts"""
+    tokens = _tokenize(text)
+    pos = [0]
+
+    def peek():
+        return tokens[pos[0]] if pos[0] < len(tokens) else (None, None)
+
+    def take():
+        token = peek()
+        pos[0] += 1
+        return token
+
+    def expr():
+        left = term()
+        while peek() == ('kw', 'OR'):
+            take()
+            left = (lambda a, b: lambda r: a(r) or b(r))(left, term())
+        return left
+
+    def term():
+        left = factor()
+        while peek() == ('kw', 'AND'):
+            take()
+            left = (lambda a, b: lambda r: a(r) and b(r))(left, factor())
+        return left
+
+    def factor():
+        if peek() == ('kw', 'NOT'):
+            take()
+            inner = factor()
+            return lambda r: not inner(r)
+        if peek() == ('op', '('):
+            take()
+            inner = expr()
+            take()
+            return inner
+        kind, column = take()
+        if kind == 'val':
+            # Constant comparisons such as 1 = 1
+            _, operator = take()
+            _, value = take()
+            constant = compare(column, operator, value)
+            return lambda r: constant
+        if kind != 'col':
+            raise ValueError('Expected column in where clause: {}'.format(text))
+        kind, operator = take()
+        if operator == 'IS':
+            negate = peek() == ('kw', 'NOT')
+            if negate:
+                take()
+            take()
+            return lambda r: (r.get(column) is None) != negate
+        if operator == 'IN':
+            take()
+            values = []
+            while peek() != ('op', ')'):
+                kind, value = take()
+                if kind == 'val':
+                    values.append(value)
+            take()
+            return lambda r: compare(r.get(column), 'IN', values)
+        _, value = take()
+        return lambda r: compare(r.get(column), operator, value)
+
+    predicate = expr()
+    return predicate
+
+
+def query(records, body):
+    """Filter records by the ColumnName/Operator/IsValue triple and/or the
+    WhereClause/sqlWhereClause the query endpoints accept"""
+    predicates = []
+    if body.get('ColumnName'):
+        column, operator = body['ColumnName'], body.get('Operator') or '='
+        predicates.append(lambda r: compare(r.get(column), operator,
+                                            body.get('IsValue')))
+    for key in ('WhereClause', 'sqlWhereClause', 'where'):
+        if body.get(key):
+            predicates.append(parse_where(body[key]))
+    return [r for r in records if all(p(r) for p in predicates)]
+
+
+# Workflow endpoints
+@route('Workflow', 'GetWorkItem')
+def get_work_item(state, args, body):
+    return state.get('work_items', args[0])
+
+
+@route('Workflow', 'QueryWorkList')
+@route('Workflow', 'QueryWorkListUsingSQL')
+def query_work_list(state, args, body):
+    return query(state.work_items.values(), body)
+
+
+@route('Workflow', 'GetWorkListByUserID')
+def get_work_list_by_user_id(state, args, body):
+    return [w for w in state.work_items.values()
+            if w['UserID'] == body.get('UserName') and
+            (not body.get('Status') or w['Status'] == body['Status'])]
+
+
+def _set_work_item_status(status):
+    def handler(state, args, body):
+        item = state.get('work_items', args[0])
+        item['Status'] = status
+        if status == 'Completed':
+            item['CompletedDate'] = wcf_date(datetime.datetime.utcnow())
+        return item
+    return handler
+
+route('Workflow', 'CompleteWorkItem')(_set_work_item_status('Completed'))
+route('Workflow', 'CancelWorkItem')(_set_work_item_status('Canceled'))
+route('Workflow', 'AssignWorkItem')(_set_work_item_status('Assigned'))
+route('Workflow', 'UndoAssignWorkItem')(_set_work_item_status('New'))
+route('Workflow', 'ActivateWorkItem')(_set_work_item_status('Assigned'))
+
+
+@route('Workflow', 'UpdateWorkItem')
+def update_work_item(state, args, body):
+    item = state.get('work_items', args[0])
+    item.update(body.get('attributes') or {})
+    return item
+
+
+@route('Workflow', 'ReassignWorkItem')
+def reassign_work_item(state, args, body):
+    item = state.get('work_items', body.get('WorkItemID'))
+    item['UserID'] = body.get('UserName')
+    return item
+
+
+@route('Workflow', 'GetProcInst')
+def get_proc_inst(state, args, body):
+    return state.get('proc_insts', args[0])
+
+
+@route('Workflow', 'QueryProcInsts')
+@route('Workflow', 'QueryProcInstsUsingSQL')
+def query_proc_insts(state, args, body):
+    return query(state.proc_insts.values(), body)
+
+
+@route('Workflow', 'CreateProcInst')
+def create_proc_inst(state, args, body):
+    def_id = body.get('ProcessID') or sorted(state.proc_defs)[0]
+    state.get('proc_defs', def_id)
+    return state.create_instance(def_id, body.get('Initiator', 'DOMAIN\\system'),
+                                 sorted(state.users) or ['DOMAIN\\system'],
+                                 name=body.get('ProcInstName'),
+                                 parent=body.get('SuperProcInstID'))
+
+
+def _set_proc_inst_status(status):
+    def handler(state, args, body):
+        inst = state.get('proc_insts', args[0])
+        inst['Status'] = status
+        return inst
+    return handler
+
+route('Workflow', 'CancelProcInst')(_set_proc_inst_status('Canceled'))
+route('Workflow', 'SuspendProcInst')(_set_proc_inst_status('Suspended'))
+route('Workflow', 'ResumeProcInst')(_set_proc_inst_status('Running'))
+route('Workflow', 'ArchiveProcInst')(_set_proc_inst_status('Archived'))
+route('Workflow', 'RestoreProcInst')(_set_proc_inst_status('Completed'))
+
+
+@route('Workflow', 'DeleteProcInst')
+def delete_proc_inst(state, args, body):
+    state.get('proc_insts', args[0])
+    del state.proc_insts[args[0]]
+    return True
+
+
+@route('Workflow', 'UpdateProcInst')
+def update_proc_inst(state, args, body):
+    inst = state.get('proc_insts', args[0])
+    inst.update(body.get('attributes') or {})
+    return inst
+
+
+@route('Workflow', 'MigrateProcInst')
+def migrate_proc_inst(state, args, body):
+    inst = state.get('proc_insts', args[0])
+    target = body.get('TargetProcessDefinitionID') or body.get('ProcessDefinitionID')
+    if target:
+        inst['DefinitionID'] = target
+    return inst
+
+
+@route('Workflow', 'GetProcInstAttrs')
+def get_proc_inst_attrs(state, args, body):
+    state.get('proc_insts', args[0])
+    return state.custom_attrs.get(args[0], {})
+
+
+@route('Workflow', 'GetActivityInst')
+def get_activity_inst(state, args, body):
+    return state.get('activity_insts', args[0])
+
+
+@route('Workflow', 'GetActivityInstsByPIID')
+@route('Workflow', 'GetActivityInstStatus')
+def get_activity_insts_by_piid(state, args, body):
+    state.get('proc_insts', args[0])
+    return [a for a in state.activity_insts.values()
+            if a['ProcessInstanceID'] == args[0]]
+
+
+@route('Workflow', 'QueryActivityInsts')
+def query_activity_insts(state, args, body):
+    return query(state.activity_insts.values(), body)
+
+
+@route('Workflow', 'GetEvent')
+def get_event(state, args, body):
+    return state.get('events', args[0])
+
+
+@route('Workflow', 'GetEventsByProcInstID')
+def get_events_by_proc_inst_id(state, args, body):
+    return [e for e in state.events.values() if e['ProcessInstanceID'] == args[0]]
+
+
+@route('Workflow', 'GetProcedure')
+def get_procedure(state, args, body):
+    return state.get('work_items', args[0])
+
+
+@route('Workflow', 'QueryProcedureList')
+def query_procedure_list(state, args, body):
+    return query(state.work_items.values(), body)
+
+
+@route('Workflow', 'GetProcDefs')
+@route('Workflow', 'GetReleasedProcDefs')
+def get_proc_defs(state, args, body):
+    return list(state.proc_defs.values())
+
+
+@route('Workflow', 'GetProcDefXml')
+def get_proc_def_xml(state, args, body):
+    definition = state.get('proc_defs', args[0])
+    activities = ''.join('<Activity Name="{}"/>'.format(a)
+                         for a in definition['Activities'])
+    return '<ProcessDefinition ID="{}" Name="{}">{}</ProcessDefinition>'.format(
+        definition['DefinitionID'], definition['DefName'], activities)
+
+
+@route('Workflow', 'CheckinProcDef')
+@route('Workflow', 'CreateProcDef')
+@route('Workflow', 'UpdateProcDef')
+def checkin_proc_def(state, args, body):
+    xml = body['xml']
+    match = re.search(r'<ProcessDefinition[^>]*\bID="([^"]+)"', xml)
+    def_id = match.group(1) if match and match.group(1) in state.proc_defs else state.uuid()
+    match = re.search(r'<ProcessDefinition[^>]*\bName="([^"]*)"', xml)
+    state.proc_defs[def_id] = {
+        'DefinitionID': def_id, 'DefName': match.group(1) if match else def_id,
+        'Version': '1.00', 'Status': 'Released',
+        'Activities': re.findall(r'<Activity Name="([^"]*)"', xml)}
+    return def_id
+
+
+@route('Workflow', 'QueryDatabase')
+def query_database(state, args, body):
+    rows = []
+    for record in state.proc_insts.values():
+        rows.append('<Table>{}</Table>'.format(''.join(
+            '<{0}>{1}</{0}>'.format(key, value)
+            for key, value in sorted(record.items()) if value is not None)))
+    return '<NewDataSet>{}</NewDataSet>'.format(''.join(rows))
+
+
+@route('Workflow', 'GetCustomAttrsbyID')
+@route('Workflow', 'GetCustomAttrsByID')
+def get_custom_attrs_by_id(state, args, body):
+    return state.custom_attrs.get(args[0], {})
+
+
+@route('Workflow', 'GetCustomAttr')
+def get_custom_attr(state, args, body):
+    return state.custom_attrs.get(args[0], {}).get(body.get('attrName'))
+
+
+@route('Workflow', 'GetCustomAttrsByNames')
+def get_custom_attrs_by_names(state, args, body):
+    return [[state.custom_attrs.get(c, {}).get(n) for n in body.get('AttrNames', [])]
+            for c in body.get('CustomIDs', [])]
+
+
+@route('Workflow', 'SetCustomAttrs')
+def set_custom_attrs(state, args, body):
+    attrs = body.get('attributes') or {}
+    if isinstance(attrs, list):
+        attrs = dict((a.get('Name'), a.get('Value')) for a in attrs)
+    state.custom_attrs.setdefault(args[0], {}).update(attrs)
+    return True
+
+
+@route('Workflow', 'RemoveCustomAttr')
+def remove_custom_attr(state, args, body):
+    state.custom_attrs.get(args[0], {}).pop(body.get('attributeName'), None)
+    return True
+
+
+@route('Workflow', 'RemoveCustomAttrs')
+def remove_custom_attrs(state, args, body):
+    for name in body.get('namesArray') or []:
+        state.custom_attrs.get(args[0], {}).pop(name, None)
+    return True
+
+
+@route('Workflow', 'DeleteCustomAttrs')
+def delete_custom_attrs(state, args, body):
+    state.custom_attrs.pop(args[0], None)
+    return True
+
+
+@route('Workflow', 'GetMailDeliverables')
+@route('Workflow', 'GetExpectingSendMailDeliverable')
+def get_mail_deliverables(state, args, body):
+    return [m for m in state.mail.values() if m['Status'] == 'Failed']
+
+
+@route('Workflow', 'ResendMailDeliverable')
+def resend_mail_deliverable(state, args, body):
+    state.get('mail', args[0])['Status'] = 'Sent'
+    return True
+
+
+@route('Workflow', 'CancelMailDeliverable')
+def cancel_mail_deliverable(state, args, body):
+    state.get('mail', args[0])['Status'] = 'Canceled'
+    return True
+
+
+@route('Workflow', 'GetUUID')
+def get_uuid(state, args, body):
+    return state.uuid()
+
+
+# Admin endpoints
+@route('Admin', 'GetRegisterUsers')
+def get_register_users(state, args, body):
+    return list(state.users.values())
+
+
+@route('Admin', 'GetRegisterUser')
+def get_register_user(state, args, body):
+    return state.get('users', body.get('userName'))
+
+
+@route('Admin', 'QueryRegisterUsersUsingSQL')
+def query_register_users(state, args, body):
+    return query(state.users.values(), body)
+
+
+@route('Admin', 'RegisterUser')
+@route('Admin', 'UpdateRegisterUser')
+def register_user(state, args, body):
+    user = state.users.setdefault(body['UserName'], {'Disabled': False})
+    user.update(body)
+    return user
+
+
+@route('Admin', 'UnregisterUser')
+def unregister_user(state, args, body):
+    state.get('users', body.get('userName'))
+    del state.users[body['userName']]
+    return True
+
+
+@route('Admin', 'GetRoles')
+def get_roles(state, args, body):
+    return list(state.roles.values())
+
+
+@route('Admin', 'GetRole')
+def get_role(state, args, body):
+    return state.get('roles', args[0])
+
+
+@route('Admin', 'AddRole')
+@route('Admin', 'UpdateRole')
+def add_role(state, args, body):
+    role = state.roles.setdefault(body['RoleName'], {})
+    role.update(body)
+    state.role_members.setdefault(body['RoleName'], set())
+    return role
+
+
+@route('Admin', 'RemoveRole')
+def remove_role(state, args, body):
+    state.get('roles', args[0])
+    del state.roles[args[0]]
+    state.role_members.pop(args[0], None)
+    return True
+
+
+@route('Admin', 'QueryRoleMembers')
+def query_role_members(state, args, body):
+    state.get('roles', args[0])
+    return [{'RoleName': args[0], 'Assignee': assignee,
+             'AssigneeType': 'Group' if assignee in state.groups else 'User'}
+            for assignee in sorted(state.role_members.get(args[0], ()))]
+
+
+@route('Admin', 'AddRoleMember')
+def add_role_member(state, args, body):
+    state.get('role_members', body.get('RoleName')).add(body.get('Assignee'))
+    return True
+
+
+@route('Admin', 'RemoveRoleMember')
+def remove_role_member(state, args, body):
+    state.get('role_members', body.get('RoleName')).discard(body.get('Assignee'))
+    return True
+
+
+@route('Admin', 'GetGroups')
+def get_groups(state, args, body):
+    return list(state.groups.values())
+
+
+@route('Admin', 'GetGroup')
+def get_group(state, args, body):
+    return state.get('groups', args[0])
+
+
+@route('Admin', 'AddGroup')
+@route('Admin', 'UpdateGroup')
+def add_group(state, args, body):
+    group = state.groups.setdefault(body['GroupName'], {})
+    group.update(body)
+    state.group_members.setdefault(body['GroupName'], set())
+    return group
+
+
+@route('Admin', 'RemoveGroup')
+def remove_group(state, args, body):
+    state.get('groups', args[0])
+    del state.groups[args[0]]
+    state.group_members.pop(args[0], None)
+    return True
+
+
+@route('Admin', 'GetGroupMembers')
+def get_group_members(state, args, body):
+    state.get('groups', args[0])
+    return [{'GroupName': args[0], 'UserName': user}
+            for user in sorted(state.group_members.get(args[0], ()))]
+
+
+@route('Admin', 'AddGroupMember')
+def add_group_member(state, args, body):
+    state.get('group_members', body.get('GroupName')).add(body.get('UserName'))
+    return True
+
+
+@route('Admin', 'RemoveGroupMember')
+def remove_group_member(state, args, body):
+    state.get('group_members', body.get('GroupName')).discard(body.get('UserName'))
+    return True
+
+
+@route('Admin', 'GetAccessRightNames')
+def get_access_right_names(state, args, body):
+    return ACCESS_RIGHTS
+
+
+@route('Admin', 'GetAccessRights')
+def get_access_rights(state, args, body):
+    user = body.get('userName')
+    rights = set()
+    for name, members in state.role_members.items():
+        if user in members or any(user in state.group_members.get(member, ())
+                                  for member in members):
+            rights.update(state.roles[name].get('Rights') or [])
+    return sorted(rights)
+
+
+@route('Admin', 'GetDelegations')
+def get_delegations(state, args, body):
+    return [d for d in state.delegations.values()
+            if all(d.get(k) == body[k] for k in ('FromUser', 'ToUser', 'Status')
+                   if body.get(k))]
+
+
+@route('Admin', 'GetDelegation')
+def get_delegation(state, args, body):
+    return state.get('delegations', args[0])
+
+
+@route('Admin', 'AddDelegation')
+def add_delegation(state, args, body):
+    delegation = dict(body, DelegationID=state.uuid(), Status='Inactive')
+    state.delegations[delegation['DelegationID']] = delegation
+    return delegation
+
+
+@route('Admin', 'UpdateDelegation')
+def update_delegation(state, args, body):
+    delegation = state.get('delegations', body.get('DelegationID'))
+    delegation.update(body)
+    return delegation
+
+
+def _set_delegation_status(status):
+    def handler(state, args, body):
+        state.get('delegations', args[0])['Status'] = status
+        return True
+    return handler
+
+route('Admin', 'ActivateDelegation')(_set_delegation_status('Active'))
+route('Admin', 'CancelDelegation')(_set_delegation_status('Canceled'))
+
+
+@route('Admin', 'RemoveDelegation')
+def remove_delegation(state, args, body):
+    state.get('delegations', args[0])
+    del state.delegations[args[0]]
+    return True
+
+
+@route('Admin', 'GetDatabaseInfo')
+def get_database_info(state, args, body):
+    return {'DatabaseType': 'SQLServer', 'DatabaseName': 'AgilePoint',
+            'ServerName': 'stub'}
+
+
+@route('Admin', 'GetSysPerfInfo')
+def get_sys_perf_info(state, args, body):
+    total = sum(state.stats.values())
+    return {'ActiveProcessInstances': sum(1 for p in state.proc_insts.values()
+                                          if p['Status'] == 'Running'),
+            'RequestsServed': total,
+            'CPUUsage': state.random.uniform(5, 60),
+            'MemoryUsage': state.random.uniform(500, 2000)}
+
+
+@route('Admin', 'GetSmtpServer')
+def get_smtp_server(state, args, body):
+    return 'smtp.domain.tld'
+
+
+def decode_body(raw, encoding):
+    """Undo a gzip or deflate Content-Encoding on a request body"""
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return zlib.decompress(raw)
+    return raw
+
+
+def encode_body(data, accept):
+    """(body, content encoding) for a response honouring Accept-Encoding.
+
+    Bodies under COMPRESS_MIN bytes are sent as they are."""
+    if len(data) < COMPRESS_MIN or not accept:
+        return data, None
+    accepted = [token.split(';')[0].strip().lower() for token in accept.split(',')]
+    if 'gzip' in accepted:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush(), 'gzip'
+    if 'deflate' in accepted:
+        return zlib.compress(data, 6), 'deflate'
+    return data, None
+
+
+def respond(server, path, raw, encoding=None, authorization=None):
+    """Answer one request as (delay seconds, status, json payload).
+
+    server is anything carrying the StubServer settings: state, path,
+    latency, jitter, error_rate, strict, random and random_lock. encoding and
+    authorization are the request's Content-Encoding and Authorization."""
+    prefix = '/{}/'.format(server.path)
+    if not path.startswith(prefix):
+        return 0, 404, {'Message': 'Unknown path'}
+    tokens = server.state.tokens
+    if tokens is not None and (authorization or '')[len('Bearer '):] not in tokens:
+        return 0, 401, {'Message': 'Unauthorized'}
+    if path == prefix + '_stats':
+        return 0, 200, server.state.stats
+    parts = [unquote(p) for p in path[len(prefix):].split('?')[0].split('/')]
+    if len(parts) < 2:
+        return 0, 404, {'Message': 'Unknown path'}
+    section, name, args = parts[0], parts[1], parts[2:]
+
+    rand = server.random
+    with server.random_lock:
+        delay = max(0.0, rand.gauss(server.latency, server.jitter)) / 1000.0
+        failed = rand.random() < server.error_rate
+    if failed:
+        return delay, 500, {'Message': 'Injected failure'}
+
+    handler = HANDLERS.get((section, name))
+    if handler is None and server.strict:
+        return delay, 404, {'Message': 'No stub for {}/{}'.format(section, name)}
+    try:
+        raw = decode_body(raw, encoding)
+    except zlib.error:
+        return delay, 400, {'Message': 'Invalid {} body'.format(encoding)}
+    try:
+        body = json.loads(raw.decode('utf-8')) if raw else {}
+    except ValueError:
+        return delay, 400, {'Message': 'Invalid JSON body'}
+    with server.state.lock:
+        key = '{}/{}'.format(section, name)
+        server.state.stats[key] = server.state.stats.get(key, 0) + 1
+        try:
+            result = handler(server.state, args, body) if handler else None
+        except (NotFound, KeyError) as error:
+            return delay, 404, {'Message': str(error)}
+        except (AttributeError, TypeError, ValueError) as error:
+            # Bodies the handler cannot make sense of, e.g. an unknown operator
+            return delay, 400, {'Message': 'Invalid request: {}'.format(error)}
+    return delay, 200, {'{}Result'.format(name): result}
+
+
+class StubSettings(object):
+    """Behaviour shared by the HTTP/1.1 and HTTP/2 stand-in servers"""
+    def configure(self, state, path='AgilePointServer', latency=0.0, jitter=0.0,
+                  error_rate=0.0, strict=False, seed=0, verbose=False, compress=True,
+                  chunked=False):
+        self.state = state
+        self.path = path
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.strict = strict
+        self.verbose = verbose
+        self.compress = compress
+        # Send HTTP/1.1 bodies with chunked transfer encoding
+        self.chunked = chunked
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Dispatches requests to the registered endpoint handlers"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        # Headers and body go out in separate writes; without this Nagle
+        # and delayed ACKs add ~40ms to every keep-alive request.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, fmt, *args):  # pylint: disable=arguments-differ
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, fmt, *args)
+
+    def _send(self, code, payload):
+        data = json.dumps(payload).encode('utf-8')
+        encoding = None
+        if self.server.compress:
+            data, encoding = encode_body(data, self.headers.get('Accept-Encoding'))
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if self.server.chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for start in range(0, len(data), CHUNK_SIZE):
+                chunk = data[start:start + CHUNK_SIZE]
+                self.wfile.write('{:X}\r\n'.format(len(chunk)).encode('ascii') + chunk + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        delay, code, payload = respond(self.server, self.path, raw,
+                                       self.headers.get('Content-Encoding'),
+                                       self.headers.get('Authorization'))
+        if delay:
+            time.sleep(delay)
+        return self._send(code, payload)
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+
+class StubServer(ThreadingMixIn, HTTPServer, StubSettings):
+    """Threaded stand-in AgilePoint server"""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, state, **kwargs):
+        HTTPServer.__init__(self, address, StubHandler)
+        self.configure(state, **kwargs)
+
+    @property
+    def url(self):
+        """Host argument for AgilePoint()"""
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+
+def start_server(port=0, state=None, **kwargs):
+    """Start a StubServer on a daemon thread and return it.
+
+    Port 0 picks a free port; read it back from server.url. Call
+    server.shutdown() when done."""
+    if state is None:
+        state = State(kwargs.get('seed', 0))
+        state.populate()
+    server = StubServer(('127.0.0.1', port), state, **kwargs)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=14490)
+    parser.add_argument('--path', default='AgilePointServer')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--roles', type=int, default=20)
+    parser.add_argument('--definitions', type=int, default=20)
+    parser.add_argument('--instances', type=int, default=10000)
+    parser.add_argument('--mail', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='mean added latency in ms')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='standard deviation of added latency in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--strict', action='store_true',
+                        help='answer 404 for endpoints without a handler')
+    parser.add_argument('--no-compress', action='store_true',
+                        help='never compress responses')
+    parser.add_argument('--http2', action='store_true',
+                        help='serve HTTP/2 (h2c) and HTTP/1.1 through hypercorn')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    state = State(args.seed)
+    started = time.time()
+    state.populate(users=args.users, groups=args.groups, roles=args.roles,
+                   definitions=args.definitions, instances=args.instances,
+                   mail=args.mail)
+    print('Generated {} instances, {} work items in {:.1f}s'.format(
+        len(state.proc_insts), len(state.work_items), time.time() - started))
+    if args.http2:
+        from stub_http2 import Http2StubServer as server_cls
+    else:
+        server_cls = StubServer
+    server = server_cls((args.host, args.port), state, path=args.path,
+                        latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, strict=args.strict,
+                        seed=args.seed, verbose=args.verbose,
+                        compress=not args.no_compress)
+    print('Serving {}/{}'.format(server.url, args.path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
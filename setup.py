@@ -37,10 +37,12 @@ setup(
     ],
     keywords='agilepoint bpm bpms',
     packages=find_packages(),
-    install_requires=['hammock'],
-    extras_require={},
-    package_data={},
+    install_requires=['hammock', 'futures; python_version < "3"'],
+    extras_require={'http2': ['httpx[http2]'],
+                    'compression': ['brotli', 'zstandard; python_version >= "3"'],
+                    'analytics': ['numpy']},
+    package_data={'agilepoint': ['api_spec.json']},
     data_files=[],
-    entry_points={},
+    entry_points={'console_scripts': ['agilepoint = agilepoint.cli:main']},
     scripts=[],
 )
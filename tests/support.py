@@ -0,0 +1,31 @@
+"""Stand-in server fixtures shared by the tests"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'helper'))
+
+from agilepoint import AgilePoint  # noqa: E402
+from stub_server import State, start_server  # noqa: E402  pylint: disable=import-error
+
+PATH = 'AgilePointServer'
+
+
+class StubTestCase(unittest.TestCase):
+    """Runs each test against a fresh stand-in server.
+
+    populate: State.populate() arguments of the synthetic dataset"""
+    populate = dict(users=20, groups=3, roles=3, definitions=2, instances=20, mail=10)
+
+    def setUp(self):
+        self.state = State()
+        self.state.populate(**self.populate)
+        self.server = start_server(0, self.state)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.ap = self.client()
+
+    def client(self, username='user', password='password', **kwargs):
+        """AgilePoint client of the stand-in server"""
+        return AgilePoint(self.server.url, PATH, username, password, **kwargs)
@@ -0,0 +1,36 @@
+import collections
+import unittest
+from agilepoint import analytics
+from agilepoint.graph import CLOSED_STATUSES
+from .support import StubTestCase
+
+
+@unittest.skipIf(analytics.numpy is None, 'needs numpy')
+class WorkListSnapshotTest(StubTestCase):
+    def setUp(self):
+        super(WorkListSnapshotTest, self).setUp()
+        self.items = list(self.state.work_items.values())
+        self.snapshot = analytics.WorkListSnapshot.query(
+            self.ap, ColumnName='Status', Operator='<>', IsValue='', WhereClause='')
+
+    def test_columns_match_server(self):
+        self.assertEqual(sorted(self.snapshot.ids), sorted(self.state.work_items))
+        self.assertEqual(self.snapshot.counts_by('status'),
+                         dict(collections.Counter(item['Status'] for item in self.items)))
+        self.assertEqual(self.snapshot.counts_by('user'),
+                         dict(collections.Counter(item['UserID'] for item in self.items)))
+
+    def test_overdue_and_ages(self):
+        now = self.snapshot.now
+        open_items = [item for item in self.items if item['Status'] not in CLOSED_STATUSES]
+        overdue = [item for item in open_items if analytics._epoch(item['DueDate']) < now]  # pylint: disable=protected-access
+        self.assertEqual(int(self.snapshot.overdue().sum()), len(overdue))
+        self.assertEqual(len(self.snapshot.ages()), len(open_items))
+        summary = self.snapshot.summary(sla=3600)
+        self.assertEqual(summary['open'], len(open_items))
+        self.assertEqual(sum(count for _, count in summary['aging']), len(open_items))
+
+    def test_for_users_matches_query(self):
+        users = sorted(set(item['UserID'] for item in self.items))
+        snapshot = analytics.WorkListSnapshot.for_users(self.ap, users, workers=4)
+        self.assertEqual(sorted(snapshot.ids), sorted(self.snapshot.ids))
@@ -0,0 +1,44 @@
+import itertools
+from agilepoint.auth import TokenAuth
+from agilepoint.exceptions import AgilePointBadResponse
+from .support import StubTestCase
+
+
+class TokenAuthTest(StubTestCase):
+    def setUp(self):
+        super(TokenAuthTest, self).setUp()
+        self.state.tokens = set(['t1'])
+        self.issued = itertools.count(1)
+
+    def fetch(self):
+        return 't{}'.format(next(self.issued)), 3600
+
+    def test_token_is_reused(self):
+        auth = TokenAuth(self.fetch)
+        client = self.client(auth=auth)
+        for _ in range(5):
+            client.admin.get_roles()
+        self.assertEqual(auth.refreshes, 1)
+
+    def test_refreshes_and_retries_after_401(self):
+        auth = TokenAuth(self.fetch)
+        client = self.client(auth=auth)
+        client.admin.get_roles()
+        self.state.tokens = set(['t2'])
+        self.assertTrue(client.admin.get_roles())
+        self.assertEqual(auth.refreshes, 2)
+        self.assertEqual(auth.token(), 't2')
+
+    def test_retries_once(self):
+        auth = TokenAuth(self.fetch)
+        self.state.tokens = set()
+        self.assertRaises(AgilePointBadResponse, self.client(auth=auth).admin.get_roles)
+        self.assertEqual(auth.refreshes, 2)
+
+    def test_refreshes_before_expiry(self):
+        auth = TokenAuth(lambda: ('t1', 30), refresh_margin=60)
+        client = self.client(auth=auth)
+        for _ in range(3):
+            client.admin.get_roles()
+        # Every later call finds the token inside the refresh margin
+        self.assertEqual(auth.refreshes, 3)
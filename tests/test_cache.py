@@ -0,0 +1,64 @@
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+from agilepoint.cache import DEFAULT_PATH, SQLiteCache
+from .support import StubTestCase
+
+
+class CachingAdapterTest(StubTestCase):
+    def setUp(self):
+        super(CachingAdapterTest, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache = SQLiteCache(os.path.join(directory, 'cache.sqlite'))
+
+    def fetches(self):
+        return self.state.stats.get('Admin/GetRoles', 0)
+
+    def test_same_credentials_hit(self):
+        self.client(cache=self.cache).admin.get_roles()
+        self.client(cache=self.cache).admin.get_roles()
+        self.assertEqual(self.fetches(), 1)
+
+    def test_other_credentials_miss(self):
+        self.client(cache=self.cache).admin.get_roles()
+        self.client('other', 'wrongpw', cache=self.cache).admin.get_roles()
+        self.assertEqual(self.fetches(), 2)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+
+class SQLiteCacheFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'sub', 'cache.sqlite')
+
+    def test_default_path_is_per_user(self):
+        self.assertFalse(DEFAULT_PATH.startswith(tempfile.gettempdir()))
+
+    def test_created_private(self):
+        SQLiteCache(self.path)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    @unittest.skipUnless(hasattr(os, 'getuid') and os.getuid() == 0, 'needs to chown')
+    def test_refuses_foreign_file(self):
+        SQLiteCache(self.path)
+        os.chown(self.path, 65534, 65534)
+        self.assertRaises(ValueError, SQLiteCache, self.path)
+
+    def test_counters_under_threads(self):
+        cache = SQLiteCache(self.path)
+        cache.set('key', 1)
+
+        def reads():
+            for _ in range(200):
+                cache.get_or_fetch('key', lambda: 2)
+        threads = [threading.Thread(target=reads) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.stats()['hits'], 800)
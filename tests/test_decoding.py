@@ -0,0 +1,41 @@
+import threading
+from agilepoint._utils import decoding, unwrap_result
+from .support import StubTestCase
+
+FIELDS = ('WorkItemID', 'Status', 'UserID')
+
+
+class DecodingTest(StubTestCase):
+    def work_list(self):
+        return unwrap_result(self.ap.workflow.query_work_list(
+            ColumnName='Status', Operator='<>', IsValue='', WhereClause=''))
+
+    def test_projects_fields(self):
+        with decoding(fields=FIELDS):
+            items = self.work_list()
+        self.assertEqual(len(items), len(self.state.work_items))
+        for item in items:
+            self.assertEqual(sorted(item), sorted(FIELDS))
+            self.assertEqual(item['Status'], self.state.work_items[item['WorkItemID']]['Status'])
+
+    def test_interns_chosen_fields(self):
+        with decoding(intern=('Status',)):
+            items = self.work_list()
+        statuses = {}
+        for item in items:
+            self.assertIs(statuses.setdefault(item['Status'], item['Status']), item['Status'])
+        names = {}
+        # Names are not shared: equal values decoded from different objects
+        self.assertTrue(any(names.setdefault(item['Name'], item['Name']) is not item['Name']
+                            for item in items))
+
+    def test_scoped_to_block_and_thread(self):
+        seen = []
+        with decoding(fields=('WorkItemID',)):
+            thread = threading.Thread(target=lambda: seen.append(self.work_list()[0]))
+            thread.start()
+            thread.join()
+            nested = self.work_list()[0]
+        self.assertEqual(sorted(nested), ['WorkItemID'])
+        self.assertGreater(len(seen[0]), 1)
+        self.assertGreater(len(self.work_list()[0]), 1)
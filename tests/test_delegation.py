@@ -0,0 +1,62 @@
+import datetime
+from agilepoint.delegation import ACTIVATE, CANCEL, CREATE, UPDATE, DelegationPlanner, Operation
+from .support import StubTestCase
+
+FROM = 'DOMAIN\\user000001'
+TO = 'DOMAIN\\user000002'
+
+
+class DelegationRollbackTest(StubTestCase):
+    def test_rollback_removes_created_and_activated(self):
+        planner = DelegationPlanner(self.ap, workers=2)
+        plan = planner.plan([{'FromUser': 'DOMAIN\\user000001', 'ToUser': 'DOMAIN\\user000002',
+                              'StartDate': datetime.datetime(2017, 12, 20),
+                              'EndDate': datetime.datetime(2018, 1, 3),
+                              'Description': 'Holiday'}])
+        self.assertEqual([op.action for op in plan.operations], [CREATE, ACTIVATE])
+        plan.add(Operation(ACTIVATE, ('domain\\user000003', 'domain\\user000004'), 'missing'))
+
+        report = planner.apply(plan)
+
+        self.assertEqual(len(report.failures), 1)
+        self.assertEqual(len(report.applied), 2)
+        self.assertEqual(report.rollback_failures, [])
+        self.assertEqual(len(report.rolled_back), 2)
+        self.assertEqual(self.state.delegations, {})
+
+    def add(self, description, status='Active'):
+        delegation = {'FromUser': FROM, 'ToUser': TO, 'StartDate': '2017-12-20T00:00:00',
+                      'EndDate': '2018-01-03T00:00:00', 'Description': description}
+        created = self.ap.admin.add_delegation(**delegation)['AddDelegationResult']
+        self.state.delegations[created['DelegationID']]['Status'] = status
+        return created['DelegationID']
+
+    def test_rollback_restores_empty_fields(self):
+        delegation_id = self.add(None)
+        planner = DelegationPlanner(self.ap)
+        plan = planner.plan([{'FromUser': FROM, 'ToUser': TO,
+                              'StartDate': datetime.datetime(2017, 12, 21),
+                              'EndDate': datetime.datetime(2018, 1, 3),
+                              'Description': 'Holiday'}])
+        self.assertEqual([op.action for op in plan.operations], [UPDATE])
+        plan.add(Operation(ACTIVATE, ('domain\\user000003', 'domain\\user000004'), 'missing'))
+
+        report = planner.apply(plan)
+
+        self.assertEqual(report.rollback_failures, [])
+        self.assertEqual(len(report.rolled_back), 1)
+        restored = self.state.delegations[delegation_id]
+        self.assertEqual(restored['StartDate'], '2017-12-20T00:00:00')
+        self.assertEqual(restored['Description'], '')
+
+    def test_every_open_delegation_of_a_pair_is_seen(self):
+        kept = self.add('Holiday')
+        extra = self.add('Old holiday', status='Inactive')
+        planner = DelegationPlanner(self.ap, cancel_missing=True)
+        self.assertEqual(sorted(planner.existing([FROM])), sorted([kept, extra]))
+        plan = planner.plan([{'FromUser': FROM, 'ToUser': TO,
+                              'StartDate': '2017-12-20T00:00:00',
+                              'EndDate': '2018-01-03T00:00:00', 'Description': 'Holiday'}])
+        self.assertEqual([(op.action, op.delegation_id) for op in plan.operations],
+                         [(CANCEL, extra)])
+        self.assertEqual(plan.unchanged, 1)
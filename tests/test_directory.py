@@ -0,0 +1,44 @@
+from agilepoint.directory import DirectoryIndex
+from .support import StubTestCase
+
+
+class DirectoryIndexTest(StubTestCase):
+    # More users than a group holds, so some are outside every group
+    populate = dict(StubTestCase.populate, users=40)
+
+    def setUp(self):
+        super(DirectoryIndexTest, self).setUp()
+        self.group = sorted(self.state.groups)[0]
+        self.role = sorted(self.state.roles)[0]
+        self.state.role_members[self.role].add(self.group)
+        self.directory = DirectoryIndex(self.ap, workers=4).load()
+
+    def test_memberships_match_server(self):
+        for group, users in self.state.group_members.items():
+            self.assertEqual(self.directory.members(group), sorted(users))
+        user = sorted(self.state.group_members[self.group])[0]
+        self.assertTrue(self.directory.in_group(user.upper(), self.group.lower()))
+        self.assertIn(self.group, self.directory.groups_of(user))
+        self.assertEqual(len(self.directory.users), len(self.state.users))
+
+    def test_role_through_group(self):
+        direct = set(u for u in self.state.role_members[self.role] if u in self.state.users)
+        expanded = direct | self.state.group_members[self.group]
+        self.assertEqual(self.directory.role_members(self.role, expand=False), sorted(direct))
+        self.assertEqual(self.directory.role_members(self.role), sorted(expanded))
+        for user in expanded:
+            self.assertTrue(self.directory.has_role(user, self.role))
+            self.assertIn(self.role, self.directory.roles_of(user))
+
+    def test_refresh_one_group(self):
+        user = sorted(set(self.state.users) - self.state.group_members[self.group])[0]
+        self.state.group_members[self.group].add(user)
+        self.assertFalse(self.directory.in_group(user, self.group))
+        self.directory.refresh(groups=[self.group])
+        self.assertTrue(self.directory.in_group(user, self.group))
+        self.assertTrue(self.directory.has_role(user, self.role))
+
+    def test_unknown_names(self):
+        self.assertFalse(self.directory.in_group('nobody', self.group))
+        self.assertFalse(self.directory.has_role('nobody', self.role))
+        self.assertEqual(self.directory.members('no group'), [])
@@ -0,0 +1,35 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from . import support  # noqa: F401  puts helper/ on sys.path
+import generate_api  # noqa: E402  pylint: disable=import-error
+
+PACKAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agilepoint')
+SPEC = os.path.join(PACKAGE, 'api_spec.json')
+
+
+def read(file_name):
+    with io.open(file_name, encoding='utf-8') as f_handle:
+        return f_handle.read()
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_spec_renders_modules(self):
+        spec = generate_api.load_spec(SPEC)
+        for section in ('Admin', 'Workflow'):
+            self.assertEqual(generate_api.render_module(spec, section),
+                             read(os.path.join(PACKAGE, section.lower() + '.py')))
+
+    def test_modules_reproduce_spec(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        spec_file = os.path.join(directory, 'api_spec.json')
+        shutil.copy(SPEC, spec_file)
+        methods = []
+        for section in ('admin', 'workflow'):
+            methods.extend(generate_api.spec_from_module(os.path.join(PACKAGE, section + '.py')))
+        generate_api.write_spec(methods, spec_file, generate_api.modules_from_files(PACKAGE))
+        self.assertEqual(json.loads(read(spec_file)), json.loads(read(SPEC)))
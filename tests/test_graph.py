@@ -0,0 +1,50 @@
+from agilepoint.graph import GraphBuilder
+from .support import StubTestCase
+
+
+class GraphBuilderTest(StubTestCase):
+    def setUp(self):
+        super(GraphBuilderTest, self).setUp()
+        users = sorted(self.state.users)
+        definition = sorted(self.state.proc_defs)[0]
+        self.parent = self.state.create_instance(definition, users[0], users)
+        self.child = self.state.create_instance(
+            definition, users[0], users, parent=self.parent['ProcessInstanceID'])
+
+    def records(self, table, piid):
+        return set(key for key, record in getattr(self.state, table).items()
+                   if record['ProcessInstanceID'] == piid)
+
+    def test_build_follows_children(self):
+        parent, child = self.parent['ProcessInstanceID'], self.child['ProcessInstanceID']
+        graph = GraphBuilder(self.ap, workers=4).build([parent])
+        self.assertEqual(graph.errors, [])
+        self.assertEqual(set(graph.instances), set([parent, child]))
+        self.assertEqual(graph.children_of(parent), [child])
+        for piid in (parent, child):
+            self.assertEqual(set(graph.activities_of(piid)),
+                             self.records('activity_insts', piid))
+            self.assertEqual(set(graph.events_of(piid)), self.records('events', piid))
+            self.assertEqual(set(graph.instance_work_items(piid)),
+                             self.records('work_items', piid))
+
+    def test_blocked(self):
+        parent = self.parent['ProcessInstanceID']
+        graph = GraphBuilder(self.ap).build([parent])
+        waiting = [aiid for aiid, _ in graph.blocked(parent)]
+        running = [aiid for piid in (parent, self.child['ProcessInstanceID'])
+                   for aiid in self.records('activity_insts', piid)
+                   if self.state.activity_insts[aiid]['Status'] == 'Running']
+        self.assertEqual(sorted(waiting), sorted(running))
+
+    def test_for_definition_skips_closed(self):
+        definition = self.parent['DefinitionID']
+        graph = GraphBuilder(self.ap, children=0).for_definition(definition)
+        expected = set(piid for piid, record in self.state.proc_insts.items()
+                       if record['DefinitionID'] == definition and graph.is_open(record))
+        self.assertEqual(set(graph.by_definition(definition)), expected)
+
+    def test_errors_are_recorded(self):
+        graph = GraphBuilder(self.ap, work_items=False, children=0).build(['missing'])
+        self.assertEqual(graph.instances, {})
+        self.assertIn(('instance', 'missing'), [error[:2] for error in graph.errors])
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import time
+from agilepoint.journal import JournalFull, MutationJournal
+from .support import StubTestCase
+
+
+class MutationJournalTest(StubTestCase):
+    def setUp(self):
+        super(MutationJournalTest, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'journal.sqlite')
+        self.work_item = sorted(self.state.work_items)[0]
+
+    def test_running_call_not_reclaimed_by_other_process(self):
+        first = MutationJournal(self.ap, self.path, lease_timeout=60)
+        key = first.enqueue('workflow.complete_work_item', (self.work_item,),
+                            {'clientData': ''})
+        self.assertIsNotNone(first._claim())  # pylint: disable=protected-access
+
+        second = MutationJournal(self.ap, self.path)
+        self.assertFalse(second.run_once())
+        self.assertEqual(second.status(key)['state'], 'running')
+
+    def test_expired_lease_reclaimed(self):
+        first = MutationJournal(self.ap, self.path, lease_timeout=0.01)
+        key = first.enqueue('workflow.complete_work_item', (self.work_item,),
+                            {'clientData': ''})
+        self.assertIsNotNone(first._claim())  # pylint: disable=protected-access
+        time.sleep(0.05)
+
+        second = MutationJournal(self.ap, self.path)
+        self.assertTrue(second.run_once())
+        self.assertEqual(second.status(key)['state'], 'done')
+        self.assertEqual(self.state.stats['Workflow/CompleteWorkItem'], 1)
+
+    def test_pending_shared_between_journals(self):
+        first = MutationJournal(self.ap, self.path)
+        for work_item in sorted(self.state.work_items)[:3]:
+            first.enqueue('workflow.complete_work_item', (work_item,), {'clientData': ''})
+        second = MutationJournal(self.ap, self.path)
+        self.assertEqual(second.pending, 3)
+        while second.run_once():
+            pass
+        self.assertEqual(second.pending, 0)
+        self.assertEqual(first.pending, 0)
+        self.assertTrue(first.flush(timeout=1))
+
+    def test_backpressure_counts_other_journals(self):
+        first = MutationJournal(self.ap, self.path)
+        first.enqueue('workflow.complete_work_item', (self.work_item,), {'clientData': ''})
+        second = MutationJournal(self.ap, self.path, max_pending=1, enqueue_timeout=0.1)
+        self.assertRaises(JournalFull, second.enqueue, 'workflow.complete_work_item',
+                          (self.work_item,), {'clientData': ''})
@@ -0,0 +1,16 @@
+import datetime
+from agilepoint.mail import CLASSIFY, MailRecovery
+from .support import StubTestCase
+
+
+class MailRecoveryTest(StubTestCase):
+    def test_malformed_created_date_is_reported(self):
+        mail_id = sorted(self.state.mail)[0]
+        self.state.mail[mail_id]['CreatedDate'] = 'last Tuesday'
+        recovery = MailRecovery(self.ap, max_age=datetime.timedelta(days=1), rate=1000)
+
+        report = recovery.run()
+
+        self.assertEqual([(failed, action) for failed, action, _ in report.failures],
+                         [(mail_id, CLASSIFY)])
+        self.assertEqual(report.resent + report.cancelled, len(self.state.mail) - 1)
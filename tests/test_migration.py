@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+from agilepoint.graph import CLOSED_STATUSES
+from agilepoint.migration import BulkMigration
+from .support import StubTestCase
+
+
+class BulkMigrationTest(StubTestCase):
+    def setUp(self):
+        super(BulkMigrationTest, self).setUp()
+        self.source, self.target = sorted(self.state.proc_defs)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.progress = os.path.join(directory, 'progress.txt')
+
+    def open_instances(self, definition):
+        return sorted(piid for piid, record in self.state.proc_insts.items()
+                      if record['DefinitionID'] == definition and
+                      record['Status'] not in CLOSED_STATUSES)
+
+    def test_matching_by_name_with_overrides(self):
+        migration = BulkMigration(self.ap, self.source, self.target,
+                                  mapping={'Activity 1': None, 'Activity 2': 'Activity 3'})
+        self.assertEqual(migration.matching, [
+            {'Name': 'Activity 0', 'Value': 'Activity 0'},
+            {'Name': 'Activity 2', 'Value': 'Activity 3'},
+            {'Name': 'Activity 3', 'Value': 'Activity 3'}])
+        self.assertEqual(migration.unmapped, ['Activity 1'])
+
+    def test_run_migrates_and_resumes(self):
+        todo = self.open_instances(self.source)
+        self.assertTrue(todo)
+        migration = BulkMigration(self.ap, self.source, self.target, workers=4,
+                                  progress_path=self.progress)
+        report = migration.run()
+        self.assertTrue(report.ok)
+        self.assertEqual(sorted(report.migrated), todo)
+        self.assertEqual(self.state.stats['Workflow/MigrateProcInst'], len(todo))
+        self.assertTrue(all(self.state.proc_insts[piid]['DefinitionID'] == self.target
+                            for piid in todo))
+        self.assertEqual(migration.done(), set(todo))
+
+        again = BulkMigration(self.ap, self.source, self.target, progress_path=self.progress)
+        report = again.run(todo)
+        self.assertEqual(sorted(report.skipped), todo)
+        self.assertEqual(self.state.stats['Workflow/MigrateProcInst'], len(todo))
+
+    def test_failures_are_reported(self):
+        migration = BulkMigration(self.ap, self.source, self.target)
+        self.assertEqual(migration.done(), set())
+        report = migration.run(['missing'])
+        self.assertEqual([piid for piid, _ in report.failures], ['missing'])
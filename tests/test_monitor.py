@@ -0,0 +1,30 @@
+from agilepoint.monitor import AdaptiveLimiter, PerfSampler
+from .support import StubTestCase
+
+
+class PerfSamplerTest(StubTestCase):
+    def test_samples_database(self):
+        sampler = PerfSampler(self.ap)
+        sampler.sample()
+        latest = sampler.latest()
+        self.assertEqual(latest['errors'], 0)
+        self.assertGreater(latest['database_seconds'], 0)
+        self.assertIn('ActiveProcessInstances', sampler.columns)
+
+    def test_without_database(self):
+        sampler = PerfSampler(self.ap, database=False)
+        limiter = AdaptiveLimiter(sampler, 100, {'CPUUsage': (1000, 2000)}, min_rate=1)
+        sampler.sample()
+        latest = sampler.latest()
+        self.assertEqual(latest['errors'], 0)
+        self.assertNotEqual(latest['database_seconds'], latest['database_seconds'])
+        self.assertEqual(self.state.stats.get('Admin/GetDatabaseInfo', 0), 0)
+        self.assertEqual(limiter.pressure, 0.0)
+
+    def test_failed_call_counts(self):
+        self.server.error_rate = 1.0
+        sampler = PerfSampler(self.ap, fields=['CPUUsage'])
+        limiter = AdaptiveLimiter(sampler, 100, {}, min_rate=1)
+        sampler.sample()
+        self.assertEqual(sampler.latest()['errors'], 2)
+        self.assertEqual(limiter.pressure, 1.0)
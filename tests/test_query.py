@@ -0,0 +1,62 @@
+import json
+from agilepoint._utils import decoding, iter_result
+from agilepoint.exceptions import AgilePointBadResponse, InvalidArg
+from agilepoint.query import Compare, F, Query
+from .support import StubTestCase
+
+
+class QueryCompileTest(StubTestCase):
+    def test_activity_insts_without_triple_raises(self):
+        for condition in ((F('Status') == 'Running') | (F('Status') == 'Completed'),
+                          F('Status').isin(['Running']), F('CompletedDate') == None):  # noqa: E711
+            query = Query(self.ap, 'activity_insts').where(condition)
+            self.assertRaises(InvalidArg, query.compile)
+
+    def test_activity_insts_sends_triple_and_filters_rest(self):
+        condition = (F('Status') == 'Running') & F('Name').isin(['Activity 0', 'Activity 1'])
+        found = Query(self.ap, 'activity_insts').where(condition).all()
+        expected = [record for record in self.state.activity_insts.values()
+                    if condition.matches(record)]
+        self.assertEqual(sorted(r['ActivityInstanceID'] for r in found),
+                         sorted(r['ActivityInstanceID'] for r in expected))
+
+    def test_unfiltered_work_list_uses_sql_variant(self):
+        query = Query(self.ap, 'work_list').where(F.local(lambda item: True))
+        method, body, _ = query.compile()
+        self.assertEqual((method, body), ('query_work_list_using_s_q_l',
+                                          {'sqlWhereClause': '1 = 1'}))
+        self.assertEqual(len(query.all()), len(self.state.work_items))
+
+    def test_operator_must_be_known(self):
+        for operator in ('; DROP', '=1 OR 1', 'in'):
+            self.assertRaises(InvalidArg, Compare, 'Status', operator, 'Running')
+        self.assertEqual(Compare('Status', 'IN', ['a']).sql(), "[Status] IN ('a')")
+
+    def test_iterates_as_rows_arrive(self):
+        query = Query(self.ap, 'work_list').where(F('Status') != 'Completed')
+        self.assertIsNotNone(query.first())
+        expected = [item['WorkItemID'] for item in self.state.work_items.values()
+                    if item['Status'] != 'Completed']
+        self.assertEqual(sorted(item['WorkItemID'] for item in query), sorted(expected))
+
+
+class IterResultTest(StubTestCase):
+    def post(self, body):
+        return self.ap.workflow.workflow.QueryWorkListUsingSQL.POST(
+            data=json.dumps(body), stream=True)
+
+    def test_small_chunks(self):
+        rows = list(iter_result(self.post({'sqlWhereClause': '1 = 1'}), chunk_size=7))
+        self.assertEqual(sorted(rows, key=lambda row: row['WorkItemID']),
+                         sorted(self.state.work_items.values(), key=lambda row: row['WorkItemID']))
+
+    def test_decoding_options(self):
+        with decoding(fields=('WorkItemID', 'Status'), intern=True):
+            rows = list(iter_result(self.post({'sqlWhereClause': '1 = 1'}), chunk_size=64))
+        self.assertEqual(len(rows), len(self.state.work_items))
+        self.assertTrue(all(sorted(row) == ['Status', 'WorkItemID'] for row in rows))
+
+    def test_empty_and_errors(self):
+        self.assertEqual(list(iter_result(self.post({'sqlWhereClause': '1 = 0'}))), [])
+        self.assertRaises(AgilePointBadResponse, list,
+                          iter_result(self.post({'sqlWhereClause': '[Status] ~ 1'})))
@@ -0,0 +1,53 @@
+import gc
+import threading
+from agilepoint.registry import ClientRegistry
+from .support import PATH, StubTestCase
+
+
+class ClientRegistryTest(StubTestCase):
+    def test_metrics_count_every_request(self):
+        registry = ClientRegistry()
+        client = registry.get(self.server.url, PATH, 'user', 'password')
+
+        def calls():
+            for _ in range(25):
+                client.admin.get_roles()
+        threads = [threading.Thread(target=calls) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(registry.metrics()[self.server.url, 'user']['requests'], 200)
+
+    def test_evicted_host_stays_open_for_its_clients(self):
+        registry = ClientRegistry(max_hosts=1)
+        other_url = self.server.url.replace('127.0.0.1', 'localhost')
+        client = registry.get(self.server.url, PATH, 'user', 'password')
+        client.admin.get_roles()
+        registry.get(other_url, PATH, 'user', 'password').admin.get_roles()
+
+        self.assertTrue(client.admin.get_roles())
+        adapter = client.agilepoint._session.get_adapter(self.server.url)  # pylint: disable=protected-access
+        del client
+        gc.collect()
+        self.assertEqual(len(adapter.poolmanager.pools), 0)
+
+    def test_options_are_part_of_the_key(self):
+        registry = ClientRegistry()
+        checked = registry.get(self.server.url, PATH, 'user', 'password')
+        trusted = registry.get(self.server.url, PATH, 'user', 'password', validate=False)
+        self.assertIsNot(checked, trusted)
+        self.assertFalse(trusted.validate)
+        self.assertIs(registry.get(self.server.url, PATH, 'user', 'password'), checked)
+        self.assertIs(registry.get(self.server.url, PATH, 'user', 'password', validate=False),
+                      trusted)
+
+    def test_refuses_http2(self):
+        registry = ClientRegistry()
+        self.assertRaises(ValueError, registry.get, self.server.url, PATH, 'user', 'password',
+                          http2=True)
+
+    def test_client_refuses_http2_with_adapter(self):
+        from requests.adapters import HTTPAdapter
+        self.assertRaises(ValueError, self.client, adapter=HTTPAdapter(), http2=True)
@@ -0,0 +1,48 @@
+from agilepoint.directory import DirectoryIndex
+from agilepoint.rights import RightsMatrix
+from .support import StubTestCase
+
+
+class RightsMatrixTest(StubTestCase):
+    populate = dict(StubTestCase.populate, users=40)
+
+    def setUp(self):
+        super(RightsMatrixTest, self).setUp()
+        self.role = sorted(self.state.roles)[0]
+        self.group = sorted(self.state.groups)[0]
+
+    def expected(self, user):
+        return sorted(self.ap.admin.get_access_rights(userName=user)['GetAccessRightsResult'])
+
+    def test_matches_server(self):
+        matrix = RightsMatrix(self.ap, workers=4).load()
+        self.assertEqual(sorted(matrix.users), sorted(self.state.users))
+        for user in self.state.users:
+            self.assertEqual(sorted(matrix.rights_of(user)), self.expected(user))
+        user = sorted(self.state.role_members[self.role])[0]
+        rights = self.state.roles[self.role]['Rights']
+        self.assertTrue(matrix.allows(user.lower(), matrix.mask(rights)))
+        self.assertTrue(all(matrix.has_right(user, right) for right in rights))
+        self.assertIn(user, matrix.users_with(rights[0]))
+        self.assertRaises(KeyError, matrix.mask, ['No Such Right'])
+
+    def test_refresh_roles(self):
+        matrix = RightsMatrix(self.ap).load()
+        removed = sorted(self.state.role_members[self.role])[0]
+        before = sorted(self.state.role_members[self.role])
+        self.state.role_members[self.role].discard(removed)
+        self.state.role_members[self.role].add(self.group)
+        matrix.refresh_roles([self.role], previous_users=before)
+        for user in set(before) | self.state.group_members[self.group]:
+            self.assertEqual(sorted(matrix.rights_of(user)), self.expected(user))
+
+    def test_refresh_roles_with_directory(self):
+        directory = DirectoryIndex(self.ap).load()
+        matrix = RightsMatrix(self.ap, directory=directory).load()
+        removed = sorted(self.state.role_members[self.role])[0]
+        self.state.role_members[self.role].discard(removed)
+        self.state.role_members[self.role].add(self.group)
+        matrix.refresh_roles([self.role])
+        self.assertEqual(sorted(matrix.rights_of(removed)), self.expected(removed))
+        for user in self.state.group_members[self.group]:
+            self.assertEqual(sorted(matrix.rights_of(user)), self.expected(user))
@@ -0,0 +1,48 @@
+import unittest
+from agilepoint import _schema
+from agilepoint.exceptions import InvalidArg
+
+GOOD = {'bool': True, 'list': ['a'], 'date': '2017-01-02T03:04:05'}
+BAD = {'bool': 'yes', 'list': 'a', 'date': 'tomorrow'}
+
+
+def spec_fields():
+    """{body field: [methods validating it]} of the shipped spec"""
+    fields = {}
+    for method in _schema.load_spec()['methods']:
+        for name in method['required'] + (method['optional'] or []):
+            fields.setdefault(name, []).append(method)
+    return fields
+
+
+class FieldTypeTest(unittest.TestCase):
+    def test_typed_fields_exist_in_spec(self):
+        typed = _schema.BOOL_FIELDS | _schema.LIST_FIELDS | _schema.DATE_FIELDS
+        self.assertEqual(sorted(typed - set(spec_fields())), [])
+
+    def test_validators_check_spec_fields(self):
+        for name, methods in spec_fields().items():
+            kind = _schema.field_type(name)
+            if kind is None:
+                continue
+            for method in methods:
+                validator = _schema.compile_section(method['section'])[method['method']]
+                body = dict((arg, 'x') for arg in method['required'] if arg != name)
+                body.update((arg, GOOD[_schema.field_type(arg)]) for arg in method['required']
+                            if _schema.field_type(arg))
+                body[name] = GOOD[kind]
+                self.assertTrue(validator(body))
+                body[name] = BAD[kind]
+                self.assertRaises(InvalidArg, validator, body)
+
+    def test_untyped_names(self):
+        self.assertIsNone(_schema.field_type('ProcessInstanceIDs'))
+        self.assertIsNone(_schema.field_type('UpdateDate'))
+
+
+class LazySectionTest(unittest.TestCase):
+    def test_compiles_on_first_lookup(self):
+        section = _schema.LazySection('Admin')
+        self.assertIsNone(section.validators)
+        self.assertIsInstance(section['add_delegation'], _schema.Validator)
+        self.assertIsNotNone(section.validators)
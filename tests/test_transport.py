@@ -0,0 +1,107 @@
+import socket
+from agilepoint import AgilePoint
+from agilepoint.transport import BalancingAdapter
+from .support import StubTestCase, PATH, start_server
+
+
+def dead_url():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return 'http://127.0.0.1:{}'.format(port)
+
+
+class BalancingAdapterTest(StubTestCase):
+    def balanced(self, hosts, **options):
+        adapter = BalancingAdapter(hosts, PATH, probe_interval=0, **options)
+        self.addCleanup(adapter.close)
+        return adapter, AgilePoint(hosts[0], PATH, 'user', 'password', adapter=adapter)
+
+    def test_ejects_dead_node(self):
+        adapter, client = self.balanced([dead_url(), self.server.url], max_failures=1)
+        for _ in range(10):
+            client.admin.get_roles()
+        dead, live = adapter.stats()
+        self.assertFalse(dead['healthy'])
+        self.assertLessEqual(dead['requests'], 1)
+        self.assertEqual(live['errors'], 0)
+        self.assertEqual(self.state.stats['Admin/GetRoles'], 10)
+
+    def test_probe_readmits_node(self):
+        second = start_server(0, self.state)
+        self.addCleanup(second.server_close)
+        self.addCleanup(second.shutdown)
+        adapter, client = self.balanced([second.url, self.server.url])
+        client.admin.get_roles()
+        node = adapter.nodes[0]
+        node.healthy = False
+        self.assertTrue(adapter.probe_node(node))
+        self.assertTrue(node.healthy)
+        self.assertEqual(node.failures, 0)
+        self.assertEqual(self.state.stats['Admin/GetDatabaseInfo'], 1)
+
+    def test_probe_keeps_dead_node_out(self):
+        adapter, _ = self.balanced([dead_url(), self.server.url])
+        self.assertFalse(adapter.probe_node(adapter.nodes[0]))
+        self.assertFalse(adapter.nodes[0].healthy)
+
+
+
+class HTTP2AdapterTest(StubTestCase):
+    def setUp(self):
+        try:
+            import h2  # noqa: F401  pylint: disable=unused-import
+            import httpx  # noqa: F401  pylint: disable=unused-import
+        except ImportError:
+            self.skipTest('needs the http2 extra')
+        super(HTTP2AdapterTest, self).setUp()
+
+    def versions(self, client):
+        seen = []
+        client.agilepoint._session.hooks['response'].append(  # pylint: disable=protected-access
+            lambda resp, *args, **kwargs: seen.append(resp.http_version))
+        return seen
+
+    def test_falls_back_to_http1(self):
+        client = self.client(http2=True)
+        seen = self.versions(client)
+        self.assertTrue(client.admin.get_roles())
+        self.assertEqual(seen, ['HTTP/1.1'])
+
+    def test_prior_knowledge(self):
+        try:
+            from stub_http2 import start_http2_server  # pylint: disable=import-error
+        except ImportError:
+            self.skipTest('needs hypercorn')
+        server = start_http2_server(0, self.state)
+        self.addCleanup(server.shutdown)
+        client = AgilePoint(server.url, PATH, 'user', 'password',
+                            http2={'prior_knowledge': True})
+        seen = self.versions(client)
+        self.assertTrue(client.admin.get_roles())
+        self.assertEqual(seen, ['HTTP/2'])
+
+
+class CompressionAdapterTest(StubTestCase):
+    populate = dict(StubTestCase.populate, users=200)
+
+    def wire_bytes(self):
+        client = self.client(compression=True)
+        users = client.admin.get_register_users()['GetRegisterUsersResult']
+        self.assertEqual(len(users), 200)
+        return client.compression.stats()['Admin/GetRegisterUsers']
+
+    def test_counts_compressed_bytes(self):
+        stats = self.wire_bytes()
+        self.assertGreater(stats['response_wire_bytes'], 0)
+        self.assertGreater(stats['response_ratio'], 2)
+
+    def test_counts_chunked_bytes(self):
+        plain = self.wire_bytes()
+        self.server.chunked = True
+        chunked = self.wire_bytes()
+        self.assertEqual(chunked['response_bytes'], plain['response_bytes'])
+        # The chunk framing adds a few bytes to the same compressed body
+        self.assertGreater(chunked['response_wire_bytes'], plain['response_wire_bytes'])
+        self.assertLess(chunked['response_wire_bytes'], plain['response_wire_bytes'] + 100)